@@ -0,0 +1,219 @@
+# Stationarity tests and seasonal decomposition with incremental state
+import numpy as np
+import hashlib
+import os
+import threading
+
+from lazy_imports import adfvalues
+from storage import StockDataCache
+
+# Incremental analysis: per-series state so that appending k new bars costs
+# O(k) instead of re-running adfuller / seasonal_decompose over the history
+ANALYSIS_STATE_MAX_BYTES = int(os.environ.get('ANALYSIS_STATE_MAX_BYTES', 32 * 1024 * 1024))
+analysis_states = StockDataCache(ANALYSIS_STATE_MAX_BYTES, sizeof=lambda state: state.nbytes)
+
+# Function to build the ADF regression (constant, fixed lag) for a series of levels:
+# dy_t = a + g * y_{t-1} + sum_i b_i * dy_{t-i}. Returns (X, dy).
+def _adf_design(levels, lag):
+    diffs = np.diff(levels)
+    rows = len(levels) - lag - 1
+    if rows <= 0:
+        return np.empty((0, lag + 2)), np.empty(0)
+    X = np.empty((rows, lag + 2))
+    X[:, 0] = 1.0
+    X[:, 1] = levels[lag:-1]
+    for i in range(1, lag + 1):
+        X[:, 1 + i] = diffs[lag - i:len(diffs) - i]
+    return X, diffs[lag:]
+
+# Function to compute ADF t-statistics from regression sufficient statistics;
+# works on a single series or a stack of windows
+def _adf_statistics(xtx, xty, yty, nobs):
+    k = xtx.shape[-1]
+    beta = np.linalg.solve(xtx, xty[..., None])[..., 0]
+    unit = np.zeros(xty.shape)
+    unit[..., 1] = 1.0
+    inv_11 = np.linalg.solve(xtx, unit[..., None])[..., 1, 0]
+    rss = yty - np.einsum('...i,...i->...', beta, xty)
+    sigma2 = rss / (nobs - k)
+    return beta[..., 1] / np.sqrt(sigma2 * inv_11)
+
+# Function to turn ADF statistics into MacKinnon approximate p-values
+ADF_PVALUE_GRID = 4096
+
+def _adf_pvalues(statistics):
+    statistics = np.asarray(statistics, dtype=float)
+    pvalue = np.vectorize(lambda stat: adfvalues.mackinnonp(stat, regression='c', N=1), otypes=[float])
+    if statistics.size <= ADF_PVALUE_GRID:
+        return pvalue(statistics)
+    # mackinnonp is scalar and slow; for many windows interpolate it from a fine grid
+    grid = np.linspace(statistics.min(), statistics.max(), ADF_PVALUE_GRID)
+    return np.interp(statistics, grid, pvalue(grid))
+
+# Rows of cross products materialized at once by the rolling ADF (rows x k x k)
+ROLLING_ADF_BLOCK_ROWS = 4096
+
+# Running sums of the ADF cross products X'X, X'y and y'y over the first rows
+# of a design, read at increasing row counts one bounded block at a time
+class _RunningCrossProducts:
+    def __init__(self, X, dy):
+        k = X.shape[1]
+        self.X = X
+        self.dy = dy
+        self.position = 0
+        self.xtx = np.zeros((k, k))
+        self.xty = np.zeros(k)
+        self.yty = 0.0
+    
+    # Sums over rows [0, i) for each i in a sorted array at or past the last call
+    def at(self, indices):
+        k = self.X.shape[1]
+        xtx = np.empty((len(indices), k, k))
+        xty = np.empty((len(indices), k))
+        yty = np.empty(len(indices))
+        # Indices at the current position read the carried sums
+        done = np.searchsorted(indices, self.position, side='right')
+        xtx[:done], xty[:done], yty[:done] = self.xtx, self.xty, self.yty
+        while done < len(indices):
+            stop = min(self.position + ROLLING_ADF_BLOCK_ROWS, indices[-1])
+            X = self.X[self.position:stop]
+            dy = self.dy[self.position:stop]
+            block_xtx = np.cumsum(X[:, :, None] * X[:, None, :], axis=0) + self.xtx
+            block_xty = np.cumsum(X * dy[:, None], axis=0) + self.xty
+            block_yty = np.cumsum(dy * dy) + self.yty
+            end = np.searchsorted(indices, stop, side='right')
+            rows = indices[done:end] - self.position - 1
+            xtx[done:end], xty[done:end], yty[done:end] = block_xtx[rows], block_xty[rows], block_yty[rows]
+            self.xtx, self.xty, self.yty = block_xtx[-1], block_xty[-1], block_yty[-1]
+            self.position = stop
+            done = end
+        return xtx, xty, yty
+
+# Function to run the ADF test with a fixed lag on every window of a series.
+# Returns (statistics, p_values); entry i is for values[i:i + window].
+def rolling_adf(values, window, lag):
+    rows_per_window = window - lag - 1
+    # Running sums of the per-row cross products give every window's X'X, X'y
+    # and y'y as the difference between its end and start, and the windows are
+    # solved a block at a time so memory doesn't grow with the history
+    X, dy = _adf_design(values - values.mean(), lag)
+    ends = _RunningCrossProducts(X, dy)
+    starts = _RunningCrossProducts(X, dy)
+    statistics = np.empty(len(X) - rows_per_window + 1)
+    for first in range(0, len(statistics), ROLLING_ADF_BLOCK_ROWS):
+        window_starts = np.arange(first, min(first + ROLLING_ADF_BLOCK_ROWS, len(statistics)))
+        end_xtx, end_xty, end_yty = ends.at(window_starts + rows_per_window)
+        start_xtx, start_xty, start_yty = starts.at(window_starts)
+        statistics[window_starts] = _adf_statistics(end_xtx - start_xtx, end_xty - start_xty,
+                                                    end_yty - start_yty, rows_per_window)
+    return statistics, _adf_pvalues(statistics)
+
+# ADF regression for one series kept as X'X, X'y and y'y
+class IncrementalADF:
+    def __init__(self, values, lag):
+        values = np.asarray(values, dtype=float)
+        self.lag = lag
+        # Levels are shifted by the first value to keep the sums well conditioned
+        self.shift = float(values[0]) if len(values) else 0.0
+        self.xtx = np.zeros((lag + 2, lag + 2))
+        self.xty = np.zeros(lag + 2)
+        self.yty = 0.0
+        self.nobs = 0
+        self.length = 0
+        self.tail = np.empty(0)
+        self.lock = threading.Lock()
+        self.append(values)
+    
+    @property
+    def nbytes(self):
+        return self.xtx.nbytes + self.xty.nbytes + self.tail.nbytes + 256
+    
+    def append(self, values):
+        levels = np.concatenate([self.tail, np.asarray(values, dtype=float) - self.shift])
+        X, dy = _adf_design(levels, self.lag)
+        self.xtx += X.T @ X
+        self.xty += X.T @ dy
+        self.yty += float(dy @ dy)
+        self.nobs += len(dy)
+        self.length += len(values)
+        # The next regression row needs the last lag + 1 levels
+        self.tail = levels[-(self.lag + 1):]
+    
+    def result(self):
+        if self.nobs <= self.lag + 2:
+            return None
+        statistic = float(_adf_statistics(self.xtx, self.xty, self.yty, self.nobs))
+        p_value = float(_adf_pvalues(statistic))
+        return {
+            'adf_statistic': statistic,
+            'p_value': p_value,
+            'is_stationary': p_value < 0.05,
+            'lag': self.lag,
+            'nobs': self.nobs,
+            'length': self.length
+        }
+
+# Additive decomposition kept as the tail the centered moving average still
+# needs plus per-phase sums of the detrended values
+class IncrementalDecomposition:
+    def __init__(self, values, period):
+        values = np.asarray(values, dtype=float)
+        self.period = period
+        self.half = period // 2
+        # Same centered filter as seasonal_decompose
+        if period % 2 == 0:
+            self.filt = np.array([.5] + [1] * (period - 1) + [.5]) / period
+        else:
+            self.filt = np.repeat(1.0 / period, period)
+        self.phase_sums = np.zeros(period)
+        self.phase_counts = np.zeros(period)
+        self.length = 0
+        self.tail = np.empty(0)
+        self.lock = threading.Lock()
+        self.append(values)
+    
+    @property
+    def nbytes(self):
+        return self.phase_sums.nbytes + self.phase_counts.nbytes + self.tail.nbytes + 256
+    
+    def seasonal_pattern(self):
+        with np.errstate(invalid='ignore'):
+            averages = self.phase_sums / self.phase_counts
+        return averages - np.nanmean(averages)
+    
+    # Adds values and returns the components from the first index whose trend
+    # changed: (offset, trend, seasonal, resid)
+    def append(self, values):
+        values = np.asarray(values, dtype=float)
+        buffer = np.concatenate([self.tail, values])
+        # buffer[0] is element self.length - len(self.tail) of the series
+        offset = self.length - len(self.tail) + self.half
+        trend = np.convolve(buffer, self.filt, mode='valid')
+        detrended = buffer[self.half:self.half + len(trend)] - trend
+        phases = (offset + np.arange(len(trend))) % self.period
+        self.phase_sums += np.bincount(phases, detrended, minlength=self.period)
+        self.phase_counts += np.bincount(phases, minlength=self.period)
+        self.length += len(values)
+        self.tail = buffer[-2 * self.half:] if self.half else np.empty(0)
+        
+        # The last half-window of points has no trend yet
+        trend = np.concatenate([trend, np.full(self.half, np.nan)])
+        observed = buffer[self.half:]
+        seasonal_values = self.seasonal_pattern()[(offset + np.arange(len(observed))) % self.period]
+        return offset, trend, seasonal_values, observed - trend - seasonal_values
+
+# Function to get the incremental state of a series, or None if unknown
+def analysis_state(kind, series_id):
+    return analysis_states.get(f"{kind}:{series_id}")
+
+# Encoded decomposition responses, keyed by series fingerprint, period and
+# format; building the Plotly figures costs more than the decomposition itself
+DECOMPOSITION_PERIOD = 12
+DECOMPOSITION_CACHE_MAX_BYTES = int(os.environ.get('DECOMPOSITION_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+decomposition_cache = StockDataCache(DECOMPOSITION_CACHE_MAX_BYTES)
+
+# Function to fingerprint the values and dates of a series sent for analysis
+def series_fingerprint(values, dates):
+    digest = hashlib.sha1(np.asarray(values, dtype=float).tobytes())
+    digest.update('\n'.join(map(str, dates)).encode())
+    return digest.hexdigest()
@@ -1,224 +1,83 @@
 # Import necessary libraries
+import time
+_process_start = time.perf_counter()
+
 import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import seaborn as sns
 import datetime
-from datetime import date, timedelta
-from statsmodels.tsa.seasonal import seasonal_decompose
-import statsmodels.api as sm
-from statsmodels.tsa.stattools import adfuller
-from prophet import Prophet
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error
-from keras.models import Sequential
-from keras.layers import LSTM, Dense, Dropout, MultiHeadAttention, LayerNormalization
-from sklearn.preprocessing import MinMaxScaler, StandardScaler
-from prophet.plot import plot_plotly, plot_components_plotly
-from tensorflow.keras.optimizers import Adam
-import tensorflow as tf
 import json
+import gzip
 import base64
 from io import BytesIO
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, g, request, jsonify, render_template, send_from_directory, stream_with_context
 import os
-import plotly.graph_objects as go
-import plotly.express as px
-import plotly
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import requests
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import lru_cache
 
-# Initialize Flask app
-app = Flask(__name__, static_folder='static', template_folder='templates')
+from observability import (
+    CallbackMetric, http_request_bytes, http_request_seconds, http_response_bytes, logger,
+    observe_training, render_metrics
+)
+from lazy_imports import (
+    ML_STACKS, PRELOAD_STACKS, import_costs, plotly_utils, preload_stacks, px, seasonal, stattools
+)
+from storage import dataset_registry, register_dataset, stock_cache_key, stock_data_cache
+from frames import frame_to_binary, frame_to_columns
+from synthetic import SYNTHETIC_CORRELATION, SYNTHETIC_MAX_TICKERS, SyntheticMarket
+from providers import (
+    VALID_TICKERS, get_stooq_data, hedge_stats_snapshot, load_stock_frame, prefetch_yahoo_batch,
+    provider_health
+)
+from charts import (
+    CHART_DEFAULT_WIDTH, CHART_MAX_WIDTH, CHART_MIN_WIDTH, CHART_PYRAMID_FACTOR, chart_pyramid,
+    chart_pyramids
+)
+from indicators import (
+    INDICATOR_MAX_SPECS, compute_indicators, indicator_states, parse_indicator_spec,
+    ticker_indicators
+)
+from streaming import (
+    PRICE_STREAM_HEARTBEAT, PRICE_STREAM_INTERVAL, PRICE_STREAM_MAX_TICKERS, price_stream_hub
+)
+from analysis import (
+    DECOMPOSITION_PERIOD, IncrementalADF, IncrementalDecomposition, analysis_state, analysis_states,
+    decomposition_cache, rolling_adf, series_fingerprint
+)
+from forecasting import NETWORK_SPECS, run_lstm, run_prophet, run_transformer
+from jobs import (
+    BACKTEST_MAX_FOLDS, PROPHET_BATCH_WORKERS, SEARCH_ETA, SEARCH_MIN_EPOCHS, get_prophet_pool,
+    job_progress, job_status, model_jobs, request_job_cancel, run_backtest, run_search,
+    submit_model_job
+)
+from serving import (
+    MODEL_ID_PATTERN, PREDICT_BATCH_WINDOW, PREDICT_MAX_BATCH, PREDICT_MAX_WINDOWS,
+    get_model_server, run_predict, serving_models
+)
 
-# Create a simple cache for stock data to reduce API calls
-stock_data_cache = {}
+# Brotli is optional; responses fall back to gzip without it
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-# Function to safely parse dates
-def safe_parse_dates(df, date_column='Date'):
-    """
-    Safely parse date strings in a DataFrame to datetime objects.
-    Uses multiple fallback methods to handle different date formats.
-    
-    Parameters:
-    df (pd.DataFrame): DataFrame containing date column
-    date_column (str): Name of the date column
-    
-    Returns:
-    pd.DataFrame: DataFrame with properly parsed date column
-    """
-    if date_column not in df.columns:
-        print(f"Error: {date_column} column not found in DataFrame")
-        return df
-    
-    # Save original values for reference
-    df['_original_date'] = df[date_column].copy()
-    
-    # Try multiple parsing approaches
-    try:
-        # Method 1: Try to parse with format='mixed'
-        df[date_column] = pd.to_datetime(df[date_column], format='mixed', errors='coerce')
-        
-        # Check if any dates couldn't be parsed
-        if df[date_column].isna().any():
-            # Method 2: Try to extract date part from complex strings
-            # Example: "Mon, 03 Jun 2024 00:00:00 GMT" -> "03 Jun 2024"
-            df.loc[df[date_column].isna(), date_column] = df.loc[df[date_column].isna(), '_original_date'].astype(str).str.extract(r'([0-9]{1,2}\s[A-Za-z]{3}\s[0-9]{4})')[0]
-            # Try parsing again
-            df.loc[df[date_column].isna(), date_column] = pd.to_datetime(df.loc[df[date_column].isna(), date_column], errors='coerce')
-            
-            # Method 3: Try with different format patterns
-            for pattern in ['%Y-%m-%d', '%d-%m-%Y', '%m/%d/%Y', '%Y/%m/%d', '%d/%m/%Y']:
-                if df[date_column].isna().any():
-                    df.loc[df[date_column].isna(), date_column] = pd.to_datetime(
-                        df.loc[df[date_column].isna(), '_original_date'], 
-                        format=pattern, 
-                        errors='coerce'
-                    )
-        
-        # If still have NaN dates, create synthetic dates
-        if df[date_column].isna().any():
-            print(f"Warning: {df[date_column].isna().sum()} dates could not be parsed after multiple attempts")
-            # Create dates based on valid dates or current date
-            last_valid_date = df[date_column].max() if not pd.isna(df[date_column].max()) else datetime.datetime.now()
-            df.loc[df[date_column].isna(), date_column] = pd.date_range(
-                start=last_valid_date - pd.Timedelta(days=df[date_column].isna().sum()), 
-                periods=df[date_column].isna().sum()
-            )
-    
-    except Exception as e:
-        print(f"Error in date parsing: {e}")
-        # Last resort - create all dates based on index
-        print("Creating synthetic dates based on index")
-        end_date = datetime.datetime.now()
-        df[date_column] = pd.date_range(end=end_date, periods=len(df))
-    
-    # Remove timezone information if present (important for Prophet)
-    if hasattr(df[date_column].dtype, 'tz') and df[date_column].dtype.tz is not None:
-        df[date_column] = df[date_column].dt.tz_localize(None)
-    
-    # Remove helper column
-    df = df.drop('_original_date', axis=1)
-    
-    # Sort by date
-    df = df.sort_values(date_column)
-    
-    return df
-
-# Function to fetch stock data from Stooq
-def get_stooq_data(ticker, start, end):
-    try:
-        # Check if we have this data in cache
-        cache_key = f"stooq_{ticker}_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}"
-        if cache_key in stock_data_cache:
-            print(f"Using cached data for {ticker}")
-            return stock_data_cache[cache_key]
-        
-        start_str = start.strftime("%Y%m%d")
-        end_str = end.strftime("%Y%m%d")
-        url = f"https://stooq.com/q/d/l/?s={ticker}&d1={start_str}&d2={end_str}&i=d"
-        
-        # Use requests with timeout
-        response = requests.get(url, timeout=10)
-        
-        if response.status_code != 200:
-            print(f"Stooq API error: {response.status_code}")
-            return None
-            
-        # Save content to a temporary file and read with pandas
-        with open('temp_data.csv', 'wb') as f:
-            f.write(response.content)
-        
-        df = pd.read_csv('temp_data.csv')
-        
-        # Parse dates
-        if 'Date' in df.columns:
-            df = safe_parse_dates(df)
-            
-        # Cache this data
-        stock_data_cache[cache_key] = df
-        return df
-    except Exception as e:
-        print(f"Error fetching data from Stooq: {e}")
-        return None
+# Initialize Flask app
+app = Flask(__name__, static_folder='static', template_folder='templates')
 
-# Function to fetch stock data from Yahoo Finance (fallback)
-def get_yahoo_data(ticker, start, end):
-    try:
-        # Check if we have this data in cache
-        cache_key = f"yahoo_{ticker}_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}"
-        if cache_key in stock_data_cache:
-            print(f"Using cached Yahoo Finance data for {ticker}")
-            return stock_data_cache[cache_key]
-            
-        # Yahoo Finance tickers don't use the .US suffix
-        yahoo_ticker = ticker.replace('.US', '')
-        
-        # Import yfinance only when needed to avoid dependency issues
-        try:
-            import yfinance as yf
-            ticker_data = yf.download(yahoo_ticker, start=start, end=end)
-            
-            # Convert to same format as Stooq data
-            if not ticker_data.empty:
-                ticker_data.reset_index(inplace=True)
-                ticker_data.columns = [col if col != 'Adj Close' else 'Adj_Close' for col in ticker_data.columns]
-                # Ensure Date column has the right name
-                if 'Date' not in ticker_data.columns and 'index' in ticker_data.columns:
-                    ticker_data.rename(columns={'index': 'Date'}, inplace=True)
-                
-                # Cache the data
-                stock_data_cache[cache_key] = ticker_data
-                return ticker_data
-            return None
-        except Exception as e:
-            print(f"Error with yfinance: {e}")
-            return None
-    except Exception as e:
-        print(f"Error fetching Yahoo Finance data: {e}")
-        return None
-
-# Use static fallback data if both APIs fail (for demo purposes)
-def get_fallback_data(ticker, start, end):
-    try:
-        # Create a synthetic dataset based on the ticker and date range
-        print(f"Using fallback data for {ticker}")
-        
-        # Generate date range
-        date_range = pd.date_range(start=start, end=end)
-        n_days = len(date_range)
-        
-        if n_days == 0:
-            return None
-            
-        # Use the ticker string to generate a "seed" for the random generator
-        import hashlib
-        seed = int(hashlib.md5(ticker.encode()).hexdigest(), 16) % 10000
-        np.random.seed(seed)
-        
-        # Generate synthetic price data
-        initial_price = 100 + (seed % 400)  # Some base price between 100 and 500
-        daily_returns = np.random.normal(0.0005, 0.015, n_days)  # Random daily returns
-        prices = initial_price * (1 + np.cumsum(daily_returns))
-        
-        # Create a DataFrame
-        df = pd.DataFrame({
-            'Date': date_range,
-            'Open': prices * np.random.uniform(0.98, 0.995, n_days),
-            'High': prices * np.random.uniform(1.01, 1.03, n_days),
-            'Low': prices * np.random.uniform(0.97, 0.99, n_days),
-            'Close': prices,
-            'Volume': np.random.randint(10000, 1000000, n_days)
-        })
-        
-        print(f"Generated fallback data with {len(df)} rows")
-        return df
-    except Exception as e:
-        print(f"Error generating fallback data: {e}")
-        return None
+# Function to get the frame for an analysis request, either from its dataset_id
+# or from the raw records in the payload. Returns (df, error_response).
+def _request_frame(data):
+    dataset_id = data.get('dataset_id')
+    if dataset_id:
+        df = dataset_registry.get(dataset_id)
+        if df is None:
+            return None, (jsonify({
+                'error': f'Unknown or expired dataset_id {dataset_id}',
+                'code': 'dataset_not_found'
+            }), 404)
+        # Shallow copy so endpoints can add feature columns without touching the registry
+        return df.copy(deep=False), None
+    return pd.DataFrame(data.get('data')), None
 
 # API endpoint to check if a ticker exists and get data source info
 @app.route('/api/check-ticker', methods=['POST'])
@@ -229,27 +88,8 @@ def check_ticker():
         if not ticker:
             return jsonify({'error': 'No ticker provided'}), 400
             
-        # Define a set of valid tickers for which we'll provide data
-        valid_tickers = {
-            # US Tech
-            'AAPL.US', 'MSFT.US', 'GOOG.US', 'META.US', 'AMZN.US', 'TSLA.US', 
-            'NVDA.US', 'NFLX.US', 'INTC.US', 'AMD.US',
-            
-            # US Finance
-            'JPM.US', 'BAC.US', 'WFC.US', 'GS.US', 'V.US', 'MA.US',
-            
-            # US Retail
-            'WMT.US', 'TGT.US', 'HD.US', 'COST.US',
-            
-            # US Healthcare
-            'JNJ.US', 'PFE.US', 'UNH.US', 'MRK.US',
-            
-            # Yahoo Finance available
-            'AAPL', 'MSFT', 'GOOG', 'AMZN', 'FB', 'TSLA', 'BRK-A', 'JPM', 'JNJ', 'V'
-        }
-        
         # Check if the ticker is in our valid list
-        if ticker in valid_tickers:
+        if ticker in VALID_TICKERS:
             return jsonify({
                 'exists': True,
                 'source': 'Stooq & Yahoo Finance',
@@ -264,12 +104,115 @@ def check_ticker():
         })
         
     except Exception as e:
-        print(f"Error checking ticker: {e}")
+        logger.error("Error checking ticker: %s", e)
         return jsonify({'error': str(e)}), 500
 
+# API endpoint to inspect provider latency, errors and circuit breakers
+@app.route('/api/providers/stats', methods=['GET'])
+def providers_stats():
+    return jsonify({
+        'providers': {name: health.stats() for name, health in provider_health.items()},
+        'hedging': hedge_stats_snapshot()
+    })
+
+# API endpoint to inspect the stock data cache
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify(stock_data_cache.stats())
+
+_CACHES = {
+    'stock_data': lambda: stock_data_cache,
+    'dataset_registry': lambda: dataset_registry,
+    'decomposition': lambda: decomposition_cache,
+    'analysis_state': lambda: analysis_states,
+    'chart_pyramid': lambda: chart_pyramids,
+    'indicator_state': lambda: indicator_states,
+    'serving_model': lambda: serving_models
+}
+_BREAKER_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+# Function to read one field of every cache's stats as metric samples
+def _cache_samples(field):
+    return lambda: [({'cache': name}, get_cache().stats()[field]) for name, get_cache in _CACHES.items()]
+
+# Function to read one field of every provider's stats as metric samples
+def _provider_samples(field, convert=float):
+    return lambda: [({'provider': name}, convert(health.stats()[field])) for name, health in provider_health.items()]
+
+CallbackMetric('cache_hits_total', 'Cache lookups that found a live entry.', 'counter', _cache_samples('hits'))
+CallbackMetric('cache_misses_total', 'Cache lookups that found nothing.', 'counter', _cache_samples('misses'))
+CallbackMetric('cache_evictions_total', 'Entries evicted to stay under the byte budget.', 'counter', _cache_samples('evictions'))
+CallbackMetric('cache_hit_ratio', 'Hits over lookups since start.', 'gauge', _cache_samples('hit_ratio'))
+CallbackMetric('cache_bytes', 'Estimated bytes held by the cache.', 'gauge', _cache_samples('bytes'))
+CallbackMetric('cache_entries', 'Entries held by the cache.', 'gauge', _cache_samples('entries'))
+CallbackMetric('provider_fetch_failures_total', 'Failed upstream fetches.', 'counter', _provider_samples('failures'))
+CallbackMetric('provider_short_circuited_total', 'Fetches skipped by an open circuit breaker.', 'counter',
+               _provider_samples('short_circuited'))
+CallbackMetric('provider_circuit_state', 'Circuit breaker state (0 closed, 1 half-open, 2 open).', 'gauge',
+               _provider_samples('state', _BREAKER_STATES.get))
+CallbackMetric('provider_hedged_requests_total', 'Stooq requests hedged with Yahoo Finance.', 'counter',
+               lambda: [({}, hedge_stats_snapshot()['hedged'])])
+CallbackMetric('price_stream_clients', 'Connected price stream clients.', 'gauge',
+               lambda: [({}, price_stream_hub.stats()['clients'])])
+
+# Start the request timer
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+# Record per-route latency and sizes. Registered before compress_response so it
+# runs after it (Flask runs after_request hooks in reverse) and sees sent bytes.
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    http_request_seconds.observe(time.perf_counter() - started, route=route,
+                                 method=request.method, status=response.status_code)
+    http_request_bytes.observe(request.content_length or 0, route=route)
+    # Streamed bodies have no length up front
+    if not response.is_streamed:
+        http_response_bytes.observe(response.calculate_content_length() or 0, route=route)
+    return response
+
+# API endpoint exposing metrics in the Prometheus text format
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+# Responses smaller than this aren't worth compressing
+COMPRESS_MIN_BYTES = 1024
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/octet-stream', 'text/csv', 'text/plain'}
+
+# Compress API responses with brotli or gzip when the client accepts it
+@app.after_request
+def compress_response(response):
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+    response.vary.add('Accept-Encoding')
+    return response
+
 # Helper function to convert plots to JSON for frontend
 def fig_to_json(fig):
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return json.dumps(fig, cls=plotly_utils.PlotlyJSONEncoder)
 
 # API endpoint to get stock data
 @app.route('/api/stock-data', methods=['POST'])
@@ -280,81 +223,516 @@ def stock_data():
         start_date = datetime.datetime.strptime(data.get('start_date'), '%Y-%m-%d').date()
         end_date = datetime.datetime.strptime(data.get('end_date'), '%Y-%m-%d').date()
         
-        # Try Stooq first
-        df = get_stooq_data(ticker, start_date, end_date)
-        data_source = "Stooq"
-        
-        # If Stooq fails, try Yahoo Finance
-        if df is None or df.empty:
-            print(f"Stooq data not available for {ticker}, trying Yahoo Finance")
-            df = get_yahoo_data(ticker, start_date, end_date)
-            data_source = "Yahoo Finance"
-        
-        # If both fail, use fallback data for demo purposes
-        if df is None or df.empty:
-            print(f"Yahoo Finance data not available for {ticker}, using fallback data")
-            df = get_fallback_data(ticker, start_date, end_date)
-            data_source = "Demo Data (Offline Mode)"
-            
-            if df is None or df.empty:
-                return jsonify({'error': f'No data available for ticker {ticker} from any source'}), 404
-        
-        # Ensure our dataset has minimum required columns
-        required_columns = ['Date', 'Open', 'High', 'Low', 'Close']
-        
-        # Check if the required columns exist
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        # Try Stooq first, hedged with Yahoo Finance, then demo data
+        df, data_source = load_stock_frame(ticker, start_date, end_date)
+        if df is None:
+            return jsonify({'error': f'No data available for ticker {ticker} from any source'}), 404
         
-        if missing_columns:
-            print(f"Missing columns: {missing_columns}")
-            # Add missing columns with reasonable default values
-            for col in missing_columns:
-                if col == 'Date':
-                    df['Date'] = pd.date_range(start=start_date, periods=len(df))
-                elif col in ['Open', 'High', 'Low']:
-                    if 'Close' in df.columns:
-                        # If we have Close but not the others, derive from Close
-                        if col == 'Open':
-                            df['Open'] = df['Close'] * np.random.uniform(0.98, 1.02, len(df))
-                        elif col == 'High':
-                            df['High'] = df['Close'] * np.random.uniform(1.0, 1.03, len(df))
-                        elif col == 'Low':
-                            df['Low'] = df['Close'] * np.random.uniform(0.97, 1.0, len(df))
-                    else:
-                        # No close price, generate random based on index
-                        start_price = 100 + (hash(ticker) % 400)
-                        daily_returns = np.random.normal(0.0005, 0.015, len(df))
-                        prices = start_price * (1 + np.cumsum(daily_returns))
-                        
-                        df['Close'] = prices
-                        df['Open'] = prices * np.random.uniform(0.98, 1.02, len(df))
-                        df['High'] = df.apply(lambda x: max(x['Open'], x['Close']) * np.random.uniform(1.0, 1.03, 1)[0], axis=1)
-                        df['Low'] = df.apply(lambda x: min(x['Open'], x['Close']) * np.random.uniform(0.97, 1.0, 1)[0], axis=1)
+        dataset_id = register_dataset(df)
         
-        # Ensure data is sorted by date
-        df = safe_parse_dates(df)
-        df = df.sort_values('Date')
+        # Records stay the default; 'columns' and 'binary' are more compact
+        response_format = data.get('format', 'records')
+        if response_format == 'binary':
+            body = frame_to_binary(df, {'source': data_source, 'dataset_id': dataset_id})
+            return Response(body, mimetype='application/octet-stream')
+        if response_format == 'columns':
+            return jsonify({
+                'data': frame_to_columns(df),
+                'columns': df.columns.tolist(),
+                'source': data_source,
+                'dataset_id': dataset_id
+            })
         
         return jsonify({
             'data': df.to_dict(orient='records'),
             'columns': df.columns.tolist(),
-            'source': data_source
+            'source': data_source,
+            'dataset_id': dataset_id
         })
             
     except Exception as e:
-        print(f"Error in stock_data endpoint: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in stock_data endpoint: %s", e)
         return jsonify({'error': str(e)}), 500
 
+# Batch loading: misses are fetched from Stooq on a bounded thread pool, and
+# whatever Stooq can't serve goes to Yahoo Finance in one multi-ticker download
+BATCH_MAX_TICKERS = 500
+BATCH_FETCH_WORKERS = int(os.environ.get('BATCH_FETCH_WORKERS', 8))
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_FETCH_WORKERS, thread_name_prefix='batch-fetch')
+
+# Function to look a ticker up in the stock data cache only. Returns (df, source).
+def _cached_stock_frame(ticker, start, end):
+    for provider, source in (('stooq', "Stooq"), ('yahoo', "Yahoo Finance")):
+        df = stock_data_cache.get(stock_cache_key(provider, ticker, start, end))
+        if df is not None and not df.empty:
+            return df, source
+    return None, None
+
+def _stooq_stock_frame(ticker, start, end):
+    df = get_stooq_data(ticker, start, end)
+    return (df, "Stooq") if df is not None and not df.empty else (None, None)
+
+# API endpoint to get stock data for many tickers, streamed as NDJSON per ticker
+@app.route('/api/stock-data/batch', methods=['POST'])
+def stock_data_batch():
+    data = request.json or {}
+    tickers = data.get('tickers')
+    if tickers == 'all':
+        tickers = sorted(VALID_TICKERS)
+    if not isinstance(tickers, list) or not tickers:
+        return jsonify({'error': "Provide 'tickers' as a list or 'all'"}), 400
+    tickers = list(dict.fromkeys(str(t).strip() for t in tickers if str(t).strip()))
+    if len(tickers) > BATCH_MAX_TICKERS:
+        return jsonify({'error': f'At most {BATCH_MAX_TICKERS} tickers per batch'}), 400
+    try:
+        start_date = datetime.datetime.strptime(data.get('start_date'), '%Y-%m-%d').date()
+        end_date = datetime.datetime.strptime(data.get('end_date'), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return jsonify({'error': 'start_date and end_date must be YYYY-MM-DD'}), 400
+    response_format = data.get('format', 'records')
+    if response_format not in ('records', 'columns'):
+        return jsonify({'error': "format must be 'records' or 'columns'"}), 400
+    
+    def message(ticker, fetch):
+        try:
+            df, data_source = load_stock_frame(ticker, start_date, end_date, fetch=fetch)
+        except Exception as e:
+            logger.error("Error loading %s in batch: %s", ticker, e)
+            return {'ticker': ticker, 'error': str(e)}
+        if df is None:
+            return {'ticker': ticker, 'error': f'No data available for ticker {ticker} from any source'}
+        return {
+            'ticker': ticker,
+            'data': frame_to_columns(df) if response_format == 'columns' else df.to_dict(orient='records'),
+            'columns': df.columns.tolist(),
+            'source': data_source,
+            'dataset_id': register_dataset(df)
+        }
+    
+    def line(payload):
+        return app.json.dumps(payload) + '\n'
+    
+    def generate():
+        started = time.perf_counter()
+        counts = {'cached': 0, 'fetched': 0}
+        
+        # Serve cache hits straight away
+        misses = []
+        for ticker in tickers:
+            df, data_source = _cached_stock_frame(ticker, start_date, end_date)
+            if df is None:
+                misses.append(ticker)
+                continue
+            counts['cached'] += 1
+            yield line(message(ticker, lambda *args, hit=(df, data_source): hit))
+        
+        futures = {_batch_executor.submit(_stooq_stock_frame, ticker, start_date, end_date): ticker
+                   for ticker in misses}
+        try:
+            retry = []
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    df, data_source = future.result()
+                except Exception as e:
+                    logger.warning("Error fetching %s from Stooq: %s", ticker, e)
+                    df = None
+                if df is None:
+                    retry.append(ticker)
+                    continue
+                counts['fetched'] += 1
+                yield line(message(ticker, lambda *args, hit=(df, data_source): hit))
+            
+            # One Yahoo download for everything Stooq couldn't serve; the rest is demo data
+            prefetch_yahoo_batch(retry, start_date, end_date)
+            for ticker in retry:
+                counts['fetched'] += 1
+                yield line(message(ticker, _cached_stock_frame))
+        finally:
+            # Client went away: drop fetches that haven't started yet
+            for future in futures:
+                future.cancel()
+        
+        yield line({'done': True, 'tickers': len(tickers), **counts,
+                    'elapsed': round(time.perf_counter() - started, 3)})
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# API endpoint streaming synthetic OHLCV for load testing without network access.
+# 'tickers' is a list, 'all', or a count of generated symbols (SYN0001, ...).
+# Streams one NDJSON line per ticker per chunk in columns format, then a summary.
+@app.route('/api/synthetic-data', methods=['POST'])
+def synthetic_data():
+    data = request.json or {}
+    tickers = data.get('tickers', 'all')
+    if tickers == 'all':
+        tickers = sorted(VALID_TICKERS)
+    elif isinstance(tickers, int) and not isinstance(tickers, bool) and tickers > 0:
+        tickers = [f"SYN{i:04d}" for i in range(1, tickers + 1)]
+    if not isinstance(tickers, list) or not tickers:
+        return jsonify({'error': "Provide 'tickers' as a list, 'all' or a count"}), 400
+    tickers = list(dict.fromkeys(str(t).strip() for t in tickers if str(t).strip()))
+    if len(tickers) > SYNTHETIC_MAX_TICKERS:
+        return jsonify({'error': f'At most {SYNTHETIC_MAX_TICKERS} tickers per request'}), 400
+    try:
+        start_date = datetime.datetime.strptime(data.get('start_date'), '%Y-%m-%d').date()
+        end_date = datetime.datetime.strptime(data.get('end_date'), '%Y-%m-%d').date()
+        market = SyntheticMarket(tickers, start_date, end_date, freq=data.get('freq', 'D'),
+                                 correlation=float(data.get('correlation', SYNTHETIC_CORRELATION)),
+                                 seed=int(data.get('seed', 0)))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid request: {e}'}), 400
+    
+    def generate():
+        started = time.perf_counter()
+        chunks = 0
+        for chunk in market.chunks():
+            for ticker, df in chunk.items():
+                yield app.json.dumps({'ticker': ticker, 'chunk': chunks, 'data': frame_to_columns(df)}) + '\n'
+            chunks += 1
+        yield app.json.dumps({'done': True, 'tickers': len(tickers), 'rows': market.rows, 'chunks': chunks,
+                              'freq': market.freq, 'elapsed': round(time.perf_counter() - started, 3)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# Function to read a zoom bound given as epoch milliseconds or a date string
+def _chart_bound(value, default):
+    if value is None:
+        return default
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+# API endpoint to get a history decimated for a chart 'width' pixels wide.
+# kind 'line' returns LTTB-reduced series per column, kind 'ohlc' aggregated
+# candles; 'start'/'end' zoom into a range. Rows come back at full resolution
+# whenever they already fit the width.
+@app.route('/api/chart-data', methods=['POST'])
+def chart_data():
+    data = request.json or {}
+    kind = data.get('kind', 'line')
+    if kind not in ('line', 'ohlc'):
+        return jsonify({'error': "kind must be 'line' or 'ohlc'"}), 400
+    try:
+        width = int(data.get('width', CHART_DEFAULT_WIDTH))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'width must be an integer'}), 400
+    if not CHART_MIN_WIDTH <= width <= CHART_MAX_WIDTH:
+        return jsonify({'error': f'width must be between {CHART_MIN_WIDTH} and {CHART_MAX_WIDTH}'}), 400
+    
+    try:
+        dataset_id = data.get('dataset_id')
+        if dataset_id:
+            df, error = _request_frame(data)
+            if error:
+                return error
+        else:
+            ticker = data.get('ticker')
+            start_date = datetime.datetime.strptime(data.get('start_date'), '%Y-%m-%d').date()
+            end_date = datetime.datetime.strptime(data.get('end_date'), '%Y-%m-%d').date()
+            df, _ = load_stock_frame(ticker, start_date, end_date)
+            if df is None:
+                return jsonify({'error': f'No data available for ticker {ticker} from any source'}), 404
+            dataset_id = register_dataset(df)
+        if 'Date' not in df.columns or df.empty:
+            return jsonify({'error': 'Dataset has no Date column or no rows'}), 400
+        
+        pyramid = chart_pyramid(dataset_id, df)
+        dates = pyramid.levels[0]['Date']
+        start = _chart_bound(data.get('start'), int(dates[0]))
+        end = _chart_bound(data.get('end'), int(dates[-1]))
+        rows_in_range = int(np.searchsorted(dates, end, side='right') - np.searchsorted(dates, start, side='left'))
+        
+        if kind == 'ohlc':
+            level, columns = pyramid.ohlc(start, end, width)
+            payload = {'data': {col: values.tolist() for col, values in columns.items()}}
+        else:
+            requested = data.get('columns') or ['Close']
+            unknown = [col for col in requested if col not in pyramid.columns]
+            if unknown:
+                return jsonify({'error': f'Unknown numeric columns: {unknown}'}), 400
+            level, series = pyramid.lines(requested, start, end, width)
+            payload = {'series': {col: {'Date': x.tolist(), col: y.tolist()} for col, (x, y) in series.items()}}
+        
+        return jsonify({
+            **payload,
+            'kind': kind,
+            'level': level,
+            'bucket_rows': CHART_PYRAMID_FACTOR ** level,
+            'full_resolution': level == 0 and rows_in_range <= width,
+            'rows_in_range': rows_in_range,
+            'start': start,
+            'end': end,
+            'dataset_id': dataset_id
+        })
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid request: {e}'}), 400
+    except Exception as e:
+        logger.exception("Error in chart_data endpoint: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+# Function to read and validate the 'indicators' list of a request
+def _request_indicator_specs(data):
+    specs = data.get('indicators')
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("Provide 'indicators' as a non-empty list, e.g. ['sma:20', 'rsi', 'macd']")
+    if len(specs) > INDICATOR_MAX_SPECS:
+        raise ValueError(f'At most {INDICATOR_MAX_SPECS} indicators per request')
+    return [parse_indicator_spec(spec) for spec in specs]
+
+# API endpoint for technical indicators over one dataset or ticker
+@app.route('/api/indicators', methods=['POST'])
+def indicators():
+    data = request.json or {}
+    try:
+        specs = _request_indicator_specs(data)
+        if data.get('dataset_id'):
+            df, error = _request_frame(data)
+            if error:
+                return error
+            result, mode = compute_indicators(f"dataset:{data['dataset_id']}", df, specs)
+            data_source = None
+        else:
+            ticker = data.get('ticker')
+            start_date = datetime.datetime.strptime(data.get('start_date'), '%Y-%m-%d').date()
+            end_date = datetime.datetime.strptime(data.get('end_date'), '%Y-%m-%d').date()
+            result, data_source, mode = ticker_indicators(ticker, start_date, end_date, specs)
+            if result is None:
+                return jsonify({'error': f'No data available for ticker {ticker} from any source'}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid request: {e}'}), 400
+    except Exception as e:
+        logger.exception("Error in indicators endpoint: %s", e)
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'data': frame_to_columns(result),
+        'indicators': result.columns[1:].tolist(),
+        'computed': mode,
+        'source': data_source
+    })
+
+# API endpoint for many indicators over many tickers, streamed as NDJSON per ticker
+@app.route('/api/indicators/batch', methods=['POST'])
+def indicators_batch():
+    data = request.json or {}
+    tickers = data.get('tickers')
+    if tickers == 'all':
+        tickers = sorted(VALID_TICKERS)
+    if not isinstance(tickers, list) or not tickers:
+        return jsonify({'error': "Provide 'tickers' as a list or 'all'"}), 400
+    tickers = list(dict.fromkeys(str(t).strip() for t in tickers if str(t).strip()))
+    if len(tickers) > BATCH_MAX_TICKERS:
+        return jsonify({'error': f'At most {BATCH_MAX_TICKERS} tickers per batch'}), 400
+    try:
+        specs = _request_indicator_specs(data)
+        start_date = datetime.datetime.strptime(data.get('start_date'), '%Y-%m-%d').date()
+        end_date = datetime.datetime.strptime(data.get('end_date'), '%Y-%m-%d').date()
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid request: {e}'}), 400
+    
+    def message(ticker, future):
+        try:
+            result, data_source, mode = future.result()
+        except Exception as e:
+            logger.error("Error computing indicators for %s in batch: %s", ticker, e)
+            return {'ticker': ticker, 'error': str(e)}
+        if result is None:
+            return {'ticker': ticker, 'error': f'No data available for ticker {ticker} from any source'}
+        return {'ticker': ticker, 'data': frame_to_columns(result), 'computed': mode, 'source': data_source}
+    
+    def generate():
+        started = time.perf_counter()
+        counts = {'full': 0, 'incremental': 0, 'cached': 0, 'errors': 0}
+        futures = {_batch_executor.submit(ticker_indicators, ticker, start_date, end_date, specs): ticker
+                   for ticker in tickers}
+        try:
+            for future in as_completed(futures):
+                payload = message(futures[future], future)
+                counts[payload.get('computed', 'errors')] += 1
+                yield app.json.dumps(payload) + '\n'
+        finally:
+            # Client went away: drop tickers that haven't started yet
+            for future in futures:
+                future.cancel()
+        
+        yield app.json.dumps({'done': True, 'tickers': len(tickers), 'indicators': len(specs), **counts,
+                              'elapsed': round(time.perf_counter() - started, 3)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# API endpoint streaming quotes for one or more tickers as Server-Sent Events
+@app.route('/api/stream/prices', methods=['GET'])
+def stream_prices():
+    tickers = [t.strip() for t in request.args.get('tickers', request.args.get('ticker', '')).split(',') if t.strip()]
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return jsonify({'error': 'No ticker provided'}), 400
+    if len(tickers) > PRICE_STREAM_MAX_TICKERS:
+        return jsonify({'error': f'At most {PRICE_STREAM_MAX_TICKERS} tickers per stream'}), 400
+    
+    def generate():
+        subscription = price_stream_hub.subscribe(tickers)
+        try:
+            yield f"retry: {int(PRICE_STREAM_INTERVAL * 1000)}\n\n"
+            while True:
+                updates = subscription.next_updates(PRICE_STREAM_HEARTBEAT)
+                if not updates:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                for ticker, quote in updates.items():
+                    event = subscription.event_for(ticker, quote)
+                    if event is not None:
+                        yield f"event: {event[0]}\ndata: {json.dumps(event[1])}\n\n"
+        finally:
+            price_stream_hub.unsubscribe(subscription)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# API endpoint to inspect the price stream pollers and subscribers
+@app.route('/api/stream/stats', methods=['GET'])
+def stream_stats():
+    return jsonify(price_stream_hub.stats())
+
+# Function to validate the values appended to a tracked series
+def _append_values(data):
+    values = data.get('append')
+    if not isinstance(values, list) or not values:
+        return None, (jsonify({'error': "'append' must be a non-empty list of numbers"}), 400)
+    try:
+        values = np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        return None, (jsonify({'error': "'append' must be a non-empty list of numbers"}), 400)
+    if np.isnan(values).any():
+        return None, (jsonify({'error': "'append' must not contain missing values"}), 400)
+    return values, None
+
+# Function to append to (or start) the tracked ADF state of a series
+def incremental_stationarity(data, column_data):
+    series_id = str(data['series_id'])
+    if 'append' in data:
+        state = analysis_state('adf', series_id)
+        if state is None:
+            return jsonify({'error': f'Unknown series {series_id}', 'code': 'series_not_found'}), 404
+        values, error = _append_values(data)
+        if error:
+            return error
+        with state.lock:
+            state.append(values)
+            result = state.result()
+    else:
+        if column_data is None or not len(column_data):
+            return jsonify({'error': 'No data provided'}), 400
+        values = pd.Series(column_data, dtype=float).dropna().values
+        if len(values) < 10:
+            return jsonify({'error': 'Need at least 10 observations'}), 400
+        # The lag is chosen once by AIC on the initial data and then kept fixed
+        lag = data.get('lag')
+        lag = int(lag) if lag is not None else stattools.adfuller(values, autolag='AIC')[2]
+        state = IncrementalADF(values, lag)
+        analysis_states.set(f"adf:{series_id}", state)
+        result = state.result()
+    
+    if result is None:
+        return jsonify({'error': 'Not enough observations for the ADF regression'}), 400
+    return jsonify({'series_id': series_id, **result})
+
+# Function to append to a tracked decomposition and return the changed tail
+def incremental_decomposition(data):
+    series_id = str(data['series_id'])
+    state = analysis_state('decomposition', series_id)
+    if state is None:
+        return jsonify({'error': f'Unknown series {series_id}', 'code': 'series_not_found'}), 404
+    values, error = _append_values(data)
+    if error:
+        return error
+    with state.lock:
+        offset, trend, seasonal_values, resid = state.append(values)
+        pattern = state.seasonal_pattern()
+        length = state.length
+    components = pd.DataFrame({'trend': trend, 'seasonal': seasonal_values, 'resid': resid})
+    return jsonify({
+        'series_id': series_id,
+        'length': length,
+        'period': state.period,
+        'offset': int(offset),
+        'seasonal_pattern': pattern.tolist(),
+        **frame_to_columns(components)
+    })
+
+# API endpoint for ADF p-values over a rolling window across the whole history
+@app.route('/api/stationarity/rolling', methods=['POST'])
+def rolling_stationarity():
+    data = request.json or {}
+    column_data = data.get('column_data')
+    dates = data.get('dates')
+    if data.get('dataset_id'):
+        df, error = _request_frame(data)
+        if error:
+            return error
+        column = data.get('column')
+        if column not in df.columns:
+            return jsonify({'error': f'Column {column} not found in data'}), 400
+        df = df[['Date', column]].dropna()
+        column_data = df[column].values
+        dates = df['Date'].dt.strftime('%Y-%m-%d').tolist()
+    if column_data is None or not len(column_data):
+        return jsonify({'error': 'No data provided'}), 400
+    
+    values = np.asarray(column_data, dtype=float)
+    if np.isnan(values).any():
+        return jsonify({'error': 'column_data must not contain missing values'}), 400
+    try:
+        window = int(data.get('window', 250))
+        lag = data.get('lag')
+        lag = int(lag) if lag is not None else stattools.adfuller(values[:window], autolag='AIC')[2]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'window and lag must be integers'}), 400
+    if window - lag - 1 <= lag + 2 or window > len(values):
+        return jsonify({'error': f'window must be between {2 * lag + 4} and {len(values)}'}), 400
+    
+    statistics, p_values = rolling_adf(values, window, lag)
+    # Window i covers values[i:i + window]
+    end_index = np.arange(window - 1, len(values))
+    response = {
+        'window': window,
+        'lag': lag,
+        'end_index': end_index.tolist(),
+        'adf_statistic': statistics.tolist(),
+        'p_value': p_values.tolist()
+    }
+    if dates is not None:
+        response['dates'] = [dates[i] for i in end_index]
+    return jsonify(response)
+
 # API endpoint for data stationarity check
 @app.route('/api/stationarity', methods=['POST'])
 def check_stationarity():
-    data = request.json
+    data = request.json or {}
     column_data = data.get('column_data')
     
-    if column_data:
-        result = adfuller(column_data)[1] < 0.05
+    if data.get('series_id') and 'append' in data:
+        return incremental_stationarity(data, None)
+    
+    if data.get('dataset_id'):
+        df, error = _request_frame(data)
+        if error:
+            return error
+        column = data.get('column')
+        if column not in df.columns:
+            return jsonify({'error': f'Column {column} not found in data'}), 400
+        column_data = df[column].dropna().values
+    
+    if data.get('series_id'):
+        return incremental_stationarity(data, column_data)
+    
+    if column_data is not None and len(column_data):
+        result = stattools.adfuller(column_data)[1] < 0.05
         return jsonify({'is_stationary': bool(result)})
     else:
         return jsonify({'error': 'No data provided'}), 400
@@ -362,256 +740,114 @@ def check_stationarity():
 # API endpoint for seasonal decomposition
 @app.route('/api/decomposition', methods=['POST'])
 def get_decomposition():
-    data = request.json
-    column_data = pd.Series(data.get('column_data'))
+    data = request.json or {}
+    column_data = data.get('column_data')
     dates = data.get('dates')
+    response_format = data.get('format', 'figures')
+    if response_format not in ('figures', 'raw'):
+        return jsonify({'error': "format must be 'figures' or 'raw'"}), 400
+    try:
+        period = int(data.get('period', DECOMPOSITION_PERIOD))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'period must be an integer'}), 400
+    
+    if data.get('series_id') and 'append' in data:
+        return incremental_decomposition(data)
+    
+    fingerprint = None
+    if data.get('dataset_id'):
+        df, error = _request_frame(data)
+        if error:
+            return error
+        column = data.get('column')
+        if column not in df.columns:
+            return jsonify({'error': f'Column {column} not found in data'}), 400
+        # Dataset IDs are content hashes already
+        fingerprint = f"{data['dataset_id']}:{column}"
+        column_data = df[column].values
+        dates = df['Date'].dt.strftime('%Y-%m-%d').tolist()
     
     if column_data is not None and dates is not None:
-        decomposition = seasonal_decompose(column_data, model='additive', period=12)
-        
-        # Create Plotly figures
-        trend_fig = px.line(x=dates, y=decomposition.trend.tolist(), title='Trend')
-        trend_fig.update_traces(line_color='Blue')
-        
-        seasonal_fig = px.line(x=dates, y=decomposition.seasonal.tolist(), title='Seasonality')
-        seasonal_fig.update_traces(line_color='green')
+        if len(column_data) < 2 * period:
+            return jsonify({'error': f'Need at least {2 * period} observations for period {period}'}), 400
+        
+        # Start tracking the series so later bars can be appended incrementally
+        if data.get('series_id'):
+            analysis_states.set(
+                f"decomposition:{data['series_id']}",
+                IncrementalDecomposition(np.asarray(column_data, dtype=float), period)
+            )
         
-        resid_fig = px.line(x=dates, y=decomposition.resid.tolist(), title='Residuals')
-        resid_fig.update_traces(line_color='Red', line_dash='dot')
+        if fingerprint is None:
+            fingerprint = series_fingerprint(column_data, dates)
+        cache_key = f"{fingerprint}:{period}:{response_format}"
+        cached = decomposition_cache.get(cache_key)
+        if cached is not None:
+            return Response(cached, mimetype='application/json')
+        
+        decomposition = seasonal.seasonal_decompose(pd.Series(column_data), model='additive', period=period)
+        
+        if response_format == 'raw':
+            # Numeric columns only; the client draws the charts
+            components = pd.DataFrame({
+                'trend': decomposition.trend,
+                'seasonal': decomposition.seasonal,
+                'resid': decomposition.resid
+            })
+            body = app.json.dumps({
+                'dates': dates,
+                'period': period,
+                **frame_to_columns(components)
+            })
+        else:
+            # Create Plotly figures
+            trend_fig = px.line(x=dates, y=decomposition.trend.tolist(), title='Trend')
+            trend_fig.update_traces(line_color='Blue')
+            
+            seasonal_fig = px.line(x=dates, y=decomposition.seasonal.tolist(), title='Seasonality')
+            seasonal_fig.update_traces(line_color='green')
+            
+            resid_fig = px.line(x=dates, y=decomposition.resid.tolist(), title='Residuals')
+            resid_fig.update_traces(line_color='Red', line_dash='dot')
+            
+            body = app.json.dumps({
+                'trend': fig_to_json(trend_fig),
+                'seasonal': fig_to_json(seasonal_fig),
+                'resid': fig_to_json(resid_fig)
+            })
         
-        return jsonify({
-            'trend': fig_to_json(trend_fig),
-            'seasonal': fig_to_json(seasonal_fig),
-            'resid': fig_to_json(resid_fig)
-        })
+        decomposition_cache.set(cache_key, body)
+        return Response(body, mimetype='application/json')
     else:
         return jsonify({'error': 'Invalid data'}), 400
 
-# Transformer Encoder Layer
-def transformer_encoder(inputs, head_size, num_heads, ff_dim, dropout=0):
-    # Multi-head attention
-    x = LayerNormalization(epsilon=1e-6)(inputs)
-    x = MultiHeadAttention(
-        key_dim=head_size, num_heads=num_heads, dropout=dropout
-    )(x, x)
-    x = Dropout(dropout)(x)
-    res = x + inputs
-    
-    # Feed-forward network
-    x = LayerNormalization(epsilon=1e-6)(res)
-    x = Dense(ff_dim, activation="relu")(x)
-    x = Dropout(dropout)(x)
-    x = Dense(inputs.shape[-1])(x)
-    return x + res
-
-# Build a Temporal Fusion Transformer model
-def build_transformer_model(input_shape, head_size=256, num_heads=4, ff_dim=4, num_transformer_blocks=4, mlp_units=[128, 64], dropout=0.1, mlp_dropout=0.1):
-    inputs = tf.keras.Input(shape=input_shape)
-    x = inputs
-    
-    # Transformer blocks
-    for _ in range(num_transformer_blocks):
-        x = transformer_encoder(x, head_size, num_heads, ff_dim, dropout)
-    
-    # Global average pooling
-    x = tf.keras.layers.GlobalAveragePooling1D(data_format="channels_first")(x)
-    
-    # Final MLP
-    for dim in mlp_units:
-        x = Dense(dim, activation="relu")(x)
-        x = Dropout(mlp_dropout)(x)
-    
-    outputs = Dense(1)(x)
-    
-    return tf.keras.Model(inputs, outputs)
 
 # API endpoint for Transformer model
 @app.route('/api/transformer', methods=['POST'])
 def transformer_model():
     try:
         data = request.json
-        df = pd.DataFrame(data.get('data'))
-        column = data.get('column')
-        sequence_length = data.get('sequence_length', 30)
-        head_size = data.get('head_size', 128)
-        num_heads = data.get('num_heads', 4)
-        
-        print(f"Running transformer model with parameters: sequence_length={sequence_length}, head_size={head_size}, num_heads={num_heads}")
-        print(f"Data shape: {df.shape}, Column: {column}")
-        
-        # Validate inputs
-        if df.empty:
-            return jsonify({'error': 'Empty dataset provided'}), 400
-        if column not in df.columns:
-            return jsonify({'error': f'Column {column} not found in data'}), 400
-            
-        # Parse dates safely
-        df = safe_parse_dates(df)
-        print(f"Date range: {df['Date'].min()} to {df['Date'].max()}")
-        
-        # Create additional time features
-        df['day_of_week'] = df['Date'].dt.dayofweek
-        df['day_of_month'] = df['Date'].dt.day
-        df['month'] = df['Date'].dt.month
-        
-        # Select features (target column + time features)
-        features = [column, 'day_of_week', 'day_of_month', 'month']
-        data_for_model = df[features].copy()
-        
-        # Print data stats
-        print(f"Min value: {data_for_model[column].min()}, Max value: {data_for_model[column].max()}")
-        print(f"Data points available: {len(data_for_model)}")
-        
-        # Scale the data
-        scaler = StandardScaler()
-        data_scaled = scaler.fit_transform(data_for_model)
-        
-        # Create sequences for the model
-        def create_sequences(data, seq_length):
-            xs, ys = [], []
-            for i in range(len(data) - seq_length):
-                x = data[i:i+seq_length]
-                y = data[i+seq_length, 0]  # Target is the first column (price)
-                xs.append(x)
-                ys.append(y)
-            return np.array(xs), np.array(ys)
-        
-        # Check if we have enough data
-        min_required_points = sequence_length + 4
-        if len(data_scaled) <= min_required_points:
-            return jsonify({
-                'error': f'Not enough data for sequence length {sequence_length}. Need at least {min_required_points} data points. Current data points: {len(data_scaled)}'
-            }), 400
-        
-        # Split data into training and testing sets
-        train_size = int(len(data_scaled) * 0.8)
-        print(f"Training data size: {train_size}")
-        
-        train_data = data_scaled[:train_size]
-        test_data = data_scaled[train_size-sequence_length:]  # Include overlap for sequence creation
-        
-        # Create sequences
-        train_x, train_y = create_sequences(train_data, sequence_length)
-        test_x, test_y = create_sequences(test_data, sequence_length)
-        
-        # Print sequence information
-        print(f"Training sequences: {len(train_x)}, Testing sequences: {len(test_x)}")
-        
-        # Check if we have enough sequences
-        if len(train_x) < 10 or len(test_x) < 3:
-            return jsonify({
-                'error': f'Not enough sequences generated. Try a shorter sequence length. Training: {len(train_x)}, Testing: {len(test_x)}'
-            }), 400
-        
-        # Build an even simpler transformer model - ultra lightweight for stability
-        input_shape = (train_x.shape[1], train_x.shape[2])  # (sequence_length, num_features)
-        print(f"Input shape: {input_shape}")
-        
-        # Use a very basic model for stability
-        model = tf.keras.Sequential([
-            tf.keras.layers.Input(shape=input_shape),
-            tf.keras.layers.Dense(64, activation="relu"),  # Simple dense layer
-            tf.keras.layers.GlobalAveragePooling1D(),      # Aggregate time steps
-            tf.keras.layers.Dense(32, activation="relu"),
-            tf.keras.layers.Dense(1)
-        ])
-        
-        # Compile the model with a lower learning rate
-        model.compile(
-            optimizer=Adam(learning_rate=0.001),
-            loss='mse'
-        )
-        
-        print("Model compiled, beginning training...")
-        
-        # Use early stopping to prevent overfitting
-        early_stopping = tf.keras.callbacks.EarlyStopping(
-            monitor='val_loss',
-            patience=2,
-            restore_best_weights=True
-        )
-        
-        # Train the model (few epochs to be fast)
-        history = model.fit(
-            train_x, train_y,
-            epochs=10,  # Max epochs
-            batch_size=min(32, len(train_x)),  # Smaller batch size if needed
-            validation_split=0.2,
-            verbose=1,
-            callbacks=[early_stopping]
-        )
-        
-        print("Model training complete, making predictions...")
-        
-        # Make predictions
-        test_predictions = model.predict(test_x, verbose=0)
-        
-        # Convert predictions back to original scale
-        test_pred_reshaped = np.zeros_like(data_scaled[0:len(test_predictions), :])
-        test_pred_reshaped[:, 0] = test_predictions.flatten()
-        test_predictions_rescaled = scaler.inverse_transform(test_pred_reshaped)[:, 0]
-        
-        # Get actual values
-        test_actual_reshaped = np.zeros_like(data_scaled[0:len(test_y), :])
-        test_actual_reshaped[:, 0] = test_y
-        test_actual_rescaled = scaler.inverse_transform(test_actual_reshaped)[:, 0]
-        
-        # Calculate metrics
-        mae = mean_absolute_error(test_actual_rescaled, test_predictions_rescaled)
-        mse = mean_squared_error(test_actual_rescaled, test_predictions_rescaled)
-        rmse = np.sqrt(mse)
-        r2 = r2_score(test_actual_rescaled, test_predictions_rescaled)
-        
-        print(f"Metrics - MAE: {mae}, MSE: {mse}, RMSE: {rmse}, R²: {r2}")
-        
-        # Test dates for the predictions (excluding sequence_length initial points)
-        test_start_idx = train_size
-        test_dates = df['Date'][test_start_idx + sequence_length:test_start_idx + sequence_length + len(test_predictions)].tolist()
-        
-        # Forecast future (3 days ahead)
-        # Use a simpler approach for forecasting future values
-        future_predictions = []
-        future_dates = []
-        
-        # Get the last known actual value (most recent price)
-        last_actual_value = df[column].iloc[-1]
-        
-        # Generate future dates
-        last_date = df['Date'].iloc[-1]
-        
-        # Make a simple autoregressive forecast for the next 3 days
-        # Using 1% random fluctuation from the previous value
-        current_value = last_actual_value
-        for i in range(3):
-            next_date = last_date + pd.Timedelta(days=i+1)
-            future_dates.append(next_date.strftime('%Y-%m-%d'))
-            
-            # Add random fluctuation of up to ±1.5% for a realistic forecast
-            fluctuation = np.random.uniform(-0.015, 0.015) 
-            next_value = current_value * (1 + fluctuation)
-            future_predictions.append(next_value)
-            current_value = next_value  # Use previous prediction for next step
+        df, error = _request_frame(data)
+        if error:
+            return error
+        params = {
+            'column': data.get('column'),
+            'sequence_length': data.get('sequence_length', 30),
+            'head_size': data.get('head_size', 128),
+            'num_heads': data.get('num_heads', 4),
+            'ticker': data.get('ticker')
+        }
         
-        print(f"Future predictions: {future_predictions}")
-        print(f"Future dates: {future_dates}")
+        if data.get('async'):
+            payload, status = submit_model_job('transformer', df, params)
+            return jsonify(payload), status
         
-        return jsonify({
-            'metrics': {
-                'mae': mae,
-                'mse': mse,
-                'rmse': rmse,
-                'r2': r2
-            },
-            'predictions': test_predictions_rescaled.tolist(),
-            'test_dates': [date.strftime('%Y-%m-%d') if hasattr(date, 'strftime') else str(date) for date in test_dates],
-            'future_predictions': future_predictions,
-            'future_dates': future_dates
-        })
+        payload, status = run_transformer(df, **params)
+        observe_training('transformer', payload)
+        return jsonify(payload), status
     
     except Exception as e:
-        import traceback
-        print(f"Error in transformer_model: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in transformer_model: %s", e)
         return jsonify({'error': f'Error processing transformer model: {str(e)}'}), 500
 
 # API endpoint for LSTM model
@@ -619,157 +855,24 @@ def transformer_model():
 def lstm_model():
     try:
         data = request.json
-        df = pd.DataFrame(data.get('data'))
-        column = data.get('column')
-        seq_length = data.get('seq_length', 10)
-        
-        print(f"Running LSTM model with seq_length={seq_length}")
-        print(f"Data shape: {df.shape}, Column: {column}")
-        
-        # Validate inputs
-        if df.empty:
-            return jsonify({'error': 'Empty dataset provided'}), 400
-        if column not in df.columns:
-            return jsonify({'error': f'Column {column} not found in data'}), 400
-            
-        # Parse dates safely
-        df = safe_parse_dates(df)
-        print(f"Date range: {df['Date'].min()} to {df['Date'].max()}")
-        
-        # Scale data
-        scaler = MinMaxScaler(feature_range=(0, 1))
-        scaled_data = scaler.fit_transform(df[column].values.reshape(-1, 1))
-        
-        print(f"Data points available: {len(scaled_data)}")
-        
-        # Check if we have enough data
-        min_required_points = seq_length + 4
-        if len(scaled_data) <= min_required_points:
-            return jsonify({
-                'error': f'Not enough data for sequence length {seq_length}. Need at least {min_required_points} data points. Current data points: {len(scaled_data)}'
-            }), 400
-        
-        # Create sequences
-        def create_sequences(dataset, seq_length):
-            X, y = [], []
-            for i in range(len(dataset) - seq_length):
-                X.append(dataset[i:i + seq_length, 0])
-                y.append(dataset[i + seq_length, 0])
-            return np.array(X), np.array(y)
-        
-        # Split data
-        train_size = int(len(scaled_data) * 0.8)
-        print(f"Training data size: {train_size}")
-        
-        train_data = scaled_data[:train_size]
-        test_data = scaled_data[train_size - seq_length:]
-        
-        # Create sequences
-        train_X, train_y = create_sequences(train_data, seq_length)
-        test_X, test_y = create_sequences(test_data, seq_length)
-        
-        print(f"Training sequences: {len(train_X)}, Testing sequences: {len(test_X)}")
-        
-        # Check if we have enough sequences
-        if len(train_X) < 10 or len(test_X) < 3:
-            return jsonify({
-                'error': f'Not enough sequences generated. Try a shorter sequence length. Training: {len(train_X)}, Testing: {len(test_X)}'
-            }), 400
-        
-        # Reshape input
-        train_X = np.reshape(train_X, (train_X.shape[0], train_X.shape[1], 1))
-        test_X = np.reshape(test_X, (test_X.shape[0], test_X.shape[1], 1))
-        
-        print(f"Input shape: {train_X.shape}")
-        
-        # Build a simpler LSTM model for stability
-        lstm_model = Sequential()
-        lstm_model.add(LSTM(units=50, input_shape=(train_X.shape[1], 1)))
-        lstm_model.add(Dropout(0.2))
-        lstm_model.add(Dense(units=1))
-        
-        # Compile model
-        lstm_model.compile(optimizer=Adam(learning_rate=0.001), loss='mean_squared_error')
-        
-        print("Model compiled, beginning training...")
-        
-        # Use early stopping
-        early_stopping = tf.keras.callbacks.EarlyStopping(
-            monitor='val_loss',
-            patience=2,
-            restore_best_weights=True
-        )
-        
-        # Train model (using epochs=10 instead of 0)
-        lstm_model.fit(
-            train_X, 
-            train_y, 
-            epochs=50, 
-            batch_size=min(8, len(train_X)), 
-            validation_split=0.15, 
-            verbose=1,
-            callbacks=[early_stopping]
-        )
-        
-        print("Model training complete, making predictions...")
-        
-        # Predict
-        predictions = lstm_model.predict(test_X)
-        predictions = scaler.inverse_transform(predictions)
-        actual_prices = scaler.inverse_transform(test_y.reshape(-1, 1))
-        
-        # Calculate metrics
-        mae = mean_absolute_error(actual_prices, predictions)
-        mse = mean_squared_error(actual_prices, predictions)
-        rmse = np.sqrt(mse)
-        r2 = r2_score(actual_prices, predictions)
-        
-        print(f"Metrics - MAE: {mae}, MSE: {mse}, RMSE: {rmse}, R²: {r2}")
-        
-        # Predict future using a simpler approach
-        # Get the last known actual value (most recent price)
-        last_actual_value = df[column].iloc[-1]
-        
-        # Generate future dates
-        last_date = pd.to_datetime(df['Date'].iloc[-1])
-        future_dates = [(last_date + pd.Timedelta(days=i)).strftime('%Y-%m-%d') for i in range(1, 4)]
-        
-        # Make a simple autoregressive forecast for the next 3 days
-        # Using random fluctuation from the previous value for realism
-        future_predictions = []
-        current_value = last_actual_value
-        
-        for i in range(3):
-            # Add random fluctuation of up to ±1.5% for a realistic forecast
-            fluctuation = np.random.uniform(-0.015, 0.015) 
-            next_value = current_value * (1 + fluctuation)
-            future_predictions.append(next_value)
-            current_value = next_value  # Use previous prediction for next step
-        
-        future_predictions = np.array(future_predictions).reshape(-1, 1)
-        
-        print(f"Future predictions: {future_predictions.flatten()}")
-        print(f"Future dates: {future_dates}")
+        df, error = _request_frame(data)
+        if error:
+            return error
+        params = {
+            'column': data.get('column'),
+            'seq_length': data.get('seq_length', 10),
+            'ticker': data.get('ticker')
+        }
         
-        # Get test dates for plotting
-        test_dates = df['Date'][train_size:].tolist()
+        if data.get('async'):
+            payload, status = submit_model_job('lstm', df, params)
+            return jsonify(payload), status
         
-        return jsonify({
-            'metrics': {
-                'mae': float(mae),
-                'mse': float(mse),
-                'rmse': float(rmse),
-                'r2': float(r2)
-            },
-            'predictions': predictions.flatten().tolist(),
-            'future_predictions': future_predictions.flatten().tolist(),
-            'future_dates': future_dates,
-            'test_dates': [(date.strftime('%Y-%m-%d') if hasattr(date, 'strftime') else str(date)) for date in test_dates[seq_length:]]
-        })
+        payload, status = run_lstm(df, **params)
+        observe_training('lstm', payload)
+        return jsonify(payload), status
     except Exception as e:
-        import traceback
-        print(f"Error in lstm_model: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in lstm_model: %s", e)
         return jsonify({'error': f'Error processing LSTM model: {str(e)}'}), 500
 
 # API endpoint for Prophet model
@@ -777,132 +880,289 @@ def lstm_model():
 def prophet_model():
     try:
         data = request.json
-        df = pd.DataFrame(data.get('data'))
-        column = data.get('column')
-        
-        print(f"Running Prophet model for column: {column}")
-        print(f"Data shape: {df.shape}")
-        
-        # Validate inputs
-        if df.empty:
-            return jsonify({'error': 'Empty dataset provided'}), 400
-        if column not in df.columns:
-            return jsonify({'error': f'Column {column} not found in data'}), 400
-        if 'Date' not in df.columns:
-            return jsonify({'error': 'Date column not found in data'}), 400
-            
-        # Parse dates safely
-        df = safe_parse_dates(df)
-        print(f"Date range: {df['Date'].min()} to {df['Date'].max()}")
-        
-        # Prepare data for Prophet
-        prophet_data = df[['Date', column]]
-        prophet_data = prophet_data.rename(columns={'Date': 'ds', column: 'y'})
-        
-        print(f"Data points available: {len(prophet_data)}")
+        df, error = _request_frame(data)
+        if error:
+            return error
+        params = {
+            'column': data.get('column'),
+            'ticker': data.get('ticker'),
+            'method': data.get('method', 'prophet')
+        }
+        if params['method'] not in ('prophet', 'fast'):
+            return jsonify({'error': "method must be 'prophet' or 'fast'"}), 400
         
-        # Check if we have enough data for Prophet
-        if len(prophet_data) < 10:
-            return jsonify({'error': 'Not enough data points for Prophet model. Need at least 10.'}), 400
+        # The fast method answers in milliseconds, so it never needs a job
+        if data.get('async') and params['method'] != 'fast':
+            payload, status = submit_model_job('prophet', df, params)
+            return jsonify(payload), status
         
-        try:
-            # Create and fit Prophet model
-            prophet_model = Prophet(daily_seasonality=False, weekly_seasonality=True, yearly_seasonality=False)
-            prophet_model.fit(prophet_data)
-            
-            print("Prophet model trained successfully")
-            
-            # Forecast future
-            future = prophet_model.make_future_dataframe(periods=7)
-            forecast = prophet_model.predict(future)
-            
-            print(f"Forecast generated for {len(forecast)} days")
-            
-            # Process results for frontend
-            forecast_dict = {
-                'ds': forecast['ds'].dt.strftime('%Y-%m-%d').tolist(),
-                'yhat': forecast['yhat'].tolist(),
-                'yhat_lower': forecast['yhat_lower'].tolist(),
-                'yhat_upper': forecast['yhat_upper'].tolist(),
-                'trend': forecast['trend'].tolist(),
-            }
-            
-            if 'weekly' in forecast.columns:
-                forecast_dict['weekly'] = forecast['weekly'].tolist()
-            if 'yearly' in forecast.columns:
-                forecast_dict['yearly'] = forecast['yearly'].tolist()
-            
-            return jsonify({
-                'forecast': forecast_dict,
-                'components': {
-                    'trend': forecast['trend'].tolist(),
-                    'dates': forecast['ds'].dt.strftime('%Y-%m-%d').tolist()
-                }
-            })
-        except Exception as prophet_error:
-            print(f"Prophet model error: {str(prophet_error)}")
-            
-            # Fall back to a simple prediction model if Prophet fails
-            print("Falling back to simple prediction model")
-            
-            # Get last value
-            last_value = df[column].iloc[-1]
-            
-            # Generate future dates for 7 days
-            last_date = df['Date'].iloc[-1]
-            future_dates = [(last_date + pd.Timedelta(days=i)).strftime('%Y-%m-%d') for i in range(1, 8)]
-            
-            # Generate simple predictions with random fluctuations
-            predictions = []
-            upper_bounds = []
-            lower_bounds = []
-            current_value = last_value
-            
-            for i in range(7):
-                # Add random fluctuation of up to ±1.5% for main prediction
-                fluctuation = np.random.uniform(-0.015, 0.015) 
-                next_value = current_value * (1 + fluctuation)
-                predictions.append(next_value)
-                
-                # Add bounds
-                upper_bounds.append(next_value * 1.05)  # 5% higher
-                lower_bounds.append(next_value * 0.95)  # 5% lower
-                
-                current_value = next_value
-            
-            # Create forecast dict in Prophet format
-            forecast_dict = {
-                'ds': future_dates,
-                'yhat': predictions,
-                'yhat_lower': lower_bounds,
-                'yhat_upper': upper_bounds,
-                'trend': predictions,
-            }
-            
-            print("Fallback prediction generated successfully")
-            
-            return jsonify({
-                'forecast': forecast_dict,
-                'components': {
-                    'trend': predictions,
-                    'dates': future_dates
-                },
-                'warning': 'Using fallback prediction due to Prophet model error'
-            })
+        payload, status = run_prophet(df, **params)
+        observe_training('prophet', payload)
+        return jsonify(payload), status
             
     except Exception as e:
-        import traceback
-        print(f"Error in prophet_model: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in prophet_model: %s", e)
         return jsonify({'error': f'Error processing Prophet model: {str(e)}'}), 500
 
+# API endpoint to forecast many tickers and columns with Prophet at once
+@app.route('/api/prophet/batch', methods=['POST'])
+def prophet_batch():
+    data = request.json or {}
+    tickers = data.get('tickers')
+    if tickers == 'all':
+        tickers = sorted(VALID_TICKERS)
+    columns = data.get('columns') or ['Close']
+    method = data.get('method', 'prophet')
+    if method not in ('prophet', 'fast'):
+        return jsonify({'error': "method must be 'prophet' or 'fast'"}), 400
+    if not isinstance(tickers, list) or not tickers or not isinstance(columns, list):
+        return jsonify({'error': "Provide 'tickers' as a list or 'all', and 'columns' as a list"}), 400
+    tickers = list(dict.fromkeys(str(t).strip() for t in tickers if str(t).strip()))
+    if len(tickers) > BATCH_MAX_TICKERS:
+        return jsonify({'error': f'At most {BATCH_MAX_TICKERS} tickers per batch'}), 400
+    try:
+        start_date = datetime.datetime.strptime(data.get('start_date'), '%Y-%m-%d').date()
+        end_date = datetime.datetime.strptime(data.get('end_date'), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return jsonify({'error': 'start_date and end_date must be YYYY-MM-DD'}), 400
+    
+    # Function to load one ticker, reporting a failure instead of raising.
+    # Returns (df, source, error).
+    def load(ticker):
+        try:
+            df, data_source = load_stock_frame(ticker, start_date, end_date)
+        except Exception as e:
+            logger.error("Error loading %s in Prophet batch: %s", ticker, e)
+            return None, None, (500, str(e))
+        if df is None:
+            return None, None, (404, f'No data available for ticker {ticker} from any source')
+        return df, data_source, None
+    
+    started = time.perf_counter()
+    frames = dict(zip(tickers, _batch_executor.map(load, tickers)))
+    
+    pool = get_prophet_pool()
+    results = []
+    futures = {}
+    for ticker in tickers:
+        df, data_source, error = frames[ticker]
+        for column in columns:
+            if error is not None:
+                results.append({'ticker': ticker, 'column': column, 'status': error[0], 'error': error[1]})
+                continue
+            future = pool.submit(run_prophet, df[['Date', column]] if column in df.columns else df, column,
+                                 ticker=ticker, method=method)
+            futures[future] = (ticker, column, data_source)
+    
+    for future in as_completed(futures):
+        ticker, column, data_source = futures[future]
+        try:
+            payload, status = future.result()
+        except Exception as e:
+            logger.error("Prophet batch error for %s/%s: %s", ticker, column, e)
+            payload, status = {'error': f'Error processing Prophet model: {e}'}, 500
+        observe_training('prophet', payload)
+        results.append({'ticker': ticker, 'column': column, 'source': data_source, 'status': status, **payload})
+    
+    order = {(ticker, column): i for i, (ticker, column) in
+             enumerate((t, c) for t in tickers for c in columns)}
+    results.sort(key=lambda result: order[(result['ticker'], result['column'])])
+    return jsonify({
+        'results': results,
+        'workers': PROPHET_BATCH_WORKERS,
+        'elapsed': round(time.perf_counter() - started, 3)
+    })
+
+# API endpoint to poll a training job
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def model_job_status(job_id):
+    job = model_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job {job_id}'}), 404
+    
+    status = job_status(job)
+    info = job_progress(job_id)
+    response = {
+        'job_id': job_id,
+        'model': job['model'],
+        'status': status,
+        'progress': 100 if status == 'done' else info.get('progress', 0),
+        'message': info.get('message'),
+        'epoch': info.get('epoch'),
+        'elapsed': round((job['finished_at'] or time.time()) - job['created_at'], 3)
+    }
+    if status == 'failed':
+        response['error'] = str(job['future'].exception())
+    return jsonify(response)
+
+# API endpoint to fetch a finished job's result (same payload as the synchronous call)
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def model_job_result(job_id):
+    job = model_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job {job_id}'}), 404
+    
+    status = job_status(job)
+    if status == 'done':
+        payload, code = job['future'].result()
+        return jsonify(payload), code
+    if status == 'failed':
+        return jsonify({'error': f"Error processing {job['model']} model: {job['future'].exception()}"}), 500
+    if status == 'cancelled':
+        return jsonify({'error': 'Job was cancelled'}), 410
+    return jsonify({'job_id': job_id, 'status': status}), 202
+
+# API endpoint to cancel a training job
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_model_job(job_id):
+    job = model_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job {job_id}'}), 404
+    
+    request_job_cancel(job)
+    return jsonify({'job_id': job_id, 'status': job_status(job)})
+
+# API endpoint to backtest the LSTM or Transformer over walk-forward folds
+@app.route('/api/backtest', methods=['POST'])
+def backtest():
+    data = request.json or {}
+    model_type = data.get('model', 'lstm')
+    if model_type not in NETWORK_SPECS:
+        return jsonify({'error': f"model must be one of {sorted(NETWORK_SPECS)}"}), 400
+    window = data.get('window', 'expanding')
+    if window not in ('expanding', 'rolling'):
+        return jsonify({'error': "window must be 'expanding' or 'rolling'"}), 400
+    try:
+        folds = int(data.get('folds', 5))
+        test_size = data.get('test_size')
+        test_size = int(test_size) if test_size is not None else None
+        min_train = data.get('min_train')
+        min_train = int(min_train) if min_train is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'folds, test_size and min_train must be integers'}), 400
+    if not 1 <= folds <= BACKTEST_MAX_FOLDS:
+        return jsonify({'error': f'folds must be between 1 and {BACKTEST_MAX_FOLDS}'}), 400
+    
+    try:
+        df, error = _request_frame(data)
+        if error:
+            return error
+        params = {key: data[key] for key in ('seq_length', 'sequence_length') if key in data}
+        payload, status = run_backtest(df, data.get('column'), model_type, params, folds=folds,
+                                       test_size=test_size, min_train=min_train, window=window,
+                                       max_epochs=data.get('epochs'))
+        return jsonify(payload), status
+    except Exception as e:
+        logger.exception("Error in backtest: %s", e)
+        return jsonify({'error': f'Error running backtest: {str(e)}'}), 500
+
+# API endpoint to search LSTM or Transformer hyperparameters over a grid
+@app.route('/api/search', methods=['POST'])
+def hyperparameter_search():
+    data = request.json or {}
+    model_type = data.get('model', 'lstm')
+    if model_type not in NETWORK_SPECS:
+        return jsonify({'error': f"model must be one of {sorted(NETWORK_SPECS)}"}), 400
+    grid = data.get('grid') or {}
+    if not isinstance(grid, dict):
+        return jsonify({'error': "grid must be an object of parameter values or ranges"}), 400
+    try:
+        eta = int(data.get('eta', SEARCH_ETA))
+        min_epochs = int(data.get('min_epochs', SEARCH_MIN_EPOCHS))
+        max_epochs = data.get('max_epochs')
+        max_epochs = int(max_epochs) if max_epochs is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'eta, min_epochs and max_epochs must be integers'}), 400
+    if eta < 2 or min_epochs < 1 or (max_epochs is not None and max_epochs < 1):
+        return jsonify({'error': 'eta must be at least 2, and min_epochs and max_epochs at least 1'}), 400
+    
+    try:
+        df, error = _request_frame(data)
+        if error:
+            return error
+        payload, status = run_search(df, data.get('column'), model_type, grid, eta=eta,
+                                     min_epochs=min_epochs, max_epochs=max_epochs)
+        return jsonify(payload), status
+    except Exception as e:
+        logger.exception("Error in hyperparameter search: %s", e)
+        return jsonify({'error': f'Error running search: {str(e)}'}), 500
+
+# API endpoint to predict with a stored LSTM or Transformer without retraining
+@app.route('/api/predict', methods=['POST'])
+def predict():
+    data = request.json or {}
+    model_id = data.get('model_id') or ''
+    if not MODEL_ID_PATTERN.match(model_id):
+        return jsonify({'error': 'model_id must be an id returned by /api/lstm or /api/transformer'}), 400
+    try:
+        windows = int(data.get('windows', 1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'windows must be an integer'}), 400
+    if not 1 <= windows <= PREDICT_MAX_WINDOWS:
+        return jsonify({'error': f'windows must be between 1 and {PREDICT_MAX_WINDOWS}'}), 400
+    
+    try:
+        server = get_model_server(model_id)
+        if server is None:
+            return jsonify({'error': f'Unknown model_id {model_id}', 'code': 'model_not_found'}), 404
+        df, error = _request_frame(data)
+        if error:
+            return error
+        payload, status = run_predict(server, df, data.get('column'), windows=windows)
+        return jsonify(payload), status
+    except Exception as e:
+        logger.exception("Error in prediction: %s", e)
+        return jsonify({'error': f'Error running prediction: {str(e)}'}), 500
+
+# API endpoint listing the models loaded for serving and their batching statistics
+@app.route('/api/predict/models', methods=['GET'])
+def predict_models():
+    return jsonify({
+        'models': [server.stats() for server in serving_models.values()],
+        'registry': serving_models.stats(),
+        'batch_window_ms': PREDICT_BATCH_WINDOW * 1000,
+        'max_batch_rows': PREDICT_MAX_BATCH
+    })
+
+# Function to report the peak resident memory of this process in MB
+def _max_rss_mb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except (ImportError, AttributeError):
+        return None
+
+# Function to summarize startup time and the cost of each imported stack
+def startup_report():
+    return {
+        'startup_seconds': startup_seconds,
+        'preloaded_stacks': PRELOAD_STACKS,
+        # A stack counts as loaded once any of its lazy modules has been imported;
+        # endpoints often need only part of a stack (ADF never touches seasonal)
+        'loaded_stacks': [name for name, modules in ML_STACKS.items() if any(m.loaded for m in modules)],
+        'loaded_modules': [m._name for modules in ML_STACKS.values() for m in modules if m.loaded],
+        'import_costs': dict(import_costs),
+        'max_rss_mb': _max_rss_mb()
+    }
+
+# API endpoint to inspect startup time and import costs
+@app.route('/api/startup-report', methods=['GET'])
+def startup_report_endpoint():
+    return jsonify(startup_report())
+
 # Main route to serve the HTML frontend
 @app.route('/')
 def index():
     return render_template('index.html')
 
+# Load any requested stacks now so the startup time below includes them
+if PRELOAD_STACKS:
+    preload_stacks(PRELOAD_STACKS)
+startup_seconds = round(time.perf_counter() - _process_start, 4)
+
 # Run the Flask app
 if __name__ == '__main__':
+    logger.info("Startup report: %s", json.dumps(startup_report()))
     app.run(debug=True, port=5000)
-
-
@@ -0,0 +1,204 @@
+# Benchmark suite for the data ingestion, serialization and model paths of the app.
+#
+# Generates deterministic synthetic histories (app.SyntheticMarket, seeded per
+# ticker) at several sizes, times each stage directly or through the
+# Flask test client, writes a JSON report and optionally compares it against a
+# stored baseline. Runs fully offline.
+#
+#   python benchmark.py                                  # 1k, 100k and 1M rows
+#   python benchmark.py --sizes 1000 --model-max-rows 1000 --output before.json
+#   python benchmark.py --baseline before.json --threshold 0.2
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+BENCHMARK_TICKER = 'BENCH.US'
+BENCHMARK_COLUMN = 'Close'
+
+# Function to build a synthetic OHLCV history with app.SyntheticMarket, the
+# engine behind the demo data. Histories too long for daily bars use minute bars.
+def synthetic_history(app, n_rows, ticker=BENCHMARK_TICKER):
+    freq = 'D' if n_rows <= 100000 else 'min'
+    market = app.SyntheticMarket([ticker], '2000-01-03', periods=n_rows, freq=freq)
+    return market.frames()[ticker]
+
+# Function to time fn over several runs. Returns (summary, last result).
+def timed(fn, repeat):
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - started)
+    return {
+        'median': statistics.median(durations),
+        'min': min(durations),
+        'runs': len(durations)
+    }, result
+
+# Function to fail loudly when an endpoint doesn't answer with the expected status
+def check_response(response, stage, expected=200):
+    if response.status_code != expected:
+        raise RuntimeError(f"{stage}: HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+# Function to run every stage for one history size
+def benchmark_size(app, n_rows, repeat, model_max_rows):
+    from forecasting import MODEL_STORE_DIR, load_trained_model, sliding_windows, window_dataset
+    from frames import safe_parse_dates
+    client = app.app.test_client()
+    results = {}
+
+    def record(stage, summary, rows=n_rows):
+        summary['rows_per_second'] = rows / summary['median'] if summary['median'] > 0 else None
+        results[stage] = summary
+        print(f"  {stage:<20} median {summary['median'] * 1000:10.2f} ms   min {summary['min'] * 1000:10.2f} ms")
+
+    summary, df = timed(lambda: synthetic_history(app, n_rows), repeat)
+    record('generate', summary)
+
+    # Parse: dates arriving as strings, as they do from the browser
+    raw = df.assign(Date=df['Date'].dt.strftime('%Y-%m-%d %H:%M:%S'))
+    summary, _ = timed(lambda: safe_parse_dates(raw.copy(), source='benchmark'), repeat)
+    record('parse', summary)
+
+    # Normalize: the fallback/column-filling path every provider frame goes through
+    summary, _ = timed(lambda: app.load_stock_frame(
+        BENCHMARK_TICKER, df['Date'].iloc[0].date(), df['Date'].iloc[-1].date(),
+        fetch=lambda *args: (df.copy(), 'Benchmark')), repeat)
+    record('normalize', summary)
+
+    # Serialize: /api/stock-data served from a warm cache, so only the response is timed
+    start, end = df['Date'].iloc[0].date(), df['Date'].iloc[-1].date()
+    app.stock_data_cache.set(app.stock_cache_key('stooq', BENCHMARK_TICKER, start, end), df)
+    request = {'ticker': BENCHMARK_TICKER, 'start_date': start.isoformat(), 'end_date': end.isoformat()}
+    dataset_id = None
+    for response_format in ('records', 'columns', 'binary'):
+        summary, response = timed(lambda: check_response(client.post(
+            '/api/stock-data', json=dict(request, format=response_format)), 'serialize'), repeat)
+        summary['bytes'] = len(response.get_data())
+        record(f'serialize_{response_format}', summary)
+        if response_format == 'columns':
+            dataset_id = response.get_json()['dataset_id']
+
+    # Window: strided windows plus one pass over the tf.data pipeline used in training
+    values = df[[BENCHMARK_COLUMN]].to_numpy(dtype=np.float32)
+
+    def window():
+        sliding_windows(values, 10)
+        for _ in window_dataset(values, 10, 0, len(values) - 10, 256):
+            pass
+    summary, _ = timed(window, repeat)
+    record('window', summary)
+
+    if n_rows > model_max_rows:
+        for stage in ('forecast_fast', 'train_epoch', 'predict'):
+            results[stage] = {'skipped': f'more than --model-max-rows ({model_max_rows}) rows'}
+        return results
+
+    summary, _ = timed(lambda: check_response(client.post('/api/prophet', json={
+        'dataset_id': dataset_id, 'column': BENCHMARK_COLUMN, 'method': 'fast'}), 'forecast_fast'), repeat)
+    record('forecast_fast', summary)
+
+    # Train once; the endpoint reports its own fit time and epoch count
+    response = check_response(client.post('/api/lstm', json={
+        'dataset_id': dataset_id, 'column': BENCHMARK_COLUMN, 'seq_length': 10}), 'train')
+    payload = response.get_json()
+    per_epoch = payload['training_seconds'] / max(payload['epochs'], 1)
+    record('train_epoch', {'median': per_epoch, 'min': per_epoch, 'runs': payload['epochs']})
+
+    # Predict every window with the stored model
+    model, scaler = load_trained_model(os.path.join(MODEL_STORE_DIR, payload['model_id']))
+    scaled = scaler.transform(df[[BENCHMARK_COLUMN]].to_numpy()).astype(np.float32)
+    summary, _ = timed(lambda: model.predict(window_dataset(scaled, 10, 0, len(scaled) - 10, 256), verbose=0), repeat)
+    record('predict', summary)
+    return results
+
+# Function to compare stage medians against a baseline report.
+# Returns a list of (size, stage, baseline, current, ratio) for slowdowns over threshold.
+def compare_reports(report, baseline, threshold):
+    regressions = []
+    print("\nComparison with baseline (current / baseline median):")
+    for size, stages in report['results'].items():
+        for stage, current in stages.items():
+            previous = baseline.get('results', {}).get(size, {}).get(stage)
+            if not previous or 'median' not in previous or 'median' not in current:
+                continue
+            ratio = current['median'] / previous['median'] if previous['median'] > 0 else float('inf')
+            flag = ''
+            if ratio > 1 + threshold:
+                flag = '  REGRESSION'
+                regressions.append((size, stage, previous['median'], current['median'], ratio))
+            elif ratio < 1 - threshold:
+                flag = '  faster'
+            print(f"  {size:>8} {stage:<20} {ratio:6.2f}x{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark data ingestion, serialization and model endpoints.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='history sizes in rows')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage (the median is reported)')
+    parser.add_argument('--model-max-rows', type=int, default=1000,
+                        help='largest size to run the forecast, training and prediction stages on')
+    parser.add_argument('--output', default='benchmark_report.json', help='where to write the JSON report')
+    parser.add_argument('--baseline', help='report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slowdown that counts as a regression (default 0.2 = 20%%)')
+    args = parser.parse_args()
+
+    # Offline and isolated: no provider calls, and nothing written to the real stores
+    scratch = tempfile.mkdtemp(prefix='stock-benchmark-')
+    os.environ['STOCK_DATA_OFFLINE'] = '1'
+    os.environ.setdefault('STOCK_STORE_DIR', os.path.join(scratch, 'data_store'))
+    os.environ.setdefault('MODEL_STORE_DIR', os.path.join(scratch, 'model_store'))
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('STOCK_CACHE_MAX_BYTES', str(4 * 1024 ** 3))
+
+    started = time.perf_counter()
+    import app
+    import_seconds = time.perf_counter() - started
+
+    report = {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat,
+            'app_import_seconds': import_seconds
+        },
+        'results': {}
+    }
+    for n_rows in args.sizes:
+        print(f"\n{n_rows} rows")
+        report['results'][str(n_rows)] = benchmark_size(app, n_rows, args.repeat, args.model_max_rows)
+        app.stock_data_cache.clear()
+        app.dataset_registry.clear()
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than the baseline by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+# Chart downsampling: LTTB and the per-series resolution pyramids
+import pandas as pd
+import numpy as np
+import os
+
+from storage import StockDataCache
+from frames import epoch_millis
+
+# Chart decimation: a chart is only ~1-2k pixels wide, so long histories are
+# served from per-dataset resolution pyramids instead of as every row. Each
+# level aggregates CHART_PYRAMID_FACTOR rows of the one below: OHLC candles
+# keep first/max/min/last and summed volume, and line series keep each
+# bucket's min and max point so spikes survive. A zoom range is answered from
+# the finest level that fits the requested width, then line series are
+# reduced with Largest-Triangle-Three-Buckets, so the work per request depends
+# on the width rather than the history length. Levels go all the way up to
+# CHART_MIN_WIDTH rows so even the narrowest chart has a level that fits.
+CHART_PYRAMID_FACTOR = 4
+CHART_MIN_WIDTH = 3
+CHART_LTTB_OVERSAMPLE = 4  # line points fed to LTTB per output point, at most
+CHART_DEFAULT_WIDTH = 1200
+CHART_MAX_WIDTH = 10000
+CHART_PYRAMID_MAX_BYTES = int(os.environ.get('CHART_PYRAMID_MAX_BYTES', 256 * 1024 * 1024))
+chart_pyramids = StockDataCache(CHART_PYRAMID_MAX_BYTES, sizeof=lambda pyramid: pyramid.nbytes)
+
+# Function to pick n_out points of a line with Largest-Triangle-Three-Buckets.
+# Returns the indices of the selected points.
+def lttb(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # First and last points are kept; the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    edges = np.append(edges, n)
+    x_sums = np.concatenate([[0.0], np.cumsum(x)])
+    y_sums = np.concatenate([[0.0], np.cumsum(y)])
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        next_lo, next_hi = edges[i + 1], edges[i + 2]
+        count = next_hi - next_lo
+        avg_x = (x_sums[next_hi] - x_sums[next_lo]) / count
+        avg_y = (y_sums[next_hi] - y_sums[next_lo]) / count
+        areas = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+# Function to group a level's arrays into buckets of CHART_PYRAMID_FACTOR rows,
+# padding the last bucket with its final value (or with fill)
+def _pyramid_buckets(values, fill=None):
+    pad = -len(values) % CHART_PYRAMID_FACTOR
+    if fill is None:
+        values = np.pad(values, (0, pad), mode='edge')
+    else:
+        values = np.pad(values, (0, pad), constant_values=fill)
+    return values.reshape(-1, CHART_PYRAMID_FACTOR)
+
+class ChartPyramid:
+    """
+    Resolution levels for one dataset. Level 0 is the full-resolution data;
+    each level holds 'Date' (bucket start, epoch ms) and the OHLCV columns,
+    plus '<column>:min', '<column>:min_at', '<column>:max' and
+    '<column>:max_at' for every price column, used for line series.
+    """
+    def __init__(self, df):
+        df = df.sort_values('Date')
+        base = {'Date': epoch_millis(pd.to_datetime(df['Date']))}
+        self.columns = [col for col in df.columns
+                        if col != 'Date' and pd.api.types.is_numeric_dtype(df[col])]
+        for col in self.columns:
+            # Gaps would break the min/max reductions
+            values = df[col].astype(float).ffill().bfill().to_numpy()
+            base[col] = values
+            base[f'{col}:min'] = base[f'{col}:max'] = values
+            base[f'{col}:min_at'] = base[f'{col}:max_at'] = base['Date']
+        self.levels = [base]
+        while len(self.levels[-1]['Date']) > CHART_MIN_WIDTH:
+            self.levels.append(self._coarsen(self.levels[-1]))
+        # Level 0 shares its value and date arrays between keys, so count each array once
+        arrays = {id(values): values for level in self.levels for values in level.values()}
+        self.nbytes = sum(values.nbytes for values in arrays.values())
+    
+    def _coarsen(self, level):
+        coarse = {'Date': _pyramid_buckets(level['Date'])[:, 0]}
+        for col in self.columns:
+            if col == 'Volume':
+                coarse[col] = _pyramid_buckets(level[col], fill=0).sum(axis=1)
+            elif col in ('Open', 'High', 'Low'):
+                reduce = {'Open': lambda b: b[:, 0], 'High': lambda b: b.max(axis=1), 'Low': lambda b: b.min(axis=1)}[col]
+                coarse[col] = reduce(_pyramid_buckets(level[col]))
+            else:
+                coarse[col] = _pyramid_buckets(level[col])[:, -1]
+            for side, pick in (('min', np.argmin), ('max', np.argmax)):
+                buckets = _pyramid_buckets(level[f'{col}:{side}'])
+                rows = np.arange(len(buckets))
+                picked = pick(buckets, axis=1)
+                coarse[f'{col}:{side}'] = buckets[rows, picked]
+                coarse[f'{col}:{side}_at'] = _pyramid_buckets(level[f'{col}:{side}_at'])[rows, picked]
+        return coarse
+    
+    # Rows [lo, hi) of a level whose bucket overlaps [start, end] (epoch ms)
+    def _span(self, level, start, end):
+        dates = self.levels[level]['Date']
+        lo = max(int(np.searchsorted(dates, start, side='right')) - 1, 0)
+        hi = int(np.searchsorted(dates, end, side='right'))
+        return lo, hi
+    
+    # Finest level with at most max_rows buckets in the range
+    def _level_for(self, start, end, max_rows):
+        for level in range(len(self.levels)):
+            lo, hi = self._span(level, start, end)
+            if hi - lo <= max_rows:
+                return level, lo, hi
+        return level, lo, hi
+    
+    # Candles for [start, end] at no more than width bars
+    def ohlc(self, start, end, width):
+        level, lo, hi = self._level_for(start, end, width)
+        data = {col: self.levels[level][col][lo:hi] for col in ['Date'] + self.columns}
+        return level, data
+    
+    # LTTB-reduced {column: (dates, values)} for [start, end] at no more than width points
+    def lines(self, columns, start, end, width):
+        # Levels above 0 contribute two points (min and max) per bucket
+        level, lo, hi = self._level_for(start, end, CHART_LTTB_OVERSAMPLE * width // 2)
+        series = {}
+        for col in columns:
+            values = self.levels[level]
+            if level == 0:
+                x, y = values['Date'][lo:hi], values[col][lo:hi]
+            else:
+                x = np.column_stack([values[f'{col}:min_at'][lo:hi], values[f'{col}:max_at'][lo:hi]])
+                y = np.column_stack([values[f'{col}:min'][lo:hi], values[f'{col}:max'][lo:hi]])
+                # Keep each bucket's pair in time order
+                order = np.argsort(x, axis=1, kind='stable')
+                x = np.take_along_axis(x, order, axis=1).ravel()
+                y = np.take_along_axis(y, order, axis=1).ravel()
+            keep = lttb(x, y, width)
+            series[col] = (x[keep], y[keep])
+        return level, series
+
+# Function to get (building if needed) the pyramid for a registered dataset
+def chart_pyramid(dataset_id, df):
+    pyramid = chart_pyramids.get(dataset_id)
+    if pyramid is None:
+        pyramid = ChartPyramid(df)
+        chart_pyramids.set(dataset_id, pyramid)
+    return pyramid
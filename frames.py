@@ -0,0 +1,202 @@
+# Date parsing and the JSON/binary encodings of OHLCV frames
+import pandas as pd
+import datetime
+import json
+import struct
+
+from observability import logger
+
+# Date formats tried, in order, when detecting how a date column is encoded
+DATE_FORMAT_CANDIDATES = [
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%a, %d %b %Y %H:%M:%S GMT',  # Flask's jsonify output for datetimes
+    '%d-%m-%Y',
+    '%m/%d/%Y',
+    '%Y/%m/%d',
+    '%d/%m/%Y'
+]
+
+# Number of values from each end of a column used to detect its format
+DATE_FORMAT_SAMPLE_SIZE = 20
+
+# Detected format per (source, column), so later frames parse in a single pass
+_date_format_cache = {}
+
+# Function to detect the date format of a column from a small sample
+def _detect_date_format(values):
+    values = values.dropna()
+    if values.empty:
+        return None
+    if len(values) > 2 * DATE_FORMAT_SAMPLE_SIZE:
+        values = pd.concat([values.head(DATE_FORMAT_SAMPLE_SIZE), values.tail(DATE_FORMAT_SAMPLE_SIZE)])
+    sample = values.astype(str)
+    for fmt in DATE_FORMAT_CANDIDATES:
+        try:
+            pd.to_datetime(sample, format=fmt)
+            return fmt
+        except (ValueError, TypeError):
+            continue
+    return None
+
+# Function to parse values that don't follow any single known format
+def _parse_mixed_dates(values):
+    # Mixed naive and offset-aware strings are normalized to naive UTC
+    parsed = pd.to_datetime(values, format='mixed', errors='coerce', utc=True).dt.tz_localize(None)
+    missing = parsed.isna()
+    if missing.any():
+        # Example: "Mon, 03 Jun 2024 00:00:00 GMT" -> "03 Jun 2024"
+        extracted = values[missing].astype(str).str.extract(r'([0-9]{1,2}\s[A-Za-z]{3}\s[0-9]{4})')[0]
+        parsed[missing] = pd.to_datetime(extracted, format='%d %b %Y', errors='coerce')
+    return parsed
+
+# Function to safely parse dates
+def safe_parse_dates(df, date_column='Date', source=None):
+    """
+    Safely parse date strings in a DataFrame to datetime objects.
+    The format is detected once per (source, column) and reused, so each
+    call is a single vectorized pass; columns that are already datetime64
+    are left untouched.
+    
+    Parameters:
+    df (pd.DataFrame): DataFrame containing date column
+    date_column (str): Name of the date column
+    source (str): Where the frame came from (e.g. 'yahoo', 'client')
+    
+    Returns:
+    pd.DataFrame: DataFrame with properly parsed date column
+    """
+    if date_column not in df.columns:
+        logger.error("%s column not found in DataFrame", date_column)
+        return df
+    
+    values = df[date_column]
+    
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        try:
+            cache_key = (source, date_column)
+            fmt = _date_format_cache.get(cache_key)
+            parsed = None
+            
+            if fmt is not None:
+                parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+                if parsed.isna().sum() > values.isna().sum():
+                    # The source changed its format, detect it again
+                    parsed = None
+            
+            if parsed is None:
+                fmt = _detect_date_format(values)
+                if fmt is not None:
+                    _date_format_cache[cache_key] = fmt
+                    parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+                else:
+                    parsed = _parse_mixed_dates(values)
+            
+            # Values outside the detected format fall back to the slow path
+            unparsed = parsed.isna() & values.notna()
+            if unparsed.any():
+                parsed[unparsed] = _parse_mixed_dates(values[unparsed])
+            
+            # If still have NaN dates, create synthetic dates
+            if parsed.isna().any():
+                missing_count = int(parsed.isna().sum())
+                logger.warning("%s dates could not be parsed", missing_count)
+                # Create dates based on valid dates or current date
+                last_valid_date = parsed.max() if not pd.isna(parsed.max()) else datetime.datetime.now()
+                parsed[parsed.isna()] = pd.date_range(
+                    start=last_valid_date - pd.Timedelta(days=missing_count),
+                    periods=missing_count
+                )
+            df[date_column] = parsed
+        
+        except Exception as e:
+            logger.warning("Error in date parsing: %s", e)
+            # Last resort - create all dates based on index
+            logger.warning("Creating synthetic dates based on index")
+            end_date = datetime.datetime.now()
+            df[date_column] = pd.date_range(end=end_date, periods=len(df))
+    
+    # Remove timezone information if present (important for Prophet)
+    if getattr(df[date_column].dtype, 'tz', None) is not None:
+        df[date_column] = df[date_column].dt.tz_localize(None)
+    
+    # Sort by date
+    if not df[date_column].is_monotonic_increasing:
+        df = df.sort_values(date_column)
+    
+    return df
+
+# Magic bytes identifying the binary column layout produced by frame_to_binary
+BINARY_FRAME_MAGIC = b'SVPB'
+
+# Function to get a datetime column as int64 epoch milliseconds
+def epoch_millis(values):
+    return values.values.astype('datetime64[ms]').astype('int64')
+
+# Function to encode a frame as one JSON array per column, dates as epoch milliseconds
+def frame_to_columns(df):
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            columns[col] = epoch_millis(values).tolist()
+        elif values.hasnans:
+            columns[col] = values.astype(object).where(values.notna(), None).tolist()
+        else:
+            columns[col] = values.tolist()
+    return columns
+
+# Function to encode a frame as typed-array buffers a browser can wrap without parsing
+def frame_to_binary(df, extra_header=None):
+    """
+    Layout (little-endian):
+        4 bytes   magic b'SVPB'
+        4 bytes   uint32 header length
+        header    UTF-8 JSON, space padded so the first buffer is 8-byte aligned
+        buffers   one per column, each starting on an 8-byte boundary
+    
+    The header lists each column's name, dtype ('int64', 'float32' or
+    'float64'), byte offset from the start of the body and length in values,
+    so the browser can use e.g. new Float32Array(body, offset, length).
+    Dates are int64 epoch milliseconds, integer columns int64 and float
+    columns float32.
+    """
+    buffers = []
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            array = epoch_millis(values)
+        elif pd.api.types.is_integer_dtype(values):
+            array = values.values.astype('<i8')
+        elif pd.api.types.is_numeric_dtype(values):
+            array = values.values.astype('<f4')
+        else:
+            continue
+        buffers.append((str(col), array))
+    
+    def build_header(data_start):
+        offset = data_start
+        specs = []
+        for name, array in buffers:
+            specs.append({
+                'name': name,
+                'dtype': {'i8': 'int64', 'f4': 'float32'}[array.dtype.str[1:]],
+                'offset': offset,
+                'length': len(array)
+            })
+            offset += -(-array.nbytes // 8) * 8
+        header = dict(extra_header or {}, version=1, rows=len(df), columns=specs)
+        return json.dumps(header).encode('utf-8')
+    
+    # Offsets depend on the header size, so size it once and pad to a fixed length
+    header = build_header(0)
+    data_start = -(-(8 + len(header) + 16 * len(buffers) + 16) // 8) * 8
+    header = build_header(data_start)
+    header = header + b' ' * (data_start - 8 - len(header))
+    
+    parts = [BINARY_FRAME_MAGIC, struct.pack('<I', len(header)), header]
+    for _, array in buffers:
+        parts.append(array.tobytes())
+        parts.append(b'\0' * ((-array.nbytes) % 8))
+    return b''.join(parts)
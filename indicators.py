@@ -0,0 +1,320 @@
+# Streaming technical indicators with incremental updates per ticker
+import pandas as pd
+import numpy as np
+import json
+import hashlib
+import os
+import threading
+
+from lazy_imports import scipy_signal
+from storage import StockDataCache
+from frames import epoch_millis
+from providers import fetch_stock_frame, load_stock_frame
+
+# Technical indicators computed server-side over the normalized frames. Every
+# indicator is a recurrence that keeps only its tail state (running averages,
+# the last few values), so when a later request for the same ticker and start
+# date brings new bars, only those bars are computed. Exponential smoothers run
+# through scipy.signal.lfilter with the previous value as the filter state.
+# Smoothers are seeded with a simple average of their first period values,
+# matching the charts' JavaScript indicators.
+INDICATOR_STATE_MAX_BYTES = int(os.environ.get('INDICATOR_STATE_MAX_BYTES', 64 * 1024 * 1024))
+INDICATOR_MAX_SPECS = 50
+indicator_states = StockDataCache(INDICATOR_STATE_MAX_BYTES, sizeof=lambda series: series.nbytes)
+
+# Exponential smoothing seeded with the mean of the first period values
+class SeededEMA:
+    def __init__(self, period, alpha):
+        self.period = period
+        self.alpha = alpha
+        self.count = 0
+        self.seed_sum = 0.0
+        self.value = np.nan
+    
+    def update(self, values):
+        out = np.full(len(values), np.nan)
+        start = 0
+        if self.count < self.period:
+            start = min(self.period - self.count, len(values))
+            self.seed_sum += float(values[:start].sum())
+            self.count += start
+            if self.count < self.period:
+                return out
+            self.value = self.seed_sum / self.period
+            out[start - 1] = self.value
+        if start < len(values):
+            # y[n] = alpha * x[n] + (1 - alpha) * y[n - 1], continuing from the last value
+            smoothed, _ = scipy_signal.lfilter([self.alpha], [1.0, self.alpha - 1.0], values[start:],
+                                               zi=[(1.0 - self.alpha) * self.value])
+            out[start:] = smoothed
+            self.value = float(smoothed[-1])
+        return out
+
+# Rolling mean and population standard deviation carrying the last period - 1 values
+class RollingWindow:
+    def __init__(self, period):
+        self.period = period
+        self.tail = np.empty(0)
+    
+    def update(self, values):
+        buffer = np.concatenate([self.tail, values])
+        self.tail = buffer[-(self.period - 1):] if self.period > 1 else np.empty(0)
+        mean = np.full(len(values), np.nan)
+        std = np.full(len(values), np.nan)
+        if len(buffer) >= self.period:
+            # Window sums from cumulative sums, centered to limit cancellation
+            centered = buffer - buffer.mean()
+            sums = np.concatenate([[0.0], np.cumsum(centered)])
+            squares = np.concatenate([[0.0], np.cumsum(centered * centered)])
+            window_sum = sums[self.period:] - sums[:-self.period]
+            window_squares = squares[self.period:] - squares[:-self.period]
+            window_mean = window_sum / self.period
+            variance = np.maximum(window_squares / self.period - window_mean ** 2, 0.0)
+            # Window j ends at buffer[j + period - 1]; only the ones ending in values are new
+            count = min(len(window_mean), len(values))
+            mean[-count:] = window_mean[-count:] + buffer.mean()
+            std[-count:] = np.sqrt(variance[-count:])
+        return mean, std
+
+class Indicator:
+    inputs = ()
+    
+    def __init__(self, column='Close'):
+        self.column = column
+    
+    def label(self, base):
+        return base if self.column == 'Close' else f"{base}_{self.column}"
+    
+    @property
+    def required_columns(self):
+        return self.inputs or (self.column,)
+
+class SMA(Indicator):
+    def __init__(self, column='Close', period=20):
+        super().__init__(column)
+        self.period = period
+        self.window = RollingWindow(period)
+    
+    def outputs(self):
+        return [self.label(f"SMA_{self.period}")]
+    
+    def update(self, bars):
+        mean, _ = self.window.update(bars[self.column])
+        return [mean]
+
+class EMA(Indicator):
+    def __init__(self, column='Close', period=20):
+        super().__init__(column)
+        self.period = period
+        self.ema = SeededEMA(period, 2.0 / (period + 1))
+    
+    def outputs(self):
+        return [self.label(f"EMA_{self.period}")]
+    
+    def update(self, bars):
+        return [self.ema.update(bars[self.column])]
+
+# Wilder's RSI over close-to-close changes
+class RSI(Indicator):
+    def __init__(self, column='Close', period=14):
+        super().__init__(column)
+        self.period = period
+        self.gains = SeededEMA(period, 1.0 / period)
+        self.losses = SeededEMA(period, 1.0 / period)
+        self.previous = None
+    
+    def outputs(self):
+        return [self.label(f"RSI_{self.period}")]
+    
+    def update(self, bars):
+        values = bars[self.column]
+        out = np.full(len(values), np.nan)
+        if self.previous is None:
+            changes, offset = np.diff(values), 1
+        else:
+            changes, offset = np.diff(values, prepend=self.previous), 0
+        if len(values):
+            self.previous = values[-1]
+        avg_gain = self.gains.update(np.maximum(changes, 0.0))
+        avg_loss = self.losses.update(np.maximum(-changes, 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+        out[offset:] = np.where(np.isnan(avg_gain), np.nan, rsi)
+        return [out]
+
+class MACD(Indicator):
+    def __init__(self, column='Close', fast=12, slow=26, signal=9):
+        super().__init__(column)
+        if fast >= slow:
+            raise ValueError('macd fast period must be shorter than the slow period')
+        self.fast, self.slow, self.signal = fast, slow, signal
+        self.fast_ema = SeededEMA(fast, 2.0 / (fast + 1))
+        self.slow_ema = SeededEMA(slow, 2.0 / (slow + 1))
+        self.signal_ema = SeededEMA(signal, 2.0 / (signal + 1))
+    
+    def outputs(self):
+        suffix = f"{self.fast}_{self.slow}_{self.signal}"
+        return [self.label(f"MACD_{suffix}"), self.label(f"MACD_signal_{suffix}"), self.label(f"MACD_hist_{suffix}")]
+    
+    def update(self, bars):
+        values = bars[self.column]
+        macd = self.fast_ema.update(values) - self.slow_ema.update(values)
+        # The signal line starts once the slow EMA has its seed
+        signal_line = np.full(len(values), np.nan)
+        valid = ~np.isnan(macd)
+        signal_line[valid] = self.signal_ema.update(macd[valid])
+        return [macd, signal_line, macd - signal_line]
+
+class Bollinger(Indicator):
+    def __init__(self, column='Close', period=20, k=2.0):
+        super().__init__(column)
+        self.period, self.k = period, k
+        self.window = RollingWindow(period)
+    
+    def outputs(self):
+        suffix = f"{self.period}_{self.k:g}"
+        return [self.label(f"BB_upper_{suffix}"), self.label(f"BB_middle_{suffix}"), self.label(f"BB_lower_{suffix}")]
+    
+    def update(self, bars):
+        mean, std = self.window.update(bars[self.column])
+        return [mean + self.k * std, mean, mean - self.k * std]
+
+# Wilder's average true range
+class ATR(Indicator):
+    inputs = ('High', 'Low', 'Close')
+    
+    def __init__(self, column='Close', period=14):
+        super().__init__('Close')
+        self.period = period
+        self.ema = SeededEMA(period, 1.0 / period)
+        self.previous_close = None
+    
+    def outputs(self):
+        return [f"ATR_{self.period}"]
+    
+    def update(self, bars):
+        high, low, close = bars['High'], bars['Low'], bars['Close']
+        true_range = high - low
+        if len(close):
+            previous = np.concatenate([[np.nan if self.previous_close is None else self.previous_close], close[:-1]])
+            # The first bar ever has no previous close, so its range is just high - low
+            gaps = np.fmax(np.abs(high - previous), np.abs(low - previous))
+            true_range = np.fmax(true_range, gaps)
+            self.previous_close = close[-1]
+        return [self.ema.update(true_range)]
+
+INDICATORS = {'sma': SMA, 'ema': EMA, 'rsi': RSI, 'macd': MACD, 'bollinger': Bollinger, 'atr': ATR}
+INDICATOR_PARAMS = {
+    'sma': {'period': int},
+    'ema': {'period': int},
+    'rsi': {'period': int},
+    'macd': {'fast': int, 'slow': int, 'signal': int},
+    'bollinger': {'period': int, 'k': float},
+    'atr': {'period': int}
+}
+
+# Function to normalize an indicator spec ('rsi', 'sma:50' or
+# {'name': 'sma', 'period': 50, 'column': 'Open'}) to (name, params)
+def parse_indicator_spec(spec):
+    if isinstance(spec, str):
+        name, _, period = spec.partition(':')
+        spec = {'name': name}
+        if period:
+            spec['period'] = period
+    if not isinstance(spec, dict) or str(spec.get('name', '')).lower() not in INDICATORS:
+        raise ValueError(f"Unknown indicator {spec!r}; use one of {sorted(INDICATORS)}")
+    name = spec['name'].lower()
+    params = {'column': str(spec.get('column', 'Close'))}
+    for key, cast in INDICATOR_PARAMS[name].items():
+        if key in spec:
+            params[key] = cast(spec[key])
+            if params[key] <= 0:
+                raise ValueError(f"{name} {key} must be positive")
+    return name, params
+
+# Indicator values for one price series, extended in place as bars are appended
+class IndicatorSeries:
+    def __init__(self, specs):
+        self.indicators = [INDICATORS[name](**params) for name, params in specs]
+        self.columns = [label for indicator in self.indicators for label in indicator.outputs()]
+        self.inputs = sorted({col for indicator in self.indicators for col in indicator.required_columns})
+        self.dates = np.empty(0, dtype='int64')
+        self.last_inputs = None
+        self.values = {col: np.empty(0) for col in self.columns}
+        self.lock = threading.Lock()
+    
+    @property
+    def length(self):
+        return len(self.dates)
+    
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + sum(values.nbytes for values in self.values.values())
+    
+    # Whether df starts with the bars this series was computed from (or is a prefix of them)
+    def matches(self, df):
+        if not self.length or df.empty:
+            return False
+        rows = min(len(df), self.length)
+        dates = epoch_millis(df['Date'].iloc[[0, rows - 1]])
+        if dates[0] != self.dates[0] or dates[1] != self.dates[rows - 1]:
+            return False
+        if rows < self.length:
+            return True
+        last = df[self.inputs].iloc[rows - 1].to_numpy(dtype=float)
+        return np.array_equal(last, self.last_inputs, equal_nan=True)
+    
+    # Function to compute the indicators for bars after the ones already seen
+    def append(self, df):
+        missing = [col for col in self.inputs if col not in df.columns]
+        if missing:
+            raise ValueError(f"Indicators need columns {missing}")
+        if df.empty:
+            return 0
+        bars = {col: df[col].to_numpy(dtype=float) for col in self.inputs}
+        for indicator in self.indicators:
+            for label, values in zip(indicator.outputs(), indicator.update(bars)):
+                self.values[label] = np.concatenate([self.values[label], values])
+        self.dates = np.concatenate([self.dates, epoch_millis(df['Date'])])
+        self.last_inputs = np.array([bars[col][-1] for col in self.inputs])
+        return len(df)
+    
+    def frame(self, rows=None):
+        rows = self.length if rows is None else rows
+        df = pd.DataFrame({col: values[:rows] for col, values in self.values.items()})
+        df.insert(0, 'Date', pd.to_datetime(self.dates[:rows], unit='ms'))
+        return df
+
+# Function to get the indicators for a frame, reusing the cached series for
+# the same key when df extends it. Returns (indicator frame, mode).
+def compute_indicators(key, df, specs):
+    spec_key = json.dumps(specs, sort_keys=True)
+    cache_key = f"{key}:{hashlib.sha1(spec_key.encode()).hexdigest()[:16]}"
+    series = indicator_states.get(cache_key)
+    if series is not None:
+        with series.lock:
+            if series.matches(df):
+                # The cached bars were sorted when the series was built, so only
+                # the new tail has to be in order and after them
+                tail = df.iloc[series.length:]
+                if tail.empty or (tail['Date'].is_monotonic_increasing
+                                  and epoch_millis(tail['Date'].iloc[:1])[0] > series.dates[-1]):
+                    appended = series.append(tail)
+                    result = series.frame(len(df))
+                    if appended:
+                        indicator_states.set(cache_key, series)
+                    return result, 'incremental' if appended else 'cached'
+    
+    series = IndicatorSeries(specs)
+    series.append(df if df['Date'].is_monotonic_increasing else df.sort_values('Date'))
+    indicator_states.set(cache_key, series)
+    return series.frame(), 'full'
+
+# Function to compute the requested indicators for one ticker's stock data
+def ticker_indicators(ticker, start_date, end_date, specs, fetch=fetch_stock_frame):
+    df, data_source = load_stock_frame(ticker, start_date, end_date, fetch=fetch)
+    if df is None:
+        return None, None, None
+    # Keyed by start date: a later request with a later end date only appends bars
+    result, mode = compute_indicators(f"{ticker}:{start_date.isoformat()}", df, specs)
+    return result, data_source, mode
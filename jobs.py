@@ -0,0 +1,536 @@
+# Background model jobs, walk-forward backtests and hyperparameter search
+import time
+import pandas as pd
+import numpy as np
+import json
+import shutil
+import tempfile
+import hashlib
+import itertools
+import os
+import threading
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+from observability import logger, observe_training
+from lazy_imports import MODEL_WORKER_STACKS, preload_stacks, tf
+from frames import safe_parse_dates
+from forecasting import (
+    NETWORK_SPECS, build_network, fit_network, forecast_metrics, inverse_scale_target,
+    network_features, network_scaler, run_lstm, run_prophet, run_transformer, window_dataset
+)
+
+# Batch Prophet forecasting: one (ticker, column) series per task on a process
+# pool sized to the cores, since each Stan fit is single-threaded
+PROPHET_BATCH_WORKERS = int(os.environ.get('PROPHET_BATCH_WORKERS', os.cpu_count() or 1))
+_prophet_pool = None
+_prophet_pool_lock = threading.Lock()
+
+def get_prophet_pool():
+    global _prophet_pool
+    with _prophet_pool_lock:
+        if _prophet_pool is None:
+            _prophet_pool = ProcessPoolExecutor(
+                max_workers=PROPHET_BATCH_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=preload_stacks,
+                initargs=(['prophet'],)
+            )
+        return _prophet_pool
+
+# Background training jobs. Model endpoints called with "async": true return a
+# job ID immediately and train in a bounded process pool; progress is shared
+# with the web process through a multiprocessing manager.
+MODEL_JOB_WORKERS = int(os.environ.get('MODEL_JOB_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+MODEL_JOB_RESULT_TTL = 30 * 60
+
+MODEL_RUNNERS = {
+    'transformer': run_transformer,
+    'lstm': run_lstm,
+    'prophet': run_prophet
+}
+
+model_jobs = {}
+_model_jobs_lock = threading.Lock()
+_job_pool = None
+_job_manager = None
+_job_state = None
+_job_pool_lock = threading.Lock()
+
+class JobCancelled(Exception):
+    pass
+
+# Function to lazily start the worker pool and the shared progress dict
+def _get_job_pool():
+    global _job_pool, _job_manager, _job_state
+    with _job_pool_lock:
+        if _job_pool is None:
+            # Spawned workers avoid forking a process that has TensorFlow loaded
+            context = multiprocessing.get_context('spawn')
+            _job_manager = context.Manager()
+            _job_state = _job_manager.dict()
+            _job_pool = ProcessPoolExecutor(
+                max_workers=MODEL_JOB_WORKERS,
+                mp_context=context,
+                initializer=preload_stacks,
+                initargs=(MODEL_WORKER_STACKS,)
+            )
+        return _job_pool
+
+# Function executed in a worker process for one training job
+def _run_model_job(job_id, model_type, df, params, state):
+    def progress(percent, message=None, epoch=None):
+        if state.get(('cancel', job_id)):
+            raise JobCancelled()
+        state[job_id] = {'progress': round(percent, 1), 'message': message, 'epoch': epoch}
+    
+    progress(5, "Preprocessing data...")
+    return MODEL_RUNNERS[model_type](df, progress=progress, **params)
+
+# Function to fingerprint a job so identical submissions share one run
+def _model_job_key(model_type, df, params):
+    digest = hashlib.sha1(model_type.encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+# Function to drop finished jobs whose results are no longer wanted
+def _prune_model_jobs():
+    now = time.time()
+    with _model_jobs_lock:
+        expired = [job_id for job_id, job in model_jobs.items()
+                   if job['finished_at'] is not None and now - job['finished_at'] > MODEL_JOB_RESULT_TTL]
+        for job_id in expired:
+            del model_jobs[job_id]
+    # The shared dict lives in the manager process, so it's cleaned up outside the lock
+    if _job_state is not None:
+        for job_id in expired:
+            _job_state.pop(job_id, None)
+            _job_state.pop(('cancel', job_id), None)
+
+# Function to submit a training job, reusing an identical queued/running/finished one.
+# Returns (payload, status_code).
+def submit_model_job(model_type, df, params):
+    key = _model_job_key(model_type, df, params)
+    pool = _get_job_pool()
+    _prune_model_jobs()
+    
+    with _model_jobs_lock:
+        for job_id, job in model_jobs.items():
+            if job['key'] == key and job_status(job) not in ('failed', 'cancelled'):
+                return {'job_id': job_id, 'status': job_status(job), 'deduplicated': True}, 202
+        
+        job_id = uuid.uuid4().hex
+        future = pool.submit(_run_model_job, job_id, model_type, df, params, _job_state)
+        job = {
+            'id': job_id,
+            'key': key,
+            'model': model_type,
+            'future': future,
+            'created_at': time.time(),
+            'finished_at': None,
+            'cancel_requested': False
+        }
+        model_jobs[job_id] = job
+    
+    def mark_finished(done):
+        with _model_jobs_lock:
+            job['finished_at'] = time.time()
+        if not done.cancelled() and done.exception() is None:
+            observe_training(model_type, done.result()[0])
+    future.add_done_callback(mark_finished)
+    
+    logger.info("Submitted %s job %s", model_type, job_id)
+    return {'job_id': job_id, 'status': 'queued', 'deduplicated': False}, 202
+
+# Function to derive a job's status from its future and shared progress state
+def job_status(job):
+    future = job['future']
+    if future.cancelled():
+        return 'cancelled'
+    if future.done():
+        error = future.exception()
+        if isinstance(error, JobCancelled):
+            return 'cancelled'
+        return 'failed' if error is not None else 'done'
+    if job['cancel_requested']:
+        return 'cancelling'
+    return 'running' if job['id'] in _job_state else 'queued'
+
+# Function to read the progress a worker last reported for a job
+def job_progress(job_id):
+    return _job_state.get(job_id, {}) if _job_state is not None else {}
+
+# Function to cancel a job: queued jobs are dropped, running ones are flagged
+# and stop at the next epoch boundary
+def request_job_cancel(job):
+    if not job['future'].cancel() and not job['future'].done():
+        with _model_jobs_lock:
+            job['cancel_requested'] = True
+        _job_state[('cancel', job['id'])] = True
+
+# Walk-forward backtesting: the series is scaled once (scaler fitted on the
+# first fold's training rows, so no fold sees its test data), placed in shared
+# memory, and every fold trains and predicts in its own worker process on
+# windows gathered from that one shared array.
+TRAINING_POOL_WORKERS = int(os.environ.get('TRAINING_POOL_WORKERS', os.cpu_count() or 1))
+BACKTEST_MAX_FOLDS = 50
+_training_pool = None
+_training_pool_lock = threading.Lock()
+
+# Function run once per training worker: load TensorFlow and split the cores
+# between the workers instead of letting each one use all of them
+def _init_training_worker(threads):
+    preload_stacks(MODEL_WORKER_STACKS)
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+
+def _get_training_pool():
+    global _training_pool
+    with _training_pool_lock:
+        if _training_pool is None:
+            threads = max(1, (os.cpu_count() or 1) // TRAINING_POOL_WORKERS)
+            _training_pool = ProcessPoolExecutor(
+                max_workers=TRAINING_POOL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_training_worker,
+                initargs=(threads,)
+            )
+        return _training_pool
+
+# Function to copy an array into a new shared memory block.
+# Returns (block, handle) where handle = (name, shape, dtype) for the workers.
+def share_array(values):
+    values = np.ascontiguousarray(values)
+    block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+    return block, (block.name, values.shape, values.dtype.str)
+
+# Function to copy a shared array into a float32 tensor inside a worker
+def shared_tensor(handle):
+    name, shape, dtype = handle
+    # Spawned workers share the parent's resource tracker, so attaching here
+    # doesn't transfer ownership; the parent unlinks the block when done
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return tf.convert_to_tensor(np.ndarray(shape, dtype=dtype, buffer=block.buf), dtype=tf.float32)
+    finally:
+        block.close()
+
+# Function to split rows into walk-forward folds. Fold k tests on the
+# test_size rows after its training rows; 'expanding' folds train on
+# everything before, 'rolling' folds on the last min_train rows.
+def walk_forward_folds(n_rows, folds, min_train, test_size=None, window='expanding'):
+    if test_size is None:
+        test_size = (n_rows - min_train) // folds
+    if test_size < 1 or min_train + folds * test_size > n_rows:
+        raise ValueError(f'{folds} folds of {test_size} rows after {min_train} training rows need more than {n_rows} rows')
+    splits = []
+    for fold in range(folds):
+        train_end = min_train + fold * test_size
+        train_start = train_end - min_train if window == 'rolling' else 0
+        splits.append({'fold': fold, 'train_start': train_start, 'train_end': train_end,
+                       'test_start': train_end, 'test_end': train_end + test_size})
+    return splits
+
+# Function executed in a worker process for one backtest fold. Row ranges
+# refer to targets: a window's target is the row right after it.
+def _run_backtest_fold(handle, model_type, seq_length, split, max_epochs):
+    series = shared_tensor(handle)
+    model = build_network(model_type, (seq_length, series.shape[1]))
+    
+    fit_started = time.perf_counter()
+    history = fit_network(model, series, model_type, seq_length,
+                          split['train_start'], split['train_end'] - seq_length, max_epochs)
+    training_seconds = time.perf_counter() - fit_started
+    
+    test_dataset = window_dataset(series, seq_length, split['test_start'] - seq_length,
+                                  split['test_end'] - seq_length, 256)
+    predictions = model.predict(test_dataset, verbose=0).flatten()
+    return {
+        'predictions': predictions,
+        'epochs': len(history.history.get('loss', [])),
+        'best_val_loss': float(min(history.history.get('val_loss', [np.nan]))),
+        'training_seconds': training_seconds
+    }
+
+# Function to backtest a model type over walk-forward folds on the training pool.
+# Returns (payload, status_code).
+def run_backtest(df, column, model_type, params, folds=5, test_size=None, min_train=None,
+                 window='expanding', max_epochs=None):
+    if df.empty:
+        return {'error': 'Empty dataset provided'}, 400
+    if column not in df.columns:
+        return {'error': f'Column {column} not found in data'}, 400
+    df = safe_parse_dates(df, source='client').dropna(subset=[column]).reset_index(drop=True)
+    
+    spec = NETWORK_SPECS[model_type]
+    seq_length = int(params.get(spec['seq_param'], spec['default_seq']))
+    max_epochs = int(max_epochs or spec['max_epochs'])
+    min_train = int(min_train or len(df) // 2)
+    try:
+        splits = walk_forward_folds(len(df), folds, min_train, test_size, window)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    # Every fold needs enough windows for a training and a validation split
+    if min_train - seq_length < 10:
+        return {'error': f'Training folds of {min_train} rows are too short for sequence length {seq_length}'}, 400
+    
+    # Scale once with statistics from the first fold's training rows only
+    features = network_features(model_type, df, column).to_numpy(dtype=float)
+    scaler = network_scaler(model_type)
+    scaler.fit(features[splits[0]['train_start']:splits[0]['train_end']])
+    block, handle = share_array(scaler.transform(features).astype(np.float32))
+    
+    started = time.perf_counter()
+    pool = _get_training_pool()
+    try:
+        futures = [pool.submit(_run_backtest_fold, handle, model_type, seq_length, split, max_epochs)
+                   for split in splits]
+        outcomes = [future.result() for future in futures]
+    finally:
+        block.close()
+        block.unlink()
+    elapsed = time.perf_counter() - started
+    
+    dates = df['Date'].dt.strftime('%Y-%m-%d')
+    actual = df[column].to_numpy(dtype=float)
+    fold_results = []
+    all_actual, all_predicted, all_dates = [], [], []
+    for split, outcome in zip(splits, outcomes):
+        predicted = inverse_scale_target(scaler, outcome['predictions'])
+        expected = actual[split['test_start']:split['test_end']]
+        fold_results.append({
+            'fold': split['fold'],
+            'train_start': dates[split['train_start']],
+            'train_end': dates[split['train_end'] - 1],
+            'test_start': dates[split['test_start']],
+            'test_end': dates[split['test_end'] - 1],
+            'metrics': forecast_metrics(expected, predicted),
+            'epochs': outcome['epochs'],
+            'best_val_loss': outcome['best_val_loss'],
+            'training_seconds': round(outcome['training_seconds'], 3)
+        })
+        all_actual.append(expected)
+        all_predicted.append(predicted)
+        all_dates.extend(dates[split['test_start']:split['test_end']])
+    
+    all_actual = np.concatenate(all_actual)
+    all_predicted = np.concatenate(all_predicted)
+    fold_metrics = pd.DataFrame([fold['metrics'] for fold in fold_results])
+    logger.info("Backtested %s on %s folds in %.1fs", model_type, len(splits), elapsed)
+    return {
+        # Pooled over every fold's test rows, in the same shape as the model endpoints
+        'metrics': forecast_metrics(all_actual, all_predicted),
+        'fold_metrics_mean': fold_metrics.mean().to_dict(),
+        'fold_metrics_std': fold_metrics.std(ddof=0).to_dict(),
+        'folds': fold_results,
+        'predictions': all_predicted.tolist(),
+        'test_dates': all_dates,
+        'model': model_type,
+        'params': {spec['seq_param']: seq_length},
+        'window': window,
+        'workers': TRAINING_POOL_WORKERS,
+        'training_seconds': round(sum(fold['training_seconds'] for fold in fold_results), 3),
+        'elapsed': round(elapsed, 3)
+    }, 200
+
+# Hyperparameter search with successive halving: every candidate trains for a
+# small epoch budget on the training pool, the best third by validation loss
+# (eta = 3) continue from their checkpoints with three times the budget, and
+# so on. Candidates that early-stop have converged and keep their score without
+# further training. The series is scaled and shared once for all candidates.
+SEARCH_MAX_CANDIDATES = 81
+SEARCH_ETA = 3
+SEARCH_MIN_EPOCHS = 2
+SEARCH_PARAMS = {
+    'lstm': {'seq_length': int, 'units': int, 'learning_rate': float},
+    'transformer': {'sequence_length': int, 'units': int, 'learning_rate': float,
+                    'head_size': int, 'num_heads': int}
+}
+# Accepted for compatibility with /api/transformer, but the current network has no attention layer
+SEARCH_INERT_PARAMS = {'transformer': ['head_size', 'num_heads']}
+
+# Function to expand one grid entry (a list, or a range given as
+# {'min', 'max', 'step'} or {'min', 'max', 'num', 'log'}) into values
+def _search_values(name, spec, cast):
+    if isinstance(spec, dict):
+        low, high = float(spec['min']), float(spec['max'])
+        if 'step' in spec:
+            values = np.arange(low, high + float(spec['step']) / 2, float(spec['step']))
+        else:
+            num = int(spec.get('num', 3))
+            values = np.geomspace(low, high, num) if spec.get('log') else np.linspace(low, high, num)
+        spec = values.tolist()
+    if not isinstance(spec, list):
+        spec = [spec]
+    values = list(dict.fromkeys(cast(round(value) if cast is int else value) for value in spec))
+    if not values or any(value <= 0 for value in values):
+        raise ValueError(f'{name} values must be positive')
+    return values
+
+# Function to expand a parameter grid into candidate configurations
+def search_candidates(model_type, grid):
+    allowed = SEARCH_PARAMS[model_type]
+    unknown = sorted(set(grid) - set(allowed))
+    if unknown:
+        raise ValueError(f'Unknown parameters {unknown}; {model_type} accepts {sorted(allowed)}')
+    seq_param = NETWORK_SPECS[model_type]['seq_param']
+    grid = dict(grid)
+    grid.setdefault(seq_param, NETWORK_SPECS[model_type]['default_seq'])
+    names = sorted(grid)
+    axes = [_search_values(name, grid[name], allowed[name]) for name in names]
+    candidates = [dict(zip(names, values)) for values in itertools.product(*axes)]
+    if len(candidates) > SEARCH_MAX_CANDIDATES:
+        raise ValueError(f'{len(candidates)} candidates; at most {SEARCH_MAX_CANDIDATES} per search')
+    return candidates
+
+# Function to rank a rung's candidates by validation loss and keep the best
+# 1/eta of them (all of them on the last rung). Returns (survivors, next_budget),
+# with next_budget None once the search is over.
+def _halving_rung(active, budget, max_epochs, eta):
+    active = sorted(active, key=lambda trial: trial['val_loss'])
+    last = budget >= max_epochs
+    survivors = active if last else active[:-(-len(active) // eta)]
+    if last or all(trial['converged'] for trial in survivors):
+        return survivors, None
+    return survivors, min(budget * eta, max_epochs)
+
+# Function executed in a worker process for one candidate and one rung: trains
+# from its checkpoint (or from scratch) up to max_epochs and saves it again
+def _run_search_trial(handle, model_type, params, train_end, test_end, initial_epoch, max_epochs, checkpoint):
+    series = shared_tensor(handle)
+    seq_length = params[NETWORK_SPECS[model_type]['seq_param']]
+    if initial_epoch:
+        model = tf.keras.models.load_model(checkpoint)
+    else:
+        model = build_network(model_type, (seq_length, series.shape[1]),
+                              units=params.get('units'), learning_rate=params.get('learning_rate', 0.001))
+    
+    fit_started = time.perf_counter()
+    history = fit_network(model, series, model_type, seq_length, 0, train_end - seq_length, max_epochs,
+                          initial_epoch=initial_epoch)
+    training_seconds = time.perf_counter() - fit_started
+    model.save(checkpoint)
+    
+    epochs = len(history.history.get('loss', []))
+    test_dataset = window_dataset(series, seq_length, train_end - seq_length, test_end - seq_length, 256)
+    return {
+        'val_loss': float(min(history.history.get('val_loss', [np.inf]))),
+        'epochs': initial_epoch + epochs,
+        # EarlyStopping ended the run before the rung's budget
+        'converged': initial_epoch + epochs < max_epochs,
+        'predictions': model.predict(test_dataset, verbose=0).flatten(),
+        'training_seconds': training_seconds
+    }
+
+# Function to search hyperparameters for a model type with successive halving.
+# Returns (payload, status_code).
+def run_search(df, column, model_type, grid, eta=SEARCH_ETA, min_epochs=SEARCH_MIN_EPOCHS, max_epochs=None):
+    if df.empty:
+        return {'error': 'Empty dataset provided'}, 400
+    if column not in df.columns:
+        return {'error': f'Column {column} not found in data'}, 400
+    df = safe_parse_dates(df, source='client').dropna(subset=[column]).reset_index(drop=True)
+    try:
+        candidates = search_candidates(model_type, grid)
+    except (TypeError, ValueError, KeyError) as e:
+        return {'error': f'Invalid grid: {e}'}, 400
+    
+    spec = NETWORK_SPECS[model_type]
+    max_epochs = int(max_epochs or spec['max_epochs'])
+    # Same split as the model endpoints: the last 20% of rows are the test set
+    train_end = int(len(df) * 0.8)
+    longest = max(candidate[spec['seq_param']] for candidate in candidates)
+    if train_end - longest < 10 or len(df) - train_end < 3:
+        return {'error': f'Not enough data for sequence length {longest}. Current data points: {len(df)}'}, 400
+    
+    # Parameters the network doesn't use would only train duplicates
+    inert = [name for name in SEARCH_INERT_PARAMS.get(model_type, []) if name in grid]
+    trials = {}
+    for candidate in candidates:
+        key = json.dumps({k: v for k, v in candidate.items() if k not in inert}, sort_keys=True)
+        trials.setdefault(key, {'params': candidate, 'equivalent': [], 'val_loss': np.inf,
+                                'epochs': 0, 'rung': 0, 'converged': False, 'training_seconds': 0.0})
+        trials[key]['equivalent'].append(candidate)
+    trials = list(trials.values())
+    
+    features = network_features(model_type, df, column).to_numpy(dtype=float)
+    scaler = network_scaler(model_type)
+    scaler.fit(features[:train_end])
+    block, handle = share_array(scaler.transform(features).astype(np.float32))
+    checkpoints = tempfile.mkdtemp(prefix='search-')
+    for index, trial in enumerate(trials):
+        trial['checkpoint'] = os.path.join(checkpoints, f'{index}.keras')
+    actual = df[column].to_numpy(dtype=float)[train_end:]
+    
+    started = time.perf_counter()
+    pool = _get_training_pool()
+    rungs = []
+    try:
+        active = list(trials)
+        budget = min(min_epochs, max_epochs)
+        rung = 0
+        while True:
+            # Converged candidates keep their score without another fit
+            training = [trial for trial in active if not trial['converged'] and trial['epochs'] < budget]
+            futures = {pool.submit(_run_search_trial, handle, model_type, trial['params'], train_end, len(df),
+                                   trial['epochs'], budget, trial['checkpoint']): trial
+                       for trial in training}
+            for future in as_completed(futures):
+                trial = futures[future]
+                outcome = future.result()
+                trial['val_loss'] = min(trial['val_loss'], outcome['val_loss'])
+                trial['epochs'] = outcome['epochs']
+                trial['converged'] = outcome['converged']
+                trial['training_seconds'] += outcome['training_seconds']
+                trial['metrics'] = forecast_metrics(actual, inverse_scale_target(scaler, outcome['predictions']))
+            for trial in active:
+                trial['rung'] = rung
+            
+            survivors, next_budget = _halving_rung(active, budget, max_epochs, eta)
+            rungs.append({'rung': rung, 'epochs': budget, 'candidates': len(active),
+                          'trained': len(training), 'kept': len(survivors)})
+            if next_budget is None:
+                break
+            active, budget = survivors, next_budget
+            rung += 1
+    finally:
+        block.close()
+        block.unlink()
+        shutil.rmtree(checkpoints, ignore_errors=True)
+    elapsed = time.perf_counter() - started
+    
+    trials.sort(key=lambda trial: (-trial['rung'], trial['val_loss']))
+    leaderboard = [{
+        'rank': rank,
+        'params': trial['params'],
+        'val_loss': trial['val_loss'],
+        'metrics': trial['metrics'],
+        'epochs': trial['epochs'],
+        'rung': trial['rung'],
+        'converged': trial['converged'],
+        'training_seconds': round(trial['training_seconds'], 3),
+        **({'equivalent': trial['equivalent']} if len(trial['equivalent']) > 1 else {})
+    } for rank, trial in enumerate(trials, start=1)]
+    total_epochs = sum(trial['epochs'] for trial in trials)
+    logger.info("Searched %s %s candidates in %.1fs (%s epochs)", len(trials), model_type, elapsed, total_epochs)
+    
+    response = {
+        'leaderboard': leaderboard,
+        'best': leaderboard[0],
+        'rungs': rungs,
+        'model': model_type,
+        'candidates': len(candidates),
+        'eta': eta,
+        'total_epochs': total_epochs,
+        # What training every candidate to max_epochs would have cost
+        'full_budget_epochs': len(trials) * max_epochs,
+        'workers': TRAINING_POOL_WORKERS,
+        'elapsed': round(elapsed, 3)
+    }
+    if inert:
+        response['ignored_params'] = inert
+    return response, 200
@@ -0,0 +1,71 @@
+# Lazy loading of the heavy ML dependencies, grouped into stacks that can be preloaded
+import time
+import importlib
+import os
+import threading
+from collections import OrderedDict
+
+# Seconds spent importing each lazily loaded module, in load order
+import_costs = OrderedDict()
+_lazy_import_lock = threading.RLock()
+
+# Module proxy that imports the real module the first time an attribute is used,
+# so processes that only serve data never pay for the ML stacks
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    def _load(self):
+        if self._module is None:
+            with _lazy_import_lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    import_costs[self._name] = round(time.perf_counter() - start, 4)
+                    self._module = module
+        return self._module
+    
+    @property
+    def loaded(self):
+        return self._module is not None
+    
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+# Heavy dependencies, loaded on first use
+tf = LazyModule('tensorflow')
+keras_models = LazyModule('keras.models')
+keras_layers = LazyModule('keras.layers')
+sk_preprocessing = LazyModule('sklearn.preprocessing')
+sk_metrics = LazyModule('sklearn.metrics')
+stattools = LazyModule('statsmodels.tsa.stattools')
+adfvalues = LazyModule('statsmodels.tsa.adfvalues')
+seasonal = LazyModule('statsmodels.tsa.seasonal')
+scipy_signal = LazyModule('scipy.signal')
+prophet = LazyModule('prophet')
+px = LazyModule('plotly.express')
+plotly_utils = LazyModule('plotly.utils')
+
+# Groups of lazy modules that can be preloaded together
+ML_STACKS = {
+    'tensorflow': [tf, keras_models, keras_layers],
+    'sklearn': [sk_preprocessing, sk_metrics],
+    'statsmodels': [stattools, adfvalues, seasonal],
+    'scipy': [scipy_signal],
+    'prophet': [prophet],
+    'plotly': [px, plotly_utils]
+}
+
+# Stacks to import at startup (comma separated or 'all'); empty keeps them lazy.
+# Training workers always preload MODEL_WORKER_STACKS when they start.
+PRELOAD_STACKS = [name for name in os.environ.get('PRELOAD_STACKS', '').split(',') if name.strip()]
+MODEL_WORKER_STACKS = ['tensorflow', 'sklearn', 'prophet']
+
+# Function to import the given stacks ('all' for every stack) ahead of the first request
+def preload_stacks(names):
+    if names == 'all' or names == ['all']:
+        names = list(ML_STACKS)
+    for name in names:
+        for module in ML_STACKS.get(name.strip(), []):
+            module._load()
@@ -0,0 +1,165 @@
+# Logging setup and the Prometheus-style metrics registry shared by the app modules
+import json
+import bisect
+import logging
+import os
+import threading
+
+# Leveled logging. LOG_LEVEL=DEBUG adds the per-request data details from the
+# model runners; LOG_FORMAT=json writes one JSON object per line.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+logger = logging.getLogger('stock_vn_pro')
+if not logger.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(JsonLogFormatter() if LOG_FORMAT == 'json'
+                              else logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    logger.addHandler(_log_handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+# Minimal metrics rendered in the Prometheus text exposition format at /metrics
+METRICS_REGISTRY = []
+
+# Function to key a sample by its label values in declaration order
+def _label_key(labelnames, labels):
+    return tuple(str(labels[name]) for name in labelnames)
+
+# Monotonic counter with optional labels
+class Counter:
+    kind = 'counter'
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        METRICS_REGISTRY.append(self)
+    
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def samples(self):
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+# Histogram with fixed upper bounds; buckets are cumulative when rendered
+class Histogram:
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        METRICS_REGISTRY.append(self)
+    
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+    
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    samples.append((self.name + '_bucket', dict(labels, le=le), cumulative))
+                samples.append((self.name + '_sum', labels, total))
+                samples.append((self.name + '_count', labels, count))
+        return samples
+
+# Metric whose samples are read from existing stats when scraped.
+# collect() returns a list of (labels, value).
+class CallbackMetric:
+    def __init__(self, name, documentation, kind, collect):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.collect = collect
+        METRICS_REGISTRY.append(self)
+    
+    def samples(self):
+        return [(self.name, labels, value) for labels, value in self.collect()]
+
+# Function to render every registered metric in the Prometheus text format
+def render_metrics():
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    
+    lines = []
+    for metric in METRICS_REGISTRY:
+        try:
+            samples = metric.samples()
+        except Exception as e:
+            logger.warning("Could not collect metric %s: %s", metric.name, e)
+            continue
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in samples:
+            label_text = ','.join(f'{k}="{escape(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {float(value)!r}" if label_text else f"{name} {float(value)!r}")
+    return '\n'.join(lines) + '\n'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+http_request_seconds = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by route.',
+    LATENCY_BUCKETS, ('route', 'method', 'status'))
+http_request_bytes = Histogram(
+    'http_request_size_bytes', 'Request body size, by route.', SIZE_BUCKETS, ('route',))
+http_response_bytes = Histogram(
+    'http_response_size_bytes', 'Response body size as sent (after compression), by route.',
+    SIZE_BUCKETS, ('route',))
+provider_fetch_seconds = Histogram(
+    'provider_fetch_duration_seconds', 'Upstream data provider fetch latency.',
+    LATENCY_BUCKETS, ('provider', 'outcome'))
+model_training_seconds = Histogram(
+    'model_training_duration_seconds', 'Wall time spent fitting a model, by model type.',
+    (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800), ('model', 'training'))
+model_training_epochs = Counter(
+    'model_training_epochs_total', 'Training epochs run, by model type.', ('model',))
+predict_batch_rows = Histogram(
+    'model_predict_batch_rows', 'Windows per micro-batched predict call, by model type.',
+    (1, 2, 4, 8, 16, 32, 64, 128, 256, 512), ('model',))
+predict_batch_requests = Histogram(
+    'model_predict_batch_requests', 'Prediction requests coalesced into one predict call, by model type.',
+    (1, 2, 4, 8, 16, 32, 64), ('model',))
+
+# Function to record how a finished model run spent its time
+def observe_training(model_type, payload):
+    if not isinstance(payload, dict) or 'training_seconds' not in payload:
+        return
+    model_training_seconds.observe(payload['training_seconds'], model=model_type,
+                                   training=payload.get('training', 'full'))
+    if payload.get('epochs'):
+        model_training_epochs.inc(payload['epochs'], model=model_type)
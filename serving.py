@@ -0,0 +1,224 @@
+# Batched prediction serving for trained models
+import time
+import numpy as np
+import os
+import re
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from collections import deque
+
+from observability import logger, predict_batch_requests, predict_batch_rows
+from storage import StockDataCache
+from frames import safe_parse_dates
+from forecasting import (
+    MODEL_STORE_DIR, NETWORK_SPECS, inverse_scale_target, load_model_artifact_meta,
+    load_trained_model, network_features
+)
+
+# Trained models served for repeated predictions. Models are loaded from the
+# model store into a memory-bounded registry, and each loaded model has one
+# worker thread that coalesces the requests arriving within
+# PREDICT_BATCH_WINDOW into a single predict call over the stacked windows.
+SERVING_MAX_BYTES = int(os.environ.get('SERVING_MAX_BYTES', 512 * 1024 * 1024))
+PREDICT_BATCH_WINDOW = float(os.environ.get('PREDICT_BATCH_WINDOW', 0.005))
+PREDICT_MAX_BATCH = int(os.environ.get('PREDICT_MAX_BATCH', 256))
+PREDICT_MAX_WINDOWS = 1000
+# Longest a request waits for its batch before giving up with a 503
+PREDICT_TIMEOUT = float(os.environ.get('PREDICT_TIMEOUT', 30))
+# Workers of models nobody asks for exit after this long; evicted models go with them
+SERVING_IDLE_SECONDS = 60
+SERVING_LATENCY_SAMPLES = 1000
+MODEL_ID_PATTERN = re.compile(r'^(lstm|transformer)-[0-9a-f]{24}$')
+
+# A loaded model with its scaler and micro-batching worker
+class ModelServer:
+    def __init__(self, model_id, model, scaler, meta, meta_mtime):
+        self.model_id = model_id
+        self.model = model
+        self.scaler = scaler
+        self.meta = meta
+        self.meta_mtime = meta_mtime
+        self.model_type = meta['model_type']
+        self.seq_length = int(meta['params'][NETWORK_SPECS[self.model_type]['seq_param']])
+        # Weights plus a fixed allowance for the graph and scaler
+        self.nbytes = sum(weight.nbytes for weight in model.get_weights()) + 1024 * 1024
+        self._ready = threading.Condition()
+        self._pending = deque()
+        self._pending_rows = 0
+        self._worker = None
+        self._latencies = deque(maxlen=SERVING_LATENCY_SAMPLES)
+        self.requests = 0
+        self.batches = 0
+        self.rows = 0
+        self.max_batch_rows = 0
+        self.predict_seconds = 0.0
+    
+    # Function to queue scaled windows of shape (n, seq_length, features).
+    # Returns a Future resolving to the n scaled predictions.
+    def submit(self, windows):
+        future = Future()
+        with self._ready:
+            self._pending.append((windows, future, time.perf_counter()))
+            self._pending_rows += len(windows)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._serve, daemon=True,
+                                                name=f'predict-{self.model_id}')
+                self._worker.start()
+            self._ready.notify()
+        return future
+    
+    def _serve(self):
+        try:
+            while True:
+                with self._ready:
+                    if not self._pending:
+                        self._ready.wait(SERVING_IDLE_SECONDS)
+                        if not self._pending:
+                            self._worker = None
+                            return
+                    # Hold the batch open until the window after its first request
+                    # closes or enough rows are waiting
+                    deadline = self._pending[0][2] + PREDICT_BATCH_WINDOW
+                    while self._pending_rows < PREDICT_MAX_BATCH:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            break
+                        self._ready.wait(remaining)
+                    batch, rows = [], 0
+                    while self._pending and (not batch or rows + len(self._pending[0][0]) <= PREDICT_MAX_BATCH):
+                        item = self._pending.popleft()
+                        batch.append(item)
+                        rows += len(item[0])
+                    self._pending_rows -= rows
+                # A failing batch fails its own requests, never the worker
+                try:
+                    self._predict(batch, rows)
+                except Exception as e:
+                    logger.exception("Prediction batch for %s failed: %s", self.model_id, e)
+                    for _, future, _ in batch:
+                        if not future.done():
+                            future.set_exception(e)
+        finally:
+            # If the worker dies anyway, fail what is queued and let the next
+            # submit start a new one instead of leaving requests waiting
+            with self._ready:
+                if self._worker is threading.current_thread():
+                    self._worker = None
+                    while self._pending:
+                        _, future, _ = self._pending.popleft()
+                        future.set_exception(RuntimeError(f'Prediction worker for {self.model_id} stopped'))
+                    self._pending_rows = 0
+    
+    def _predict(self, batch, rows):
+        stacked = np.concatenate([windows for windows, _, _ in batch])
+        # Pad to a power of two so the predict function is only traced for a few shapes
+        padded = 1 << (rows - 1).bit_length()
+        if padded > rows:
+            stacked = np.concatenate([stacked, np.zeros((padded - rows,) + stacked.shape[1:], dtype=stacked.dtype)])
+        started = time.perf_counter()
+        outputs = np.asarray(self.model.predict_on_batch(stacked)).reshape(-1)[:rows]
+        finished = time.perf_counter()
+        
+        offset = 0
+        for windows, future, enqueued in batch:
+            future.set_result(outputs[offset:offset + len(windows)])
+            offset += len(windows)
+        with self._ready:
+            self.requests += len(batch)
+            self.batches += 1
+            self.rows += rows
+            self.max_batch_rows = max(self.max_batch_rows, rows)
+            self.predict_seconds += finished - started
+            self._latencies.extend(finished - enqueued for _, _, enqueued in batch)
+        predict_batch_rows.observe(rows, model=self.model_type)
+        predict_batch_requests.observe(len(batch), model=self.model_type)
+    
+    def stats(self):
+        with self._ready:
+            latencies = np.array(self._latencies)
+            return {
+                'model_id': self.model_id,
+                'model': self.model_type,
+                'params': self.meta['params'],
+                'end_date': self.meta.get('end_date'),
+                'requests': self.requests,
+                'batches': self.batches,
+                'rows': self.rows,
+                'mean_batch_requests': self.requests / self.batches if self.batches else 0.0,
+                'mean_batch_rows': self.rows / self.batches if self.batches else 0.0,
+                'max_batch_rows': self.max_batch_rows,
+                'mean_predict_ms': 1000 * self.predict_seconds / self.batches if self.batches else 0.0,
+                # Queueing plus prediction, over the last SERVING_LATENCY_SAMPLES requests
+                'latency_ms': {
+                    'p50': float(np.percentile(latencies, 50) * 1000) if len(latencies) else None,
+                    'p95': float(np.percentile(latencies, 95) * 1000) if len(latencies) else None,
+                    'max': float(latencies.max() * 1000) if len(latencies) else None
+                },
+                'nbytes': self.nbytes
+            }
+
+serving_models = StockDataCache(SERVING_MAX_BYTES, sizeof=lambda server: server.nbytes)
+_serving_load_lock = threading.Lock()
+
+# Function to get the server for a stored model, loading it on first use or
+# when the artifact was retrained since. Returns None if no artifact exists.
+def get_model_server(model_id):
+    artifact_dir = os.path.join(MODEL_STORE_DIR, model_id)
+    try:
+        meta_mtime = os.stat(os.path.join(artifact_dir, 'meta.json')).st_mtime
+    except OSError:
+        return None
+    server = serving_models.get(model_id)
+    if server is not None and server.meta_mtime == meta_mtime:
+        return server
+    with _serving_load_lock:
+        server = serving_models.get(model_id)
+        if server is not None and server.meta_mtime == meta_mtime:
+            return server
+        meta = load_model_artifact_meta(artifact_dir)
+        if meta is None:
+            return None
+        model, scaler = load_trained_model(artifact_dir)
+        server = ModelServer(model_id, model, scaler, meta, meta_mtime)
+        serving_models.set(model_id, server)
+        logger.info("Loaded %s for serving (%s bytes)", model_id, server.nbytes)
+        return server
+
+# Function to predict with a served model on the windows ending at the last
+# `windows` rows of a series. Returns (payload, status_code).
+def run_predict(server, df, column, windows=1):
+    if df.empty:
+        return {'error': 'Empty dataset provided'}, 400
+    column = column or server.meta.get('column')
+    if column not in df.columns:
+        return {'error': f'Column {column} not found in data'}, 400
+    df = safe_parse_dates(df, source='client').dropna(subset=[column]).reset_index(drop=True)
+    if len(df) < server.seq_length + windows - 1:
+        return {'error': f'{windows} window(s) of {server.seq_length} rows need at least '
+                         f'{server.seq_length + windows - 1} rows. Current data points: {len(df)}'}, 400
+    
+    # Only the rows the windows cover are scaled
+    tail = df.iloc[len(df) - server.seq_length - windows + 1:]
+    features = network_features(server.model_type, tail, column)
+    # Pass the frame only to scalers that were fitted on one
+    if not hasattr(server.scaler, 'feature_names_in_'):
+        features = features.to_numpy(dtype=float)
+    scaled = server.scaler.transform(features)
+    batch = np.lib.stride_tricks.sliding_window_view(scaled.astype(np.float32), server.seq_length, axis=0)
+    batch = np.ascontiguousarray(np.swapaxes(batch, 1, 2))
+    
+    try:
+        scaled_predictions = server.submit(batch).result(timeout=PREDICT_TIMEOUT)
+    # Before Python 3.11 this isn't the builtin TimeoutError
+    except FutureTimeoutError:
+        return {'error': f'Prediction did not finish within {PREDICT_TIMEOUT:g}s'}, 503
+    predictions = inverse_scale_target(server.scaler, scaled_predictions)
+    return {
+        'model_id': server.model_id,
+        'model': server.model_type,
+        # Each prediction is for the row after its window's last date
+        'window_end_dates': tail['Date'].iloc[server.seq_length - 1:].dt.strftime('%Y-%m-%d').tolist(),
+        'predictions': predictions.tolist(),
+        'serving': server.stats()
+    }, 200
@@ -4,6 +4,11 @@ let selectedColumn = "";
 let columns = [];
 let currentCompany = ""; // Track the current company name
 let isDataFetching = false; // Track if data is currently being fetched
+let datasetId = null; // Server-side handle for the fetched data (see /api/stock-data)
+let fetchedTicker = ""; // Ticker of the fetched data, used to key stored models
+let currentModelJobId = null; // Background training job currently being polled
+let modelProgressFromServer = false; // Stop simulated progress once real progress arrives
+const CHART_DECIMATION_FACTOR = 2; // Decimate the stock plot past this many rows per pixel
 
 // DOM elements - add null checks to prevent errors
 const fetchDataBtn = document.getElementById("fetch-data-btn");
@@ -337,6 +342,7 @@ function showModelLoading(initialMessage = "Preparing model...") {
     progressBar.style.width = "0%";
 
     // Start progress animation
+    modelProgressFromServer = false;
     simulateModelProgress();
   }
 }
@@ -381,7 +387,7 @@ function simulateModelProgress() {
   let currentStep = 0;
 
   function nextStep() {
-    if (currentStep < progressSteps.length) {
+    if (currentStep < progressSteps.length && !modelProgressFromServer) {
       const step = progressSteps[currentStep];
       updateModelProgress(step.progress, step.message);
       currentStep++;
@@ -392,6 +398,75 @@ function simulateModelProgress() {
   nextStep();
 }
 
+// Poll a background training job, mirroring its progress in the loading bar,
+// and return the response holding its result once it has finished. Returns
+// null if the job was superseded by a newer run.
+async function waitForModelJob(jobId) {
+  currentModelJobId = jobId;
+
+  try {
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      if (currentModelJobId !== jobId) {
+        return null;
+      }
+
+      const statusResponse = await fetch(`/api/jobs/${jobId}`);
+      if (!statusResponse.ok) {
+        throw new Error(`Lost track of training job (${statusResponse.status})`);
+      }
+
+      const job = await statusResponse.json();
+      if (["done", "failed", "cancelled"].includes(job.status)) {
+        return fetch(`/api/jobs/${jobId}/result`);
+      }
+
+      if (job.status === "running") {
+        modelProgressFromServer = true;
+        updateModelProgress(job.progress, job.message);
+      }
+    }
+  } finally {
+    if (currentModelJobId === jobId) {
+      currentModelJobId = null;
+    }
+  }
+}
+
+// Cancel the training job being polled, if any
+function cancelCurrentModelJob() {
+  if (currentModelJobId) {
+    fetch(`/api/jobs/${currentModelJobId}`, { method: "DELETE" }).catch(
+      (error) => console.error("Error cancelling training job:", error)
+    );
+    currentModelJobId = null;
+  }
+}
+
+// POST to an analysis endpoint using the server-side dataset handle when we
+// have one. If the server no longer knows the dataset, upload the records.
+async function postAnalysisRequest(endpoint, payload, buildRawPayload) {
+  const post = (body) =>
+    fetch(endpoint, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify(body),
+    });
+
+  if (datasetId) {
+    const response = await post({ ...payload, dataset_id: datasetId });
+    if (response.status !== 404) {
+      return response;
+    }
+    console.log("Dataset handle expired on the server, uploading data instead");
+    datasetId = null;
+  }
+
+  return post({ ...payload, ...buildRawPayload() });
+}
+
 // Fetch stock data from API
 async function fetchStockData() {
   console.log("fetchStockData called - starting data fetch process");
@@ -417,6 +492,7 @@ async function fetchStockData() {
 
     // Clear previous data and models
     stockData = [];
+    datasetId = null;
     selectedColumn = "";
     columns = [];
 
@@ -636,6 +712,8 @@ async function fetchStockData() {
     // Store data globally
     stockData = result.data;
     columns = result.columns;
+    datasetId = result.dataset_id || null;
+    fetchedTicker = tickerValue;
 
     // Hide skeleton and display data
     hideSkeletonLoader("data-skeleton");
@@ -847,8 +925,15 @@ function createStockPlot(data, columns) {
       return;
     }
 
+    // Long histories start empty and get server-side decimated series below,
+    // so the browser never has to lay out more points than the plot has pixels
+    const decimate =
+      datasetId !== null &&
+      data.length > plotDiv.clientWidth * CHART_DECIMATION_FACTOR;
+    const columnValues = (col) => (decimate ? [] : data.map((row) => row[col]));
+
     // Format dates
-    const dates = data.map((row) => new Date(row.Date));
+    const dates = decimate ? [] : data.map((row) => new Date(row.Date));
 
     // Create traces for different columns
     const traces = [];
@@ -857,7 +942,7 @@ function createStockPlot(data, columns) {
     traces.push({
       name: "Close",
       x: dates,
-      y: data.map((row) => row.Close),
+      y: columnValues("Close"),
       type: "scatter",
       mode: "lines",
       line: { color: "#4d9aff", width: 2 },
@@ -874,7 +959,7 @@ function createStockPlot(data, columns) {
         traces.push({
           name: col,
           x: dates,
-          y: data.map((row) => row[col]),
+          y: columnValues(col),
           type: "scatter",
           mode: col === "Volume" ? "lines" : "lines",
           line: { color: colors[index], width: 1.5 },
@@ -948,6 +1033,21 @@ function createStockPlot(data, columns) {
     // Create plot
     Plotly.newPlot("stock-plot", traces, layout, config);
 
+    if (decimate) {
+      loadDecimatedStockPlot(null);
+      // Zooming asks for the visible range again, at full resolution once it fits
+      plotDiv.on("plotly_relayout", function (event) {
+        if (event["xaxis.range[0]"] !== undefined) {
+          loadDecimatedStockPlot([
+            event["xaxis.range[0]"],
+            event["xaxis.range[1]"],
+          ]);
+        } else if (event["xaxis.autorange"]) {
+          loadDecimatedStockPlot(null);
+        }
+      });
+    }
+
     // Add event listener to resize plot when window size changes
     window.addEventListener("resize", function () {
       Plotly.relayout("stock-plot", {
@@ -962,6 +1062,58 @@ function createStockPlot(data, columns) {
   }
 }
 
+// Fill the stock plot's traces with decimated series for a date range (null
+// for everything) from /api/chart-data: LTTB-reduced lines served from
+// per-dataset resolution pyramids, about one point per pixel
+async function loadDecimatedStockPlot(range) {
+  const plotDiv = document.getElementById("stock-plot");
+  if (!plotDiv || !plotDiv.data || !datasetId) return;
+
+  const traceColumns = plotDiv.data.map((trace) => trace.name);
+  const payload = {
+    dataset_id: datasetId,
+    kind: "line",
+    width: Math.max(plotDiv.clientWidth, 300),
+    columns: traceColumns,
+  };
+  if (range) {
+    // Plotly reports ranges as local-time strings
+    payload.start = new Date(String(range[0]).replace(" ", "T")).getTime();
+    payload.end = new Date(String(range[1]).replace(" ", "T")).getTime();
+  }
+
+  try {
+    const response = await fetch("/api/chart-data", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify(payload),
+    });
+    if (!response.ok) {
+      throw new Error(`HTTP error: ${response.status}`);
+    }
+    const result = await response.json();
+
+    const update = { x: [], y: [] };
+    traceColumns.forEach((col) => {
+      const series = result.series[col];
+      update.x.push(series.Date.map((millis) => new Date(millis)));
+      update.y.push(series[col]);
+    });
+    Plotly.restyle(
+      plotDiv,
+      update,
+      traceColumns.map((_, index) => index)
+    );
+    console.log(
+      `Stock plot: ${result.rows_in_range} rows drawn at level ${result.level}`
+    );
+  } catch (error) {
+    console.error("Error loading decimated chart data:", error);
+  }
+}
+
 // Populate column select dropdown
 function populateColumnSelect(columns) {
   const columnSelect = document.getElementById("column-select");
@@ -1004,15 +1156,11 @@ async function checkStationarity() {
   showSectionLoading("stationarity-section", "Checking stationarity...");
 
   try {
-    const response = await fetch("/api/stationarity", {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({
-        column_data: stockData.map((row) => row[selectedColumn]),
-      }),
-    });
+    const response = await postAnalysisRequest(
+      "/api/stationarity",
+      { column: selectedColumn },
+      () => ({ column_data: stockData.map((row) => row[selectedColumn]) })
+    );
 
     if (!response.ok) {
       throw new Error("Failed to check stationarity");
@@ -1052,16 +1200,16 @@ async function createDecomposition() {
   );
 
   try {
-    const response = await fetch("/api/decomposition", {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({
+    // Ask for the raw component arrays and draw the figures here
+    const response = await postAnalysisRequest(
+      "/api/decomposition",
+      { column: selectedColumn, format: "raw" },
+      () => ({
         column_data: stockData.map((row) => row[selectedColumn]),
         dates: stockData.map((row) => row.Date),
-      }),
-    });
+        format: "raw",
+      })
+    );
 
     if (!response.ok) {
       throw new Error("Failed to create decomposition");
@@ -1069,9 +1217,23 @@ async function createDecomposition() {
 
     const result = await response.json();
 
-    Plotly.newPlot("trend-plot", JSON.parse(result.trend));
-    Plotly.newPlot("seasonal-plot", JSON.parse(result.seasonal));
-    Plotly.newPlot("residual-plot", JSON.parse(result.resid));
+    plotDecompositionComponent("trend-plot", result.dates, result.trend, "Trend", {
+      color: "blue",
+    });
+    plotDecompositionComponent(
+      "seasonal-plot",
+      result.dates,
+      result.seasonal,
+      "Seasonality",
+      { color: "green" }
+    );
+    plotDecompositionComponent(
+      "residual-plot",
+      result.dates,
+      result.resid,
+      "Residuals",
+      { color: "red", dash: "dot" }
+    );
 
     // After decomposition, run the selected model
     runSelectedModel();
@@ -1083,6 +1245,25 @@ async function createDecomposition() {
   }
 }
 
+// Draw one decomposition component as a line chart
+function plotDecompositionComponent(elementId, dates, values, title, line) {
+  const trace = {
+    x: dates,
+    y: values,
+    type: "scatter",
+    mode: "lines",
+    line: line,
+  };
+
+  const layout = {
+    title: title,
+    xaxis: { title: "x" },
+    yaxis: { title: "y" },
+  };
+
+  Plotly.newPlot(elementId, [trace], layout);
+}
+
 // Run the selected model
 async function runSelectedModel() {
   if (!selectedColumn || stockData.length === 0) {
@@ -1129,6 +1310,9 @@ async function runSelectedModel() {
   metricsSection.style.display = modelType === "Prophet" ? "none" : "flex";
   componentsPlot.style.display = modelType === "Prophet" ? "block" : "none";
 
+  // A new run supersedes any job still training for the previous one
+  cancelCurrentModelJob();
+
   // Show advanced loading animation
   showModelLoading(`Preparing ${modelType} model for ${currentCompany}...`);
 
@@ -1157,7 +1341,6 @@ async function runSelectedModel() {
         );
 
         payload = {
-          data: stockData,
           column: selectedColumn,
           sequence_length: sequence_length,
           head_size: head_size,
@@ -1171,7 +1354,6 @@ async function runSelectedModel() {
         console.log(`LSTM params: seq_length=${seqLength}`);
 
         payload = {
-          data: stockData,
           column: selectedColumn,
           seq_length: seqLength,
         };
@@ -1180,7 +1362,6 @@ async function runSelectedModel() {
       case "Prophet":
         endpoint = "/api/prophet";
         payload = {
-          data: stockData,
           column: selectedColumn,
         };
         break;
@@ -1193,13 +1374,23 @@ async function runSelectedModel() {
       `Sending request to ${endpoint} with payload for ${selectedColumn}`
     );
 
-    const response = await fetch(endpoint, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify(payload),
-    });
+    // Train in the background and poll for progress instead of blocking the request
+    let response = await postAnalysisRequest(
+      endpoint,
+      { ...payload, ticker: fetchedTicker, async: true },
+      () => ({
+        data: stockData,
+      })
+    );
+
+    if (response.status === 202) {
+      const job = await response.json();
+      console.log(`Training job ${job.job_id} submitted`);
+      response = await waitForModelJob(job.job_id);
+      if (!response) {
+        return;
+      }
+    }
 
     if (!response.ok) {
       const errorText = await response.text();
@@ -1895,13 +2086,25 @@ function applyTechnicalIndicators() {
   const showRSI = document.getElementById("show-rsi").checked;
   const rsiPeriod = parseInt(document.getElementById("rsi-period").value);
 
-  // Update main chart with indicators
-  setTimeout(() => {
-    updateChartWithIndicators(showMA, maPeriod, showBollinger, bollingerPeriod);
+  // Computed server-side (see /api/indicators); the JavaScript versions below
+  // are only used when the server can't provide them
+  fetchServerIndicators([
+    { name: "sma", period: maPeriod, column: selectedColumn },
+    { name: "bollinger", period: bollingerPeriod, column: selectedColumn },
+    { name: "rsi", period: rsiPeriod, column: selectedColumn },
+  ]).then((indicators) => {
+    // Update main chart with indicators
+    updateChartWithIndicators(
+      showMA,
+      maPeriod,
+      showBollinger,
+      bollingerPeriod,
+      indicators
+    );
 
     // Calculate and display RSI if selected
     if (showRSI) {
-      calculateRSI(rsiPeriod);
+      calculateRSI(rsiPeriod, indicators);
       // Show indicators section
       document.getElementById("indicators-section").style.display = "block";
     }
@@ -1916,7 +2119,35 @@ function applyTechnicalIndicators() {
     createTechnicalSummary(rsiPeriod);
 
     hideSectionLoading("viz-section");
-  }, 500);
+  });
+}
+
+// Fetch indicator columns for the current dataset from /api/indicators.
+// Resolves to null when there is no dataset or the request fails.
+async function fetchServerIndicators(specs) {
+  if (!datasetId) return null;
+  try {
+    const response = await fetch("/api/indicators", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ dataset_id: datasetId, indicators: specs }),
+    });
+    if (!response.ok) {
+      throw new Error(`HTTP error: ${response.status}`);
+    }
+    const result = await response.json();
+    return result.data;
+  } catch (error) {
+    console.error("Error fetching indicators, computing them locally:", error);
+    return null;
+  }
+}
+
+// Server indicator columns are suffixed with their input column unless it's Close
+function indicatorKey(base) {
+  return selectedColumn === "Close" ? base : `${base}_${selectedColumn}`;
 }
 
 // Calculate moving average
@@ -1968,7 +2199,14 @@ function calculateBollingerBands(data, period, numStdDev = 2) {
 }
 
 // Calculate RSI (Relative Strength Index)
-function calculateRSI(period) {
+function calculateRSI(period, indicators = null) {
+  const serverRSI = indicators && indicators[indicatorKey(`RSI_${period}`)];
+  const rsi = serverRSI || computeRSI(period);
+  plotRSI(period, rsi);
+}
+
+// Wilder's RSI over the selected column
+function computeRSI(period) {
   const prices = stockData.map((row) => row[selectedColumn]);
   const gains = [];
   const losses = [];
@@ -2021,6 +2259,11 @@ function calculateRSI(period) {
     rsi.push(100 - 100 / (1 + rs));
   }
 
+  return rsi;
+}
+
+// Plot the RSI and update its technical summary entry
+function plotRSI(period, rsi) {
   // Create RSI plot
   const dates = stockData.map((row) => new Date(row.Date));
 
@@ -2159,7 +2402,8 @@ function updateChartWithIndicators(
   showMA,
   maPeriod,
   showBollinger,
-  bollingerPeriod
+  bollingerPeriod,
+  indicators = null
 ) {
   const dates = stockData.map((row) => new Date(row.Date));
   const prices = stockData.map((row) => row[selectedColumn]);
@@ -2177,7 +2421,9 @@ function updateChartWithIndicators(
 
   // Add moving average
   if (showMA) {
-    const ma = calculateMA(prices, maPeriod);
+    const ma =
+      (indicators && indicators[indicatorKey(`SMA_${maPeriod}`)]) ||
+      calculateMA(prices, maPeriod);
     traces.push({
       x: dates,
       y: ma,
@@ -2190,7 +2436,15 @@ function updateChartWithIndicators(
 
   // Add Bollinger Bands
   if (showBollinger) {
-    const bands = calculateBollingerBands(prices, bollingerPeriod);
+    const suffix = `${bollingerPeriod}_2`;
+    const bands =
+      indicators && indicators[indicatorKey(`BB_middle_${suffix}`)]
+        ? {
+            ma: indicators[indicatorKey(`BB_middle_${suffix}`)],
+            upper: indicators[indicatorKey(`BB_upper_${suffix}`)],
+            lower: indicators[indicatorKey(`BB_lower_${suffix}`)],
+          }
+        : calculateBollingerBands(prices, bollingerPeriod);
 
     traces.push({
       x: dates,
@@ -4,7 +4,7 @@ let currentTicker = "";
 let currentPage = 1;
 let totalArticles = 0;
 let articlesPerPage = 6;
-let realTimeUpdateInterval;
+let realTimeStream; // EventSource for server-pushed quotes
 let sentimentChart;
 let realTimeChart;
 let isNewsLoading = false; // Track if news is currently being fetched
@@ -1061,9 +1061,12 @@ function updateSentimentChart() {
 
 // Start real-time price updates
 function startRealTimeUpdates(ticker) {
-  // Clear any existing interval
-  if (realTimeUpdateInterval) {
-    clearInterval(realTimeUpdateInterval);
+  ticker = ticker || currentTicker;
+  if (!ticker) return;
+
+  // Close any existing stream
+  if (realTimeStream) {
+    realTimeStream.close();
   }
 
   console.log(`Starting real-time updates for ${ticker}`);
@@ -1093,11 +1096,17 @@ function startRealTimeUpdates(ticker) {
     `;
   }
 
-  // Generate initial price data (simulated for demo)
-  const initialPrice = 100 + Math.random() * 400; // Random price between 100 and 500
+  // Subscribe to the server's quote stream; the first event is a full snapshot,
+  // later ones only carry the fields that changed
+  let latestQuote = null;
+  realTimeStream = new EventSource(
+    `/api/stream/prices?tickers=${encodeURIComponent(ticker)}`
+  );
+
+  realTimeStream.addEventListener("snapshot", (event) => {
+    latestQuote = JSON.parse(event.data);
+    const initialPrice = latestQuote.price;
 
-  // Wait a moment before showing data to simulate connection time
-  setTimeout(() => {
     // Initialize real-time chart data if it exists
     if (realTimeChart) {
       // Clear existing data
@@ -1114,7 +1123,7 @@ function startRealTimeUpdates(ticker) {
     // Initialize displays
     updatePriceDisplay(initialPrice);
     updateChangeStats(initialPrice);
-    updateMarketStats(initialPrice);
+    updateMarketStats(initialPrice, latestQuote);
 
     // Show the real-time container with data
     if (realTimeContainer) {
@@ -1180,33 +1189,24 @@ function startRealTimeUpdates(ticker) {
       // Initialize displays
       updatePriceDisplay(initialPrice);
       updateChangeStats(initialPrice);
-      updateMarketStats(initialPrice);
+      updateMarketStats(initialPrice, latestQuote);
     }
+  });
 
-    // Set up interval for regular updates
-    let lastPrice = initialPrice;
-    realTimeUpdateInterval = setInterval(() => {
-      // Generate next price (random walk)
-      const newPrice = generateNextPrice(lastPrice);
-
-      // Update the UI with the new price
-      updateRealTimeData(newPrice);
-
-      // Update last price for next iteration
-      lastPrice = newPrice;
-    }, 3000); // Update every 3 seconds
-  }, 1500); // Simulate connection time
-}
+  realTimeStream.addEventListener("quote", (event) => {
+    if (!latestQuote) return;
+    latestQuote = { ...latestQuote, ...JSON.parse(event.data) };
+    updateRealTimeData(latestQuote.price, latestQuote);
+  });
 
-// Generate next price movement (semi-random with trend)
-function generateNextPrice(lastPrice) {
-  // Random movement with slight drift
-  const movement = (Math.random() - 0.48) * lastPrice * 0.02;
-  return Math.max(lastPrice + movement, 0.01);
+  realTimeStream.onerror = () => {
+    // EventSource reconnects by itself and receives a fresh snapshot
+    console.warn(`Real-time stream for ${ticker} interrupted, reconnecting`);
+  };
 }
 
 // Update real-time price data display
-function updateRealTimeData(price) {
+function updateRealTimeData(price, quote) {
   try {
     // Make sure we have a valid chart instance
     if (!realTimeChart || !realTimeChart.data) {
@@ -1250,7 +1250,7 @@ function updateRealTimeData(price) {
     // Update all UI elements
     updatePriceDisplay(price);
     updateChangeStats(price);
-    updateMarketStats(price);
+    updateMarketStats(price, quote);
   } catch (error) {
     console.error("Error in updateRealTimeData:", error);
   }
@@ -1300,12 +1300,12 @@ function updateChangeStats(price) {
 }
 
 // Update market statistics
-function updateMarketStats(price) {
-  // Generate random market stats based on the current price
-  const open = price * (1 - Math.random() * 0.05);
-  const high = price * (1 + Math.random() * 0.02);
-  const low = price * (1 - Math.random() * 0.02);
-  const volume = Math.floor(Math.random() * 10000000);
+function updateMarketStats(price, quote) {
+  // Session stats come from the streamed quote
+  const open = quote ? quote.open : price;
+  const high = quote ? quote.high : price;
+  const low = quote ? quote.low : price;
+  const volume = quote ? quote.volume : 0;
   const marketCap = (price * (Math.random() * 100 + 50)).toFixed(2);
 
   // Update all statistics with null checks
@@ -0,0 +1,309 @@
+# In-memory response caches and the on-disk OHLCV store with gap fetching
+import time
+import pandas as pd
+import numpy as np
+from datetime import date
+import json
+import hashlib
+import os
+import re
+import threading
+import sys
+from collections import OrderedDict
+
+from observability import logger
+
+# Memory budget for cached DataFrames and TTL for ranges that include today
+STOCK_CACHE_MAX_BYTES = int(os.environ.get('STOCK_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+STOCK_CACHE_LIVE_TTL = 5 * 60
+
+# Helper to estimate how much memory a cached value holds
+def _estimate_nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    return sys.getsizeof(value)
+
+# Memory-bounded LRU cache with optional per-entry TTL
+class StockDataCache:
+    """
+    Thread-safe LRU cache bounded by the estimated memory of its values.
+    Entries stored without a TTL (closed historical ranges) never expire;
+    entries with a TTL (ranges that include today) are dropped once stale.
+    """
+    def __init__(self, max_bytes, sizeof=_estimate_nbytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, nbytes, expires_at = entry
+            if expires_at is not None and time.time() >= expires_at:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value, ttl=None):
+        nbytes = self.sizeof(value)
+        if nbytes > self.max_bytes:
+            return False
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, nbytes, expires_at)
+            self.bytes_used += nbytes
+            while self.bytes_used > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+    
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self._remove(key)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+    
+    def _remove(self, key):
+        value, nbytes, _ = self._entries.pop(key)
+        self.bytes_used -= nbytes
+        return value
+    
+    # Live values from least to most recently used, without counting as lookups
+    def values(self):
+        now = time.time()
+        with self._lock:
+            return [value for value, _, expires_at in self._entries.values()
+                    if expires_at is None or now < expires_at]
+    
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[2] is None or time.time() < entry[2])
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes_used,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+# Cache for stock data to reduce API calls
+stock_data_cache = StockDataCache(STOCK_CACHE_MAX_BYTES)
+
+# Normalized frames served by /api/stock-data, addressable by a content hash so
+# the analysis endpoints can be called with a dataset_id instead of the records
+DATASET_REGISTRY_MAX_BYTES = int(os.environ.get('DATASET_REGISTRY_MAX_BYTES', 256 * 1024 * 1024))
+dataset_registry = StockDataCache(DATASET_REGISTRY_MAX_BYTES)
+
+# Function to register a frame and return its content-addressed dataset ID
+def register_dataset(df):
+    digest = hashlib.sha1(','.join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    dataset_id = digest.hexdigest()[:24]
+    if dataset_id not in dataset_registry:
+        dataset_registry.set(dataset_id, df)
+    return dataset_id
+
+# Ranges that reach today can still change, so they only get a short TTL
+def range_ttl(end):
+    return STOCK_CACHE_LIVE_TTL if end >= date.today() else None
+
+def stock_cache_key(provider, ticker, start, end):
+    return f"{provider}_{ticker}_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}"
+
+# Persistent per-ticker OHLCV store. Each (provider, ticker) pair is kept as one
+# memory-mapped NumPy structured array plus a small JSON file recording which
+# calendar days have already been fetched, so any date range can be answered
+# locally and only the missing gaps go to the network.
+STORE_DIR = os.environ.get(
+    'STOCK_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_store')
+)
+
+# Today's bar keeps changing until the close, so it is only trusted for this long
+STORE_LIVE_TTL = 15 * 60
+
+_store_locks = {}
+_store_locks_guard = threading.Lock()
+
+def _store_lock(provider, ticker):
+    key = (provider, ticker)
+    with _store_locks_guard:
+        if key not in _store_locks:
+            _store_locks[key] = threading.Lock()
+        return _store_locks[key]
+
+def _store_paths(provider, ticker):
+    safe_ticker = re.sub(r'[^A-Za-z0-9._-]', '_', ticker.upper())
+    base = os.path.join(STORE_DIR, provider, safe_ticker)
+    return base + '.npy', base + '.json'
+
+def _load_store(provider, ticker):
+    data_path, meta_path = _store_paths(provider, ticker)
+    if not os.path.exists(meta_path):
+        return None, {'coverage': [], 'live': None}
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        rows = np.load(data_path, mmap_mode='r') if os.path.exists(data_path) else None
+        return rows, meta
+    except Exception as e:
+        logger.warning("Ignoring unreadable store for %s/%s: %s", provider, ticker, e)
+        return None, {'coverage': [], 'live': None}
+
+def _save_store(provider, ticker, frame, meta):
+    data_path, meta_path = _store_paths(provider, ticker)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    
+    if frame is not None and not frame.empty:
+        fields = [('Date', 'M8[ns]')]
+        for col in frame.columns:
+            if col != 'Date' and frame[col].dtype.kind in 'iuf':
+                fields.append((col, frame[col].dtype.str))
+        rows = np.empty(len(frame), dtype=fields)
+        rows['Date'] = frame['Date'].values.astype('M8[ns]')
+        for name, _ in fields[1:]:
+            rows[name] = frame[name].values
+        # np.save appends .npy when the path doesn't already end with it
+        tmp_data_path = data_path + suffix + '.npy'
+        np.save(tmp_data_path, rows)
+        os.replace(tmp_data_path, data_path)
+    
+    # The metadata is written last so a crash never claims coverage the data file lacks
+    tmp_meta_path = meta_path + suffix
+    with open(tmp_meta_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta_path, meta_path)
+
+def _rows_to_frame(rows, lo=0, hi=None):
+    if rows is None:
+        return pd.DataFrame(columns=['Date'])
+    chunk = rows[lo:hi]
+    # Copy out of the memory map so callers never hold a reference to the file
+    return pd.DataFrame({name: np.array(chunk[name]) for name in rows.dtype.names})
+
+def _missing_ranges(coverage, start_ord, end_ord):
+    gaps = []
+    cursor = start_ord
+    for lo, hi in sorted(coverage):
+        if hi < cursor:
+            continue
+        if lo > end_ord:
+            break
+        if lo > cursor:
+            gaps.append((cursor, lo - 1))
+        cursor = max(cursor, hi + 1)
+        if cursor > end_ord:
+            break
+    if cursor <= end_ord:
+        gaps.append((cursor, end_ord))
+    return gaps
+
+def _add_coverage(coverage, lo, hi):
+    merged = []
+    for a, b in sorted(coverage + [[lo, hi]]):
+        if merged and a <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+    return merged
+
+# Function to answer a date range from the persistent store, fetching only the gaps
+def load_ohlcv_range(provider, ticker, start, end, fetch):
+    """
+    Return rows for ticker between start and end (inclusive) from the local
+    store, calling fetch(ticker, gap_start, gap_end) only for days that have
+    never been fetched before. Newly fetched rows are merged into the store.
+    
+    Returns None if any gap could not be fetched, otherwise a DataFrame
+    (possibly empty) sorted by Date.
+    """
+    today = date.today()
+    today_ord = today.toordinal()
+    start_ord = start.toordinal()
+    end_ord = min(end.toordinal(), today_ord)
+    if end_ord < start_ord:
+        return pd.DataFrame(columns=['Date'])
+    
+    with _store_lock(provider, ticker):
+        rows, meta = _load_store(provider, ticker)
+        coverage = meta.get('coverage', [])
+        live = meta.get('live')
+        
+        known = list(coverage)
+        if live and live['date'] == today_ord and time.time() - live['at'] < STORE_LIVE_TTL:
+            known.append([today_ord, today_ord])
+        gaps = _missing_ranges(known, start_ord, end_ord)
+        
+        if gaps:
+            logger.debug("Store for %s/%s is missing %s range(s), fetching", provider, ticker, len(gaps))
+            fetched = []
+            failed = False
+            for lo, hi in gaps:
+                part = fetch(ticker, date.fromordinal(lo), date.fromordinal(hi))
+                if part is None:
+                    failed = True
+                    break
+                if not part.empty:
+                    fetched.append(part)
+                # Only closed days are recorded as permanently covered
+                closed_hi = min(hi, today_ord - 1)
+                if lo <= closed_hi:
+                    coverage = _add_coverage(coverage, lo, closed_hi)
+                if hi >= today_ord:
+                    live = {'date': today_ord, 'at': time.time()}
+            
+            merged = None
+            if fetched:
+                existing = [_rows_to_frame(rows)] if rows is not None and len(rows) else []
+                merged = pd.concat(existing + fetched, ignore_index=True)
+                merged = merged.drop_duplicates(subset='Date', keep='last')
+                merged = merged.sort_values('Date').reset_index(drop=True)
+            rows = None
+            _save_store(provider, ticker, merged, {'coverage': coverage, 'live': live})
+            if failed:
+                return None
+            rows, _ = _load_store(provider, ticker)
+        
+        if rows is None or len(rows) == 0:
+            return pd.DataFrame(columns=['Date'])
+        dates = rows['Date']
+        lo = np.searchsorted(dates, np.datetime64(date.fromordinal(start_ord), 'ns'), side='left')
+        hi = np.searchsorted(dates, np.datetime64(date.fromordinal(end_ord + 1), 'ns'), side='left')
+        return _rows_to_frame(rows, lo, hi)
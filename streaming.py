@@ -0,0 +1,217 @@
+# Live price feeds fanned out to server-sent event subscribers
+import time
+import pandas as pd
+import numpy as np
+from datetime import date, timedelta
+import hashlib
+import io
+import os
+import threading
+
+from observability import logger
+from providers import (
+    PROVIDER_TIMEOUT, STOCK_DATA_OFFLINE, STOOQ_BASE_URL, get_fallback_data, get_stooq_data,
+    provider_health, provider_session
+)
+
+# Real-time prices: one poller thread per subscribed ticker fans each quote out
+# to every connected client over Server-Sent Events, so upstream requests scale
+# with the number of tickers rather than the number of viewers
+PRICE_STREAM_SOURCE = os.environ.get('PRICE_STREAM_SOURCE', 'simulated')
+PRICE_STREAM_INTERVAL = float(os.environ.get('PRICE_STREAM_INTERVAL', 3))
+PRICE_STREAM_HEARTBEAT = 15
+PRICE_STREAM_MAX_TICKERS = 20
+
+# Function to round a quote's prices to cents. change and change_percent are
+# against the previous close, and None when that isn't known.
+def _quote(price, open_price, high, low, volume, reference):
+    change = price - reference if reference else None
+    return {
+        'price': round(price, 2),
+        'open': round(open_price, 2),
+        'high': round(high, 2),
+        'low': round(low, 2),
+        'volume': int(volume),
+        'change': round(change, 2) if change is not None else None,
+        'change_percent': round(change / reference * 100, 2) if change is not None else None
+    }
+
+# Simulated quote feed that continues a ticker's demo series with a random walk
+class SimulatedQuoteFeed:
+    def __init__(self, ticker):
+        today = date.today()
+        history = get_fallback_data(ticker, today - timedelta(days=90), today)
+        closes = history['Close'].to_numpy(dtype=float)
+        seed = int(hashlib.md5(ticker.encode()).hexdigest(), 16) % (2 ** 32)
+        self.rng = np.random.default_rng([seed, int(time.time())])
+        # Daily volatility of the demo series scaled to one polling interval of a 6.5h session
+        daily_sigma = float(np.std(np.diff(np.log(closes)))) if len(closes) > 2 else 0.015
+        self.sigma = daily_sigma * np.sqrt(PRICE_STREAM_INTERVAL / (6.5 * 3600))
+        self.previous_close = float(closes[-2]) if len(closes) > 1 else float(closes[-1])
+        self.price = self.open = self.high = self.low = float(closes[-1])
+        self.volume = 0
+    
+    def __call__(self):
+        self.price *= float(np.exp(self.rng.normal(0, self.sigma)))
+        self.high = max(self.high, self.price)
+        self.low = min(self.low, self.price)
+        self.volume += int(self.rng.integers(100, 5000))
+        return _quote(self.price, self.open, self.high, self.low, self.volume, self.previous_close)
+
+# Quote feed reading Stooq's latest-quote CSV through the pooled session and breaker
+class StooqQuoteFeed:
+    def __init__(self, ticker):
+        self.ticker = ticker
+        # Stooq needs the market suffix, e.g. AAPL.US
+        self.symbol = ticker if '.' in ticker else f"{ticker}.US"
+        self.url = f"{STOOQ_BASE_URL}/q/l/?s={self.symbol.lower()}&f=sd2t2ohlcv&h&e=csv"
+        self.previous_close = None
+        self.reference_date = None
+    
+    # Function to get the last close before the quote's trading day. It comes
+    # from the OHLCV store, so each day's lookup hits the network at most once.
+    def _previous_close(self, quote_date):
+        if self.reference_date != quote_date:
+            history = get_stooq_data(self.symbol, quote_date - timedelta(days=10), quote_date - timedelta(days=1))
+            if history is None or history.empty:
+                return None
+            self.previous_close = float(history['Close'].iloc[-1])
+            self.reference_date = quote_date
+        return self.previous_close
+    
+    def __call__(self):
+        health = provider_health['stooq']
+        if STOCK_DATA_OFFLINE or not health.allow():
+            return None
+        started = time.perf_counter()
+        try:
+            response = provider_session('stooq').get(self.url, timeout=PROVIDER_TIMEOUT)
+            response.raise_for_status()
+            row = pd.read_csv(io.StringIO(response.text)).iloc[0]
+        except Exception as e:
+            health.record_failure(time.perf_counter() - started)
+            logger.warning("Error fetching Stooq quote for %s: %s", self.ticker, e)
+            return None
+        health.record_success(time.perf_counter() - started)
+        # Unknown symbols come back as N/D
+        if str(row['Close']) == 'N/D':
+            return None
+        try:
+            quote_date = date.fromisoformat(str(row['Date']))
+        except ValueError:
+            quote_date = date.today()
+        return _quote(float(row['Close']), float(row['Open']), float(row['High']),
+                      float(row['Low']), float(row['Volume']), self._previous_close(quote_date))
+
+PRICE_FEEDS = {
+    'simulated': SimulatedQuoteFeed,
+    'stooq': StooqQuoteFeed
+}
+
+# One client's view of the stream: only the latest unsent quote per ticker is
+# kept, so a slow consumer skips intermediate ticks instead of queueing them
+class PriceSubscription:
+    def __init__(self, tickers):
+        self.tickers = tickers
+        self.pending = {}
+        self.sent = {}
+        self.coalesced = 0
+        self.condition = threading.Condition()
+    
+    def offer(self, ticker, quote):
+        with self.condition:
+            if ticker in self.pending:
+                self.coalesced += 1
+            self.pending[ticker] = quote
+            self.condition.notify()
+    
+    def next_updates(self, timeout):
+        with self.condition:
+            if not self.pending:
+                self.condition.wait(timeout)
+            updates, self.pending = self.pending, {}
+        return updates
+    
+    # Returns ('snapshot', full quote) the first time, then ('quote', changed
+    # fields), or None when nothing changed since the last event
+    def event_for(self, ticker, quote):
+        last = self.sent.get(ticker)
+        self.sent[ticker] = quote
+        if last is None:
+            return 'snapshot', {'ticker': ticker, **quote}
+        delta = {k: v for k, v in quote.items() if last.get(k) != v}
+        return ('quote', {'ticker': ticker, **delta}) if delta else None
+
+# Registry of per-ticker pollers and their subscribers
+class PriceStreamHub:
+    def __init__(self, feed_factory, interval):
+        self.feed_factory = feed_factory
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._topics = {}
+        self._subscriptions = set()
+    
+    def subscribe(self, tickers):
+        subscription = PriceSubscription(tickers)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            for ticker in tickers:
+                topic = self._topics.get(ticker)
+                if topic is None:
+                    topic = {'subscribers': set(), 'latest': None, 'polls': 0, 'ticks': 0, 'stop': threading.Event()}
+                    self._topics[ticker] = topic
+                    threading.Thread(target=self._poll, args=(ticker, topic), daemon=True,
+                                     name=f"price-poller-{ticker}").start()
+                topic['subscribers'].add(subscription)
+                # New viewers get the current quote straight away
+                if topic['latest'] is not None:
+                    subscription.offer(ticker, topic['latest'])
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            for ticker in subscription.tickers:
+                topic = self._topics.get(ticker)
+                if topic is None:
+                    continue
+                topic['subscribers'].discard(subscription)
+                # Stop polling once nobody is watching
+                if not topic['subscribers']:
+                    topic['stop'].set()
+                    del self._topics[ticker]
+    
+    def _poll(self, ticker, topic):
+        feed = None
+        while not topic['stop'].is_set():
+            try:
+                if feed is None:
+                    feed = self.feed_factory(ticker)
+                quote = feed()
+            except Exception as e:
+                logger.error("Error polling quotes for %s: %s", ticker, e)
+                quote = None
+            topic['polls'] += 1
+            if quote is not None and quote != topic['latest']:
+                topic['latest'] = quote
+                topic['ticks'] += 1
+                with self._lock:
+                    subscribers = list(topic['subscribers'])
+                for subscription in subscribers:
+                    subscription.offer(ticker, quote)
+            topic['stop'].wait(self.interval)
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'source': PRICE_STREAM_SOURCE,
+                'interval': self.interval,
+                'clients': len(self._subscriptions),
+                'coalesced': sum(subscription.coalesced for subscription in self._subscriptions),
+                'tickers': {
+                    ticker: {'subscribers': len(topic['subscribers']), 'polls': topic['polls'], 'ticks': topic['ticks']}
+                    for ticker, topic in self._topics.items()
+                }
+            }
+
+price_stream_hub = PriceStreamHub(PRICE_FEEDS[PRICE_STREAM_SOURCE], PRICE_STREAM_INTERVAL)
@@ -0,0 +1,120 @@
+# Deterministic synthetic market data for offline use and benchmarks
+import pandas as pd
+import numpy as np
+import hashlib
+import os
+
+# Synthetic market data for offline mode and load testing. Every call draws from
+# its own np.random.Generator seeded from the tickers, so output is reproducible
+# and the process-wide RNG is never reseeded. Log returns follow a one-factor
+# model (a shared market shock plus a per-ticker shock) so tickers move together
+# with the requested correlation, and long ranges are generated in chunks.
+SYNTHETIC_BARS_PER_DAY = {'D': 1, 'min': 390}  # minute bars cover the 9:30-16:00 session
+SYNTHETIC_SESSION_OPEN = pd.Timedelta(hours=9, minutes=30)
+SYNTHETIC_CHUNK_ROWS = int(os.environ.get('SYNTHETIC_CHUNK_ROWS', 250000))  # rows across all tickers
+SYNTHETIC_MAX_TICKERS = 1000
+SYNTHETIC_CORRELATION = 0.5
+SYNTHETIC_ANNUAL_DRIFT = 0.1
+SYNTHETIC_DAILY_SIGMA = 0.015
+
+# Function to derive a stable seed from a ticker symbol
+def ticker_seed(ticker):
+    return int(hashlib.md5(ticker.encode()).hexdigest(), 16) % 10000
+
+class SyntheticMarket:
+    """
+    OHLCV bars for several tickers on business days, either one bar per day
+    ('D') or one per minute of the trading session ('min'). Pass end for a
+    date range or periods for a fixed number of bars from start.
+    
+    Output depends only on the tickers, start, frequency, correlation and
+    seed; extending the range appends bars without changing earlier ones.
+    High >= max(Open, Close) and Low <= min(Open, Close) on every bar.
+    """
+    def __init__(self, tickers, start, end=None, periods=None, freq='D',
+                 correlation=SYNTHETIC_CORRELATION, seed=0):
+        if freq not in SYNTHETIC_BARS_PER_DAY:
+            raise ValueError(f"freq must be one of {sorted(SYNTHETIC_BARS_PER_DAY)}")
+        if not 0 <= correlation < 1:
+            raise ValueError('correlation must be in [0, 1)')
+        if (end is None) == (periods is None):
+            raise ValueError('Pass exactly one of end or periods')
+        self.tickers = list(tickers)
+        self.freq = freq
+        self.bars_per_day = SYNTHETIC_BARS_PER_DAY[freq]
+        # Weekdays filtered from a calendar range; pd.bdate_range is ~100x slower on long ranges
+        if periods is None:
+            calendar = pd.date_range(start=start, end=end, freq='D')
+        else:
+            n_days = -(-periods // self.bars_per_day)
+            calendar = pd.date_range(start=start, periods=n_days * 7 // 5 + 7, freq='D')
+        self.days = calendar[calendar.dayofweek < 5]
+        if periods is None:
+            self.rows = len(self.days) * self.bars_per_day
+        else:
+            self.days = self.days[:n_days]
+            self.rows = periods
+        
+        seeds = np.array([ticker_seed(t) for t in self.tickers])
+        self.seed = [int(seed), *seeds.tolist()]
+        self.correlation = correlation
+        self.initial_price = 100.0 + seeds % 400  # Some base price between 100 and 500
+        # Per-ticker volatility between 0.7x and 1.3x, scaled to one bar
+        self.sigma = SYNTHETIC_DAILY_SIGMA * (0.7 + (seeds % 61) / 100) / np.sqrt(self.bars_per_day)
+        self.drift = SYNTHETIC_ANNUAL_DRIFT / 252 / self.bars_per_day - self.sigma ** 2 / 2
+        self.volume = (10000 + seeds * 99) / self.bars_per_day
+    
+    # Timestamps of bars [begin, stop)
+    def _dates(self, begin, stop):
+        positions = np.arange(begin, stop)
+        dates = self.days[positions // self.bars_per_day]
+        if self.bars_per_day > 1:
+            dates = dates + SYNTHETIC_SESSION_OPEN + pd.to_timedelta(positions % self.bars_per_day, unit='min')
+        return dates
+    
+    # Generator of {ticker: DataFrame} chunks covering the whole range in order
+    def chunks(self, chunk_rows=None):
+        n_tickers = len(self.tickers)
+        if chunk_rows is None:
+            chunk_rows = max(1, SYNTHETIC_CHUNK_ROWS // max(n_tickers, 1))
+        rng = np.random.default_rng(self.seed)
+        market_loading = np.sqrt(self.correlation)
+        own_loading = np.sqrt(1 - self.correlation)
+        close = self.initial_price.astype(float)
+        
+        for begin in range(0, self.rows, chunk_rows):
+            n = min(chunk_rows, self.rows - begin)
+            # All draws for a bar come from one row, so a longer range (or another
+            # chunk size) repeats the same bars before extending them
+            noise = rng.standard_normal((n, 1 + 5 * n_tickers))
+            market, own, gap, upper, lower, activity = (
+                noise[:, :1], *np.split(noise[:, 1:], 5, axis=1))
+            shocks = market_loading * market + own_loading * own
+            closes = close * np.exp(np.cumsum(self.drift + self.sigma * shocks, axis=0))
+            previous = np.vstack([close, closes[:-1]])
+            opens = previous * np.exp(0.25 * gap * self.sigma)
+            # Wicks extend the candle body, so the OHLC relationship always holds
+            highs = np.maximum(opens, closes) * np.exp(0.5 * np.abs(upper) * self.sigma)
+            lows = np.minimum(opens, closes) * np.exp(-0.5 * np.abs(lower) * self.sigma)
+            # Busier bars on bigger moves
+            volumes = (self.volume * np.exp(0.4 * activity) * (1 + np.abs(shocks))).astype(np.int64)
+            close = closes[-1]
+            
+            dates = self._dates(begin, begin + n)
+            yield {ticker: pd.DataFrame({
+                'Date': dates,
+                'Open': opens[:, i],
+                'High': highs[:, i],
+                'Low': lows[:, i],
+                'Close': closes[:, i],
+                'Volume': volumes[:, i]
+            }) for i, ticker in enumerate(self.tickers)}
+    
+    # Whole range as one frame per ticker
+    def frames(self):
+        parts = {ticker: [] for ticker in self.tickers}
+        for chunk in self.chunks():
+            for ticker, df in chunk.items():
+                parts[ticker].append(df)
+        return {ticker: pd.concat(frames, ignore_index=True) if frames else None
+                for ticker, frames in parts.items()}
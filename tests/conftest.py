@@ -0,0 +1,11 @@
+# Shared test setup: the app modules live at the repository root, and the
+# tests never touch the network or the real data and model stores
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('STOCK_DATA_OFFLINE', '1')
+os.environ.setdefault('STOCK_STORE_DIR', tempfile.mkdtemp(prefix='stock-store-'))
+os.environ.setdefault('MODEL_STORE_DIR', tempfile.mkdtemp(prefix='model-store-'))
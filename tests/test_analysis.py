@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from statsmodels.tsa.seasonal import seasonal_decompose
+from statsmodels.tsa.stattools import adfuller
+
+import analysis
+from analysis import IncrementalADF, IncrementalDecomposition, rolling_adf
+
+# adfuller warns about its upcoming result object on every call
+pytestmark = pytest.mark.filterwarnings('ignore::FutureWarning')
+
+
+def random_walk(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100 + np.cumsum(rng.normal(0, 1, n))
+
+
+@pytest.mark.parametrize('lag', [0, 1, 4])
+def test_incremental_adf_matches_statsmodels(lag):
+    values = random_walk(500)
+    result = IncrementalADF(values, lag).result()
+    statistic, p_value = adfuller(values, maxlag=lag, autolag=None)[:2]
+    assert result['adf_statistic'] == pytest.approx(statistic, rel=1e-8)
+    assert result['p_value'] == pytest.approx(p_value, abs=1e-3)
+    assert result['nobs'] == len(values) - lag - 1
+
+
+def test_incremental_adf_append_matches_single_pass():
+    values = random_walk(400, seed=1)
+    state = IncrementalADF(values[:150], 2)
+    for chunk in np.array_split(values[150:], 7):
+        state.append(chunk)
+    whole = IncrementalADF(values, 2).result()
+    appended = state.result()
+    assert appended['adf_statistic'] == pytest.approx(whole['adf_statistic'], rel=1e-9)
+    assert appended['length'] == whole['length'] == len(values)
+
+
+def test_incremental_adf_needs_enough_rows():
+    assert IncrementalADF(random_walk(4), 1).result() is None
+
+
+@pytest.mark.parametrize('block_rows', [7, 4096])
+def test_rolling_adf_matches_statsmodels_per_window(monkeypatch, block_rows):
+    monkeypatch.setattr(analysis, 'ROLLING_ADF_BLOCK_ROWS', block_rows)
+    values = random_walk(120, seed=2)
+    window, lag = 40, 2
+    statistics, p_values = rolling_adf(values, window, lag)
+    assert len(statistics) == len(values) - window + 1
+    for start in (0, 1, 37, len(statistics) - 1):
+        expected, expected_p = adfuller(values[start:start + window], maxlag=lag, autolag=None)[:2]
+        assert statistics[start] == pytest.approx(expected, rel=1e-6)
+        assert p_values[start] == pytest.approx(expected_p, abs=1e-3)
+
+
+def test_incremental_decomposition_matches_seasonal_decompose():
+    rng = np.random.default_rng(3)
+    n, period = 240, 12
+    values = 50 + 0.1 * np.arange(n) + 5 * np.sin(2 * np.pi * np.arange(n) / period) + rng.normal(0, 1, n)
+    expected = seasonal_decompose(values, model='additive', period=period)
+
+    state = IncrementalDecomposition(values[:100], period)
+    offset, trend, seasonal, resid = state.append(values[100:])
+    assert offset == 100 - period // 2
+    np.testing.assert_allclose(trend, expected.trend[offset:], atol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(state.seasonal_pattern(), expected.seasonal[:period], atol=1e-9)
+    np.testing.assert_allclose(seasonal, expected.seasonal[offset:], atol=1e-9)
+    np.testing.assert_allclose(resid, expected.resid[offset:], atol=1e-9, equal_nan=True)
+
+
+def test_incremental_decomposition_append_matches_single_pass():
+    values = random_walk(300, seed=4)
+    state = IncrementalDecomposition(values[:30], 7)
+    for chunk in np.array_split(values[30:], 9):
+        state.append(chunk)
+    whole = IncrementalDecomposition(values, 7)
+    np.testing.assert_allclose(state.seasonal_pattern(), whole.seasonal_pattern(), atol=1e-9)
+    assert state.length == whole.length == len(values)
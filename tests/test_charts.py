@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from charts import CHART_MIN_WIDTH, CHART_PYRAMID_FACTOR, ChartPyramid, lttb
+
+
+def ohlcv(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame({
+        'Date': pd.date_range('2020-01-01', periods=n, freq='min'),
+        'Open': close + rng.normal(0, 0.5, n),
+        'High': close + 1,
+        'Low': close - 1,
+        'Close': close,
+        'Volume': rng.integers(1, 1000, n).astype(float)
+    })
+
+
+def test_lttb_keeps_endpoints_and_width():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 20)
+    keep = lttb(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_keeps_spikes():
+    y = np.zeros(1000)
+    y[500] = 10.0
+    assert 500 in lttb(np.arange(1000), y, 20)
+
+
+def test_lttb_returns_everything_when_it_fits():
+    np.testing.assert_array_equal(lttb(np.arange(10), np.arange(10), 10), np.arange(10))
+    np.testing.assert_array_equal(lttb(np.arange(10), np.arange(10), 2), np.arange(10))
+
+
+def test_pyramid_levels_aggregate_buckets():
+    df = ohlcv(64)
+    pyramid = ChartPyramid(df)
+    level = pyramid.levels[1]
+    buckets = df.iloc[:CHART_PYRAMID_FACTOR]
+    assert level['Open'][0] == buckets['Open'].iloc[0]
+    assert level['High'][0] == buckets['High'].max()
+    assert level['Low'][0] == buckets['Low'].min()
+    assert level['Close'][0] == buckets['Close'].iloc[-1]
+    assert level['Volume'][0] == buckets['Volume'].sum()
+    assert level['Close:min'][0] == buckets['Close'].min()
+    assert level['Close:max'][0] == buckets['Close'].max()
+    assert len(pyramid.levels[-1]['Date']) <= CHART_MIN_WIDTH
+
+
+@pytest.mark.parametrize('width', [CHART_MIN_WIDTH, 5, 50, 1200])
+def test_pyramid_never_exceeds_width(width):
+    df = ohlcv(20000, seed=1)
+    pyramid = ChartPyramid(df)
+    dates = pyramid.levels[0]['Date']
+    rng = np.random.default_rng(width)
+    spans = [(dates[0], dates[-1])]
+    for _ in range(50):
+        lo, hi = np.sort(rng.integers(0, len(dates), 2))
+        spans.append((dates[lo], dates[hi]))
+    for start, end in spans:
+        _, candles = pyramid.ohlc(start, end, width)
+        assert len(candles['Date']) <= width
+        _, series = pyramid.lines(['Close', 'Open'], start, end, width)
+        for x, y in series.values():
+            assert len(x) == len(y) <= width
+            assert np.all(np.diff(x) >= 0)
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import IndicatorSeries, compute_indicators, parse_indicator_spec
+
+SPECS = [parse_indicator_spec(spec) for spec in ('sma:20', 'ema:20', 'rsi', 'macd', 'bollinger', 'atr')]
+
+
+def ohlc(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame({
+        'Date': pd.date_range('2020-01-01', periods=n, freq='D'),
+        'High': close + rng.uniform(0, 2, n),
+        'Low': close - rng.uniform(0, 2, n),
+        'Close': close
+    })
+
+
+# Reference smoother: NaN until period values, seeded with their mean
+def seeded_ema(values, period, alpha):
+    out = np.full(len(values), np.nan)
+    if len(values) < period:
+        return out
+    out[period - 1] = values[:period].mean()
+    for i in range(period, len(values)):
+        out[i] = alpha * values[i] + (1 - alpha) * out[i - 1]
+    return out
+
+
+def test_rolling_indicators_match_pandas():
+    df = ohlc(300)
+    result = IndicatorSeries(SPECS)
+    result.append(df)
+    frame = result.frame()
+    rolling = df['Close'].rolling(20)
+    np.testing.assert_allclose(frame['SMA_20'], rolling.mean(), rtol=1e-10, equal_nan=True)
+    np.testing.assert_allclose(frame['BB_middle_20_2'], rolling.mean(), rtol=1e-10, equal_nan=True)
+    np.testing.assert_allclose(frame['BB_upper_20_2'], rolling.mean() + 2 * rolling.std(ddof=0),
+                               rtol=1e-9, equal_nan=True)
+
+
+def test_smoothed_indicators_match_recurrences():
+    df = ohlc(300, seed=1)
+    series = IndicatorSeries(SPECS)
+    series.append(df)
+    frame = series.frame()
+    close, high, low = (df[col].to_numpy() for col in ('Close', 'High', 'Low'))
+
+    np.testing.assert_allclose(frame['EMA_20'], seeded_ema(close, 20, 2 / 21), rtol=1e-10, equal_nan=True)
+
+    changes = np.diff(close)
+    gain = seeded_ema(np.maximum(changes, 0), 14, 1 / 14)
+    loss = seeded_ema(np.maximum(-changes, 0), 14, 1 / 14)
+    rsi = np.concatenate([[np.nan], 100 - 100 / (1 + gain / loss)])
+    np.testing.assert_allclose(frame['RSI_14'], rsi, rtol=1e-10, equal_nan=True)
+
+    macd = seeded_ema(close, 12, 2 / 13) - seeded_ema(close, 26, 2 / 27)
+    signal = np.full(len(close), np.nan)
+    signal[25:] = seeded_ema(macd[25:], 9, 2 / 10)
+    np.testing.assert_allclose(frame['MACD_12_26_9'], macd, rtol=1e-10, equal_nan=True)
+    np.testing.assert_allclose(frame['MACD_signal_12_26_9'], signal, rtol=1e-10, equal_nan=True)
+
+    previous = np.concatenate([[np.nan], close[:-1]])
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+    np.testing.assert_allclose(frame['ATR_14'], seeded_ema(true_range, 14, 1 / 14), rtol=1e-10, equal_nan=True)
+
+
+def test_rsi_is_100_without_losses():
+    df = ohlc(40)
+    df['Close'] = np.arange(40, dtype=float)
+    series = IndicatorSeries([parse_indicator_spec('rsi')])
+    series.append(df)
+    assert np.all(series.frame()['RSI_14'].iloc[14:] == 100.0)
+
+
+@pytest.mark.parametrize('chunks', [[1] * 30, [5, 17, 40, 3], [200]])
+def test_appending_in_chunks_matches_one_pass(chunks):
+    df = ohlc(300, seed=2)
+    whole = IndicatorSeries(SPECS)
+    whole.append(df)
+    series = IndicatorSeries(SPECS)
+    start = 0
+    for size in chunks + [len(df)]:
+        series.append(df.iloc[start:start + size])
+        start += size
+    pd.testing.assert_frame_equal(series.frame(), whole.frame(), rtol=1e-9)
+
+
+def test_compute_indicators_reuses_cached_series():
+    df = ohlc(300, seed=3)
+    full, mode = compute_indicators('test:reuse', df.iloc[:200], SPECS)
+    assert mode == 'full'
+    extended, mode = compute_indicators('test:reuse', df, SPECS)
+    assert mode == 'incremental'
+    again, mode = compute_indicators('test:reuse', df, SPECS)
+    assert mode == 'cached'
+    prefix, mode = compute_indicators('test:reuse', df.iloc[:100], SPECS)
+    assert mode == 'cached'
+    reference, _ = compute_indicators('test:reference', df, SPECS)
+    pd.testing.assert_frame_equal(extended, reference, rtol=1e-9)
+    pd.testing.assert_frame_equal(prefix, reference.iloc[:100], rtol=1e-9)
+
+
+def test_compute_indicators_rebuilds_when_history_changes():
+    df = ohlc(300, seed=4)
+    compute_indicators('test:rebuild', df.iloc[:200], SPECS)
+    revised = df.copy()
+    revised.loc[199, 'Close'] += 1.0
+    _, mode = compute_indicators('test:rebuild', revised, SPECS)
+    assert mode == 'full'
+
+
+def test_compute_indicators_sorts_unordered_input():
+    df = ohlc(100, seed=5)
+    shuffled = df.sample(frac=1, random_state=0)
+    result, mode = compute_indicators('test:unsorted', shuffled, SPECS)
+    reference, _ = compute_indicators('test:sorted', df, SPECS)
+    assert mode == 'full'
+    pd.testing.assert_frame_equal(result, reference)
+
+
+def test_compute_indicators_rebuilds_on_unordered_tail():
+    df = ohlc(120, seed=6)
+    compute_indicators('test:tail', df.iloc[:100], SPECS)
+    tail = df.iloc[100:].iloc[::-1]
+    result, mode = compute_indicators('test:tail', pd.concat([df.iloc[:100], tail]), SPECS)
+    reference, _ = compute_indicators('test:tail-reference', df, SPECS)
+    assert mode == 'full'
+    pd.testing.assert_frame_equal(result, reference)
+
+
+def test_parse_indicator_spec():
+    assert parse_indicator_spec('sma:50') == ('sma', {'column': 'Close', 'period': 50})
+    assert parse_indicator_spec({'name': 'EMA', 'period': 10, 'column': 'Open'}) == \
+        ('ema', {'column': 'Open', 'period': 10})
+    with pytest.raises(ValueError):
+        parse_indicator_spec('vwap')
+    with pytest.raises(ValueError):
+        parse_indicator_spec('sma:0')
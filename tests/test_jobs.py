@@ -0,0 +1,77 @@
+import pytest
+
+from jobs import SEARCH_MAX_CANDIDATES, _halving_rung, _search_values, search_candidates
+
+
+def test_search_values_expands_ranges():
+    assert _search_values('units', [16, 32], int) == [16, 32]
+    assert _search_values('units', 64, int) == [64]
+    assert _search_values('units', {'min': 16, 'max': 64, 'step': 16}, int) == [16, 32, 48, 64]
+    assert _search_values('units', {'min': 10, 'max': 30, 'num': 3}, int) == [10, 20, 30]
+    assert _search_values('learning_rate', {'min': 0.0001, 'max': 0.01, 'num': 3, 'log': True}, float) == \
+        pytest.approx([0.0001, 0.001, 0.01])
+
+
+def test_search_values_dedupes_after_rounding():
+    assert _search_values('units', [16, 16.2, 32], int) == [16, 32]
+
+
+@pytest.mark.parametrize('spec', [[], [0], [-1, 4], {'min': 0, 'max': 4, 'num': 2}])
+def test_search_values_rejects_non_positive(spec):
+    with pytest.raises(ValueError):
+        _search_values('units', spec, int)
+
+
+def test_search_candidates_adds_default_sequence_length():
+    candidates = search_candidates('lstm', {'units': [16, 32], 'learning_rate': [0.001]})
+    assert len(candidates) == 2
+    assert all(candidate['seq_length'] == candidates[0]['seq_length'] for candidate in candidates)
+    assert {candidate['units'] for candidate in candidates} == {16, 32}
+
+
+def test_search_candidates_rejects_unknown_and_oversized_grids():
+    with pytest.raises(ValueError, match='Unknown parameters'):
+        search_candidates('lstm', {'foo': [1]})
+    with pytest.raises(ValueError, match='candidates'):
+        search_candidates('lstm', {'units': list(range(1, SEARCH_MAX_CANDIDATES + 2))})
+
+
+def trials(*losses, converged=False):
+    return [{'name': index, 'val_loss': loss, 'converged': converged} for index, loss in enumerate(losses)]
+
+
+def test_halving_keeps_best_fraction_and_grows_budget():
+    survivors, budget = _halving_rung(trials(0.5, 0.1, 0.9, 0.3, 0.7, 0.2, 0.4, 0.8, 0.6), 2, 50, 3)
+    assert [trial['val_loss'] for trial in survivors] == [0.1, 0.2, 0.3]
+    assert budget == 6
+
+
+def test_halving_rounds_survivors_up():
+    survivors, _ = _halving_rung(trials(0.3, 0.1, 0.2, 0.4), 2, 50, 3)
+    assert [trial['val_loss'] for trial in survivors] == [0.1, 0.2]
+    survivors, _ = _halving_rung(trials(0.3), 2, 50, 3)
+    assert len(survivors) == 1
+
+
+def test_halving_caps_budget_and_stops_at_max_epochs():
+    _, budget = _halving_rung(trials(0.1, 0.2), 20, 50, 3)
+    assert budget == 50
+    survivors, budget = _halving_rung(trials(0.3, 0.1, 0.2), 50, 50, 3)
+    assert budget is None
+    assert [trial['val_loss'] for trial in survivors] == [0.1, 0.2, 0.3]
+
+
+def test_halving_stops_when_survivors_converged():
+    survivors, budget = _halving_rung(trials(0.3, 0.1, 0.2, converged=True), 2, 50, 3)
+    assert budget is None
+    assert [trial['val_loss'] for trial in survivors] == [0.1]
+
+
+def test_halving_schedule_trains_fewer_epochs_than_full_budget():
+    active = trials(*[i / 27 for i in range(27)])
+    budget, total = 2, 0
+    while budget is not None:
+        total += len(active) * budget
+        active, budget = _halving_rung(active, budget, 54, 3)
+    assert [trial['val_loss'] for trial in active] == [0.0]
+    assert total < 27 * 54
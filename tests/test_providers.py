@@ -0,0 +1,171 @@
+import time
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import providers
+from providers import (
+    HEDGE_DEFAULT_DELAY, HEDGE_MAX_DELAY, HEDGE_MIN_DELAY, ProviderHealth, fetch_stock_frame,
+    hedge_stats_snapshot, load_stock_frame
+)
+
+
+def test_load_stock_frame_fills_missing_columns_on_a_copy():
+    cached = pd.DataFrame({'Date': pd.bdate_range('2020-01-01', periods=5), 'Close': [1.0, 2.0, 3.0, 4.0, 5.0]})
+    before = cached.copy()
+    df, source = load_stock_frame('AAA', date(2020, 1, 1), date(2020, 1, 7), fetch=lambda *args: (cached, 'Cache'))
+    assert source == 'Cache'
+    assert {'Open', 'High', 'Low'} <= set(df.columns)
+    pd.testing.assert_frame_equal(cached, before)
+
+
+def open_breaker(health):
+    for _ in range(health.failure_threshold):
+        assert health.allow()
+        health.record_failure(0.1)
+
+
+def expire(health):
+    health.opened_at -= health.reset_timeout
+
+
+def test_breaker_opens_after_consecutive_failures():
+    health = ProviderHealth('test', failure_threshold=3, reset_timeout=30)
+    health.record_failure(0.1)
+    health.record_failure(0.1)
+    health.record_success(0.1)
+    health.record_failure(0.1)
+    health.record_failure(0.1)
+    assert health.state == 'closed'
+    health.record_failure(0.1)
+    assert health.state == 'open'
+
+
+def test_open_breaker_short_circuits_until_reset_timeout():
+    health = ProviderHealth('test', failure_threshold=2, reset_timeout=30)
+    open_breaker(health)
+    assert not health.allow()
+    assert not health.allow()
+    assert health.short_circuited == 2
+    expire(health)
+    assert health.allow()
+    assert health.state == 'half_open'
+
+
+def test_half_open_lets_a_single_trial_through():
+    health = ProviderHealth('test', failure_threshold=2, reset_timeout=30)
+    open_breaker(health)
+    expire(health)
+    assert health.allow()
+    assert not health.allow()
+    assert health.short_circuited == 1
+
+
+def test_half_open_trial_success_closes_breaker():
+    health = ProviderHealth('test', failure_threshold=2, reset_timeout=30)
+    open_breaker(health)
+    expire(health)
+    assert health.allow()
+    health.record_success(0.1)
+    assert health.state == 'closed'
+    assert health.consecutive_failures == 0
+    assert health.allow() and health.allow()
+
+
+def test_half_open_trial_failure_reopens_breaker():
+    health = ProviderHealth('test', failure_threshold=5, reset_timeout=30)
+    open_breaker(health)
+    expire(health)
+    assert health.allow()
+    health.record_failure(0.1)
+    assert health.state == 'open'
+    assert not health.allow()
+
+
+def test_hedge_delay_follows_p95_within_bounds():
+    health = ProviderHealth('test')
+    assert health.hedge_delay() == HEDGE_DEFAULT_DELAY
+    for _ in range(50):
+        health.record_success(0.001)
+    assert health.hedge_delay() == HEDGE_MIN_DELAY
+    for _ in range(200):
+        health.record_success(100.0)
+    assert health.hedge_delay() == HEDGE_MAX_DELAY
+
+
+FRAME = pd.DataFrame({'Date': pd.bdate_range('2020-01-01', periods=3), 'Close': [1.0, 2.0, 3.0]})
+EMPTY = pd.DataFrame(columns=['Date', 'Close'])
+
+
+def stub(result, latency=0.0):
+    def fetch(ticker, start, end):
+        time.sleep(latency)
+        return result
+    return fetch
+
+
+@pytest.fixture
+def stooq_latency(monkeypatch):
+    # A fresh breaker whose p95 (and so hedge delay) is the given latency
+    def set_latency(seconds):
+        health = ProviderHealth('stooq')
+        for _ in range(20):
+            health.latencies.append(seconds)
+        monkeypatch.setitem(providers.provider_health, 'stooq', health)
+    return set_latency
+
+
+def hedged_fetch(monkeypatch, stooq, yahoo):
+    monkeypatch.setattr(providers, 'get_stooq_data', stooq)
+    monkeypatch.setattr(providers, 'get_yahoo_data', yahoo)
+    before = hedge_stats_snapshot()
+    df, source = fetch_stock_frame('AAA', date(2020, 1, 1), date(2020, 1, 7))
+    after = hedge_stats_snapshot()
+    return df, source, {field: after[field] - before[field] for field in after}
+
+
+def test_fast_stooq_is_not_hedged(monkeypatch, stooq_latency):
+    stooq_latency(HEDGE_MIN_DELAY)
+    df, source, counted = hedged_fetch(monkeypatch, stub(FRAME), stub(None))
+    assert source == 'Stooq' and df is FRAME
+    assert counted == {'hedged': 0, 'primary_wins': 0, 'secondary_wins': 0}
+
+
+def test_unusable_stooq_falls_back_to_yahoo_without_hedging(monkeypatch, stooq_latency):
+    stooq_latency(HEDGE_MIN_DELAY)
+    df, source, counted = hedged_fetch(monkeypatch, stub(EMPTY), stub(FRAME))
+    assert source == 'Yahoo Finance' and df is FRAME
+    assert counted == {'hedged': 0, 'primary_wins': 0, 'secondary_wins': 0}
+    assert hedged_fetch(monkeypatch, stub(None), stub(EMPTY))[:2] == (None, None)
+
+
+def test_slow_stooq_is_hedged_and_yahoo_wins(monkeypatch, stooq_latency):
+    stooq_latency(HEDGE_MIN_DELAY)
+    started = time.perf_counter()
+    df, source, counted = hedged_fetch(monkeypatch, stub(EMPTY, latency=1.0), stub(FRAME))
+    assert source == 'Yahoo Finance' and df is FRAME
+    assert time.perf_counter() - started < 1.0
+    assert counted == {'hedged': 1, 'primary_wins': 0, 'secondary_wins': 1}
+
+
+def test_hedged_stooq_wins_when_yahoo_is_unusable(monkeypatch, stooq_latency):
+    stooq_latency(HEDGE_MIN_DELAY)
+    df, source, counted = hedged_fetch(monkeypatch, stub(FRAME, latency=0.5), stub(None))
+    assert source == 'Stooq' and df is FRAME
+    assert counted == {'hedged': 1, 'primary_wins': 1, 'secondary_wins': 0}
+
+
+def test_hedged_fetch_fails_when_neither_provider_answers(monkeypatch, stooq_latency):
+    stooq_latency(HEDGE_MIN_DELAY)
+    df, source, counted = hedged_fetch(monkeypatch, stub(None, latency=0.5), stub(EMPTY))
+    assert (df, source) == (None, None)
+    assert counted == {'hedged': 1, 'primary_wins': 0, 'secondary_wins': 0}
+
+
+def test_hedge_waits_for_stooq_p95(monkeypatch, stooq_latency):
+    # 0.4s is past the minimum delay but within Stooq's usual latency
+    stooq_latency(0.8)
+    df, source, counted = hedged_fetch(monkeypatch, stub(FRAME, latency=0.4), stub(FRAME))
+    assert source == 'Stooq'
+    assert counted['hedged'] == 0
@@ -0,0 +1,68 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+
+import serving
+from serving import ModelServer, run_predict
+
+SEQ_LENGTH = 3
+META = {'model_type': 'lstm', 'params': {'seq_length': SEQ_LENGTH}, 'column': 'Close'}
+
+
+# Stand-in for a Keras model: predicts the last value of each window
+class LastValueModel:
+    def __init__(self, delay=None):
+        self.delay = delay
+
+    def get_weights(self):
+        return [np.zeros(4)]
+
+    def predict_on_batch(self, windows):
+        if self.delay is not None:
+            self.delay.wait()
+        return windows[:, -1, :1]
+
+
+def make_server(model):
+    return ModelServer('lstm-test', model, None, META, 0.0)
+
+
+def windows(n, length=SEQ_LENGTH):
+    return np.arange(n * length, dtype=np.float32).reshape(n, length, 1)
+
+
+def test_submit_predicts_each_request():
+    server = make_server(LastValueModel())
+    first, second = server.submit(windows(2)), server.submit(windows(3))
+    np.testing.assert_array_equal(first.result(timeout=5), [2, 5])
+    np.testing.assert_array_equal(second.result(timeout=5), [2, 5, 8])
+
+
+def test_failed_batch_fails_its_requests_and_keeps_serving():
+    server = make_server(LastValueModel())
+    # Windows of different lengths can't be stacked into one batch
+    mismatched = [server.submit(windows(1)), server.submit(windows(1, length=SEQ_LENGTH + 1))]
+    for future in mismatched:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+    np.testing.assert_array_equal(server.submit(windows(1)).result(timeout=5), [2])
+
+
+def test_run_predict_times_out_with_503(monkeypatch):
+    monkeypatch.setattr(serving, 'PREDICT_TIMEOUT', 0.1)
+    release = threading.Event()
+    df = pd.DataFrame({'Date': pd.bdate_range('2020-01-01', periods=10), 'Close': np.arange(10.0)})
+    scaler = MinMaxScaler().fit(df[['Close']].to_numpy())
+    server = ModelServer('lstm-test', LastValueModel(delay=release), scaler, META, 0.0)
+    try:
+        payload, status = run_predict(server, df, 'Close')
+        assert status == 503
+        assert 'error' in payload
+    finally:
+        release.set()
+    payload, status = run_predict(server, df, 'Close', windows=2)
+    assert status == 200
+    assert payload['predictions'] == pytest.approx([8.0, 9.0])
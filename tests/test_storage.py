@@ -0,0 +1,124 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import storage
+from storage import StockDataCache, _add_coverage, _missing_ranges, load_ohlcv_range
+
+
+def sized_cache(max_bytes):
+    return StockDataCache(max_bytes, sizeof=lambda value: value)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = sized_cache(10)
+    cache.set('a', 4)
+    cache.set('b', 4)
+    assert cache.get('a') == 4
+    cache.set('c', 4)
+    assert 'b' not in cache
+    assert cache.get('a') == 4 and cache.get('c') == 4
+    assert cache.bytes_used == 8
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_replaces_existing_key_without_double_counting():
+    cache = sized_cache(10)
+    cache.set('a', 4)
+    cache.set('a', 6)
+    assert cache.bytes_used == 6
+    assert len(cache) == 1
+
+
+def test_cache_rejects_values_over_budget():
+    cache = sized_cache(10)
+    cache.set('a', 4)
+    assert cache.set('big', 11) is False
+    assert 'big' not in cache
+    assert cache.get('a') == 4
+
+
+def test_cache_expires_ttl_entries():
+    cache = sized_cache(10)
+    cache.set('live', 1, ttl=0)
+    cache.set('closed', 2)
+    assert 'live' not in cache
+    assert cache.values() == [2]
+    assert cache.get('live') is None
+    stats = cache.stats()
+    assert stats['expirations'] == 1
+    assert stats['entries'] == 1 and stats['bytes'] == 2
+
+
+def test_missing_ranges():
+    assert _missing_ranges([], 10, 20) == [(10, 20)]
+    assert _missing_ranges([[10, 20]], 10, 20) == []
+    assert _missing_ranges([[12, 14], [17, 18]], 10, 20) == [(10, 11), (15, 16), (19, 20)]
+    assert _missing_ranges([[0, 5], [30, 40]], 10, 20) == [(10, 20)]
+    assert _missing_ranges([[5, 15]], 10, 20) == [(16, 20)]
+
+
+def test_add_coverage_merges_overlapping_and_adjacent_ranges():
+    assert _add_coverage([], 10, 20) == [[10, 20]]
+    assert _add_coverage([[10, 20]], 21, 30) == [[10, 30]]
+    assert _add_coverage([[10, 20], [30, 40]], 15, 35) == [[10, 40]]
+    assert _add_coverage([[10, 20]], 25, 30) == [[10, 20], [25, 30]]
+
+
+class RecordingFetch:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, ticker, start, end):
+        self.calls.append((start, end))
+        if self.fail:
+            return None
+        dates = pd.bdate_range(start, end)
+        return pd.DataFrame({'Date': dates, 'Close': [float(d.day) for d in dates]})
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'STORE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def test_load_ohlcv_range_only_fetches_gaps(store_dir):
+    fetch = RecordingFetch()
+    first = load_ohlcv_range('test', 'AAA', date(2020, 1, 1), date(2020, 1, 31), fetch)
+    assert fetch.calls == [(date(2020, 1, 1), date(2020, 1, 31))]
+    assert len(first) == len(pd.bdate_range('2020-01-01', '2020-01-31'))
+
+    again = load_ohlcv_range('test', 'AAA', date(2020, 1, 1), date(2020, 1, 31), fetch)
+    assert len(fetch.calls) == 1
+    pd.testing.assert_frame_equal(again, first)
+
+    wider = load_ohlcv_range('test', 'AAA', date(2019, 12, 20), date(2020, 2, 14), fetch)
+    assert fetch.calls[1:] == [(date(2019, 12, 20), date(2019, 12, 31)), (date(2020, 2, 1), date(2020, 2, 14))]
+    expected = pd.bdate_range('2019-12-20', '2020-02-14')
+    assert list(wider['Date']) == list(expected)
+
+
+def test_load_ohlcv_range_slices_stored_rows(store_dir):
+    fetch = RecordingFetch()
+    load_ohlcv_range('test', 'AAA', date(2020, 1, 1), date(2020, 3, 31), fetch)
+    inner = load_ohlcv_range('test', 'AAA', date(2020, 2, 3), date(2020, 2, 7), fetch)
+    assert len(fetch.calls) == 1
+    assert list(inner['Date']) == list(pd.bdate_range('2020-02-03', '2020-02-07'))
+
+
+def test_load_ohlcv_range_retries_failed_gaps(store_dir):
+    assert load_ohlcv_range('test', 'AAA', date(2020, 1, 1), date(2020, 1, 31), RecordingFetch(fail=True)) is None
+    fetch = RecordingFetch()
+    frame = load_ohlcv_range('test', 'AAA', date(2020, 1, 1), date(2020, 1, 31), fetch)
+    assert fetch.calls == [(date(2020, 1, 1), date(2020, 1, 31))]
+    assert not frame.empty
+
+
+def test_load_ohlcv_range_keeps_tickers_apart(store_dir):
+    fetch = RecordingFetch()
+    load_ohlcv_range('test', 'AAA', date(2020, 1, 1), date(2020, 1, 31), fetch)
+    load_ohlcv_range('test', 'BBB', date(2020, 1, 1), date(2020, 1, 31), fetch)
+    assert len(fetch.calls) == 2
@@ -0,0 +1,68 @@
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import providers
+import storage
+import streaming
+from streaming import StooqQuoteFeed
+
+QUOTE_DATE = date(2024, 3, 5)
+
+
+class StubStooq(BaseHTTPRequestHandler):
+    daily = True
+
+    def do_GET(self):
+        if self.path.startswith('/q/l/'):
+            body = ('Symbol,Date,Time,Open,High,Low,Close,Volume\n'
+                    f'AAA.US,{QUOTE_DATE.isoformat()},15:00:00,101,106,100,105,1000\n')
+        elif self.path.startswith('/q/d/l/') and self.daily:
+            days = pd.bdate_range(QUOTE_DATE - timedelta(days=10), QUOTE_DATE - timedelta(days=1))
+            body = 'Date,Open,High,Low,Close,Volume\n' + ''.join(
+                f'{day:%Y-%m-%d},99,101,98,{100 + i},500\n' for i, day in enumerate(days))
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stooq(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubStooq)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}'
+    for module in (providers, streaming):
+        monkeypatch.setattr(module, 'STOOQ_BASE_URL', url)
+        monkeypatch.setattr(module, 'STOCK_DATA_OFFLINE', False)
+    monkeypatch.setattr(storage, 'STORE_DIR', str(tmp_path))
+    monkeypatch.setitem(providers.provider_health, 'stooq', providers.ProviderHealth('stooq'))
+    providers.stock_data_cache.clear()
+    yield StubStooq
+    StubStooq.daily = True
+    server.shutdown()
+
+
+def test_stooq_quote_change_is_against_previous_close(stooq):
+    quote = StooqQuoteFeed('AAA')()
+    previous_close = 100 + len(pd.bdate_range(QUOTE_DATE - timedelta(days=10), QUOTE_DATE - timedelta(days=1))) - 1
+    assert quote['price'] == 105 and quote['open'] == 101
+    assert quote['change'] == round(105 - previous_close, 2)
+    assert quote['change_percent'] == round((105 - previous_close) / previous_close * 100, 2)
+
+
+def test_stooq_quote_without_history_has_no_change(stooq):
+    stooq.daily = False
+    quote = StooqQuoteFeed('AAA')()
+    assert quote['price'] == 105
+    assert quote['change'] is None and quote['change_percent'] is None